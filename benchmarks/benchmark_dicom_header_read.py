@@ -0,0 +1,106 @@
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+import argparse
+import logging
+import tempfile
+import sys
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.xASL_GUI_DCM2NIFTI import DCM2NIFTI_Converter  # noqa: E402
+
+
+########################################################################################################################
+# PREFACE
+# Compares the per-directory wall time of extracting the additional DICOM parameters of a synthetic ASL series:
+#       - before ; every file of the directory is read in full with pydicom, as get_additional_dicom_parms used to
+#       - after ; only the needed header tags of the first valid file are read (get_header_records)
+#       - after, indexed ; the same, with the header already present in the header index of the RawDir
+# Usage: python benchmarks/benchmark_dicom_header_read.py --files 240 --matrix 128 --repeats 5
+########################################################################################################################
+def write_series(dcm_dir: Path, n_files: int, matrix: int):
+    """
+    Writes a synthetic Siemens series of single-slice DICOM files with random pixel data
+    :param dcm_dir: the directory to write the series into
+    :param n_files: the number of DICOM files (i.e. slices times volumes)
+    :param matrix: the number of rows and columns of each slice
+    """
+    dcm_dir.mkdir(parents=True, exist_ok=True)
+    series_uid, study_uid = generate_uid(), generate_uid()
+    rng = np.random.default_rng(0)
+    for idx in range(n_files):
+        file_meta = FileMetaDataset()
+        file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        file_meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.4"
+        file_meta.MediaStorageSOPInstanceUID = generate_uid()
+        ds = Dataset()
+        ds.file_meta = file_meta
+        ds.SOPClassUID, ds.SOPInstanceUID = file_meta.MediaStorageSOPClassUID, file_meta.MediaStorageSOPInstanceUID
+        ds.Modality, ds.Manufacturer, ds.SoftwareVersions = "MR", "SIEMENS", "syngo MR E11"
+        ds.SeriesInstanceUID, ds.StudyInstanceUID = series_uid, study_uid
+        ds.SeriesNumber, ds.InstanceNumber = 3, idx + 1
+        ds.AcquisitionTime = f"{120000 + idx // 16:06d}.000"
+        ds.AcquisitionMatrix = [matrix, 0, 0, matrix]
+        ds.ImageType = ["ORIGINAL", "PRIMARY", "M", "ND"]
+        ds.Rows = ds.Columns = matrix
+        ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 16, 15, 0
+        ds.SamplesPerPixel, ds.PhotometricInterpretation = 1, "MONOCHROME2"
+        ds.PixelData = rng.integers(0, 4096, (matrix, matrix), dtype=np.uint16).tobytes()
+        ds.is_little_endian, ds.is_implicit_VR = True, False
+        ds.save_as(dcm_dir / f"IM{idx:05d}.dcm", write_like_original=False)
+
+
+def read_all_files(dcm_dir: Path):
+    """
+    The extraction as it was: every file of the directory is parsed in full, pixel data included
+    """
+    dcm_data = None
+    for dcm_file in dcm_dir.glob("*"):
+        dcm_data = pydicom.dcmread(str(dcm_file))
+    return dcm_data
+
+
+def time_it(func, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start_time = perf_counter()
+        func()
+        timings.append(perf_counter() - start_time)
+    return median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction of additional DICOM parameters")
+    parser.add_argument("--files", type=int, default=240, help="the number of DICOM files in the series")
+    parser.add_argument("--matrix", type=int, default=128, help="the number of rows and columns of each slice")
+    parser.add_argument("--repeats", type=int, default=5, help="how many times each variant is timed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as raw_dir:
+        dcm_dir = Path(raw_dir) / "sub001" / "ASL"
+        write_series(dcm_dir, args.files, args.matrix)
+        config = {"RawDir": raw_dir, "Directory Structure": ["Subject", "Scan"], "Scan Aliases": {},
+                  "Ordered Run Aliases": {}, "Header Samples": 1}
+        logger = logging.getLogger("benchmark")
+        plain = DCM2NIFTI_Converter(config=config, name="benchmark", logger=logger, b_use_header_index=False)
+        indexed = DCM2NIFTI_Converter(config=config, name="benchmark", logger=logger, b_use_header_index=True)
+        for converter in [plain, indexed]:
+            converter.b_verbose = False
+        indexed.get_header_records(dcm_dir)  # Populate the header index
+
+        t_before = time_it(lambda: read_all_files(dcm_dir), args.repeats)
+        t_after = time_it(lambda: plain.get_header_records(dcm_dir), args.repeats)
+        t_indexed = time_it(lambda: indexed.get_header_records(dcm_dir), args.repeats)
+
+    print(f"Per-directory wall time for {args.files} files of {args.matrix}x{args.matrix} (median of {args.repeats}):")
+    print(f"\tbefore (full read of every file): {t_before * 1000:9.2f} ms")
+    print(f"\tafter (header tags of one file):  {t_after * 1000:9.2f} ms  ({t_before / t_after:.0f}x faster)")
+    print(f"\tafter, from the header index:     {t_indexed * 1000:9.2f} ms  ({t_before / t_indexed:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
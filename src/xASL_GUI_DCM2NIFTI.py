@@ -5,46 +5,98 @@ import nibabel as nib
 import pydicom
 from pydicom.errors import InvalidDicomError
 from pydicom.multival import MultiValue
+from pydicom.tag import Tag
 import json
 import pandas as pd
 from more_itertools import peekable, sort_together
 import struct
+import csv
 import logging
 from ast import literal_eval
 from nilearn import image
 from platform import system
 from pathlib import Path
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Set, Iterator, BinaryIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from time import perf_counter, thread_time, process_time
 import re
+import os
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import signal
+from src.xASL_GUI_DCMHeaderIndex import DICOM_HeaderIndex, get_header_index_path
+from src.xASL_GUI_Logging import get_queue_logger
+from src.xASL_GUI_HelperFuncs_DirOps import (get_bids_asl_m0_pairs, update_json_sidecars, get_sidecar_nifti,
+                                             ParallelGzipWriter)
 
 pd.set_option("display.width", 600)
 pd.set_option("display.max_columns", 15)
 
+DCM2NIIX_PATH = Path(__file__).resolve().parent.parent / "External" / "DCM2NIIX" / f"DCM2NIIX_{system()}" / \
+                ("dcm2niix.exe" if system() == "Windows" else "dcm2niix")
 
-def get_dicom_directories(config: dict) -> List[Tuple[Path]]:
+
+def scandir_levels(root: Union[Path, str], level_filters: List[Union[Set[str], None]]) -> Iterator[Path]:
+    """
+    Convenience function for walking exactly as many directory levels below a root as there are filters, using
+    os.scandir so that each directory is only listed once and no entry needs an additional stat
+    :param root: the directory to start walking from
+    :param level_filters: for each level, the set of directory names to descend into or None to descend into all
+    :return: an iterator over the directories found at the final level
+    """
+    if len(level_filters) == 0:
+        yield Path(root)
+        return
+    name_filter, remaining_filters = level_filters[0], level_filters[1:]
+    try:
+        with os.scandir(root) as entries:
+            subdirs = [entry.path for entry in entries
+                       if entry.is_dir() and (name_filter is None or entry.name in name_filter)]
+    except OSError:
+        return
+    for subdir in subdirs:
+        yield from scandir_levels(subdir, remaining_filters)
+
+
+def iter_dicom_directories(config: dict, n_threads: int = 8) -> Iterator[Tuple[Path, ...]]:
     """
-    Convenience function for globbing the dicom directories from the config file
+    Streams the dicom directories from the config file. Subject directories are listed first, after which the levels
+    below each subject are walked concurrently and each subject's dicom directories are yielded as soon as they are
+    known. Directories at the Scan level that are not a scan alias are never descended into
     :param config: the configuration file that specifies the directory structure
-    :return: dcm_firs: the list of filepaths to directories containing the dicom files
+    :param n_threads: how many subject directories may be walked at the same time
+    :return: an iterator over tuples of the dicom directories of each subject
     """
-    raw_dir = Path(config["RawDir"])
-    n_levels_total: int = len(config["Directory Structure"])
+    scan_aliases = set(config["Scan Aliases"].values())
+    level_filters = [scan_aliases if dir_type == "Scan" else None for dir_type in config["Directory Structure"]]
     n_levels_subject: int = config["Directory Structure"].index("Subject") + 1
-    delimiter: str = "\\" if system() == "Windows" else "/"
 
-    subject_dirs = []
-    dicom_dir: Path
-    for subject_dir in raw_dir.glob(delimiter.join(["*"] * n_levels_subject)):
-        dcms_per_subject = []
-        for dicom_dir in subject_dir.glob(delimiter.join(["*"] * (n_levels_total - n_levels_subject))):
-            hit = set(config["Scan Aliases"].values()).intersection(dicom_dir.parts)
-            if len(hit) > 0:
-                dcms_per_subject.append(dicom_dir)
-        if len(dcms_per_subject) > 0:
-            subject_dirs.append(tuple(dcms_per_subject))
+    def walk_subject(subject_dir: Path) -> Tuple[Path, ...]:
+        return tuple(scandir_levels(subject_dir, level_filters[n_levels_subject:]))
 
-    return subject_dirs
+    walkers = ThreadPoolExecutor(max_workers=n_threads)
+    try:
+        futures = [walkers.submit(walk_subject, subject_dir)
+                   for subject_dir in scandir_levels(config["RawDir"], level_filters[:n_levels_subject])]
+        for future in as_completed(futures):
+            dcms_per_subject = future.result()
+            if len(dcms_per_subject) > 0:
+                yield dcms_per_subject
+    finally:
+        # Should the caller stop early, the walks that have yet to start are abandoned
+        walkers.shutdown(wait=False, cancel_futures=True)
+
+
+def get_dicom_directories(config: dict) -> List[Tuple[Path]]:
+    """
+    Convenience function for gathering all the dicom directories from the config file
+    :param config: the configuration file that specifies the directory structure
+    :return: dcm_firs: the list of tuples of the filepaths to directories containing the dicom files of each subject
+    """
+    return list(iter_dicom_directories(config))
 
 
 def get_value(subset, remaining_tags: List[Tuple[int]], default=None):
@@ -99,7 +151,18 @@ def get_dicom_value(data: pydicom.Dataset, tags: List[List[tuple]], default=None
     detected_values = []
     for tag_set in tags:
         detected_values.append(get_value(subset=data, remaining_tags=tag_set, default=default))
+    return select_dicom_value(detected_values, default=default, for_byte_array=for_byte_array)
 
+
+def select_dicom_value(detected_values: list, default=None, for_byte_array=None):
+    """
+    Convenience function for choosing among the values detected along each pathway of a tag and decoding it
+    :param detected_values: the values detected along each pathway, with the default where none was found
+    :param default: the default value to return if nothing can be found
+    :param for_byte_array: a byte string or compiled byte pattern to use with regex in the event that the value is a
+    bytearray such that the expected string will be extracted
+    :return: value: the first valid value associated with the tag
+    """
     # Additional for loop for types
     while default in detected_values:
         detected_values.remove(default)
@@ -150,68 +213,320 @@ def get_dicom_value(data: pydicom.Dataset, tags: List[List[tuple]], default=None
     return default
 
 
-def create_import_summary(import_summaries: list, config: dict):
+class DICOM_TagPlan:
+    """
+    Compiled form of a tags dictionary. All pathways are merged into a single tree of pre-converted tags, such that
+    one traversal of a DICOM header resolves every pathway of every key, with each shared Sequence only visited once.
+    Resolving a pathway follows the same rules as get_value and choosing among them the same rules as get_dicom_value
+    """
+    _MISSING = object()
+
+    def __init__(self, tags_dict: dict):
+        """
+        :param tags_dict: a dict whose values are dicts with a "tags" key describing the pathways to a value, a
+        "default" key, and optionally a "for_byte_array" key
+        """
+        path_ids = {}
+        self.tree = {}
+        plans = []
+        for key, value in tags_dict.items():
+            key_path_ids = []
+            for tag_set in value["tags"]:
+                path = tuple(Tag(step) for step in tag_set)
+                if path not in path_ids:
+                    path_ids[path] = len(path_ids)
+                    node = self.tree
+                    for step in path[:-1]:
+                        node = node.setdefault(step, ([], {}))[1]
+                    node.setdefault(path[-1], ([], {}))[0].append(path_ids[path])
+                key_path_ids.append(path_ids[path])
+            for_byte_array = value.get("for_byte_array", None)
+            plans.append((key, tuple(key_path_ids), value["default"],
+                          re.compile(for_byte_array) if for_byte_array else None))
+        self.n_paths = len(path_ids)
+        self.plans = tuple(plans)
+
+    def _resolve(self, subset, node: dict, results: list):
+        for tag, (ending_path_ids, children) in node.items():
+            element = subset.get(tag)
+            if element is None or not hasattr(element, "value"):
+                continue
+            item = element.value
+            b_sequence = isinstance(item, pydicom.Sequence) and len(item) > 0
+            for path_id in ending_path_ids:
+                if isinstance(item, pydicom.DataElement):
+                    results[path_id] = item.value
+                else:
+                    results[path_id] = None if b_sequence else item
+            if children and b_sequence and not isinstance(item, pydicom.DataElement):
+                self._resolve(item[0], children, results)
+
+    def extract(self, data: pydicom.Dataset) -> dict:
+        """
+        Retrieves the value of every key of the compiled tags dictionary from a DICOM header
+        :param data: the dicom data as a Pydicom Dataset object
+        :return: values: a dict of the value of each key, or its default if nothing could be found
+        """
+        results = [self._MISSING] * self.n_paths
+        self._resolve(data, self.tree, results)
+        values = {}
+        for key, key_path_ids, default, for_byte_array in self.plans:
+            detected_values = [default if results[path_id] is self._MISSING else results[path_id]
+                               for path_id in key_path_ids]
+            values[key] = select_dicom_value(detected_values, default=default, for_byte_array=for_byte_array)
+        return values
+
+
+def get_header_tags(tags_dict: dict, extra_tags: List[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
+    """
+    Convenience function for determining which top-level DICOM tags must be read in order to satisfy the tag pathways
+    of a tags dictionary. Nested tags are reached through their top-level Sequence, so only the first step of each
+    pathway is required.
+    :param tags_dict: a dict whose values are dicts with a "tags" key describing the pathways to a value
+    :param extra_tags: additional top-level tags that should be read regardless of the tags dictionary
+    :return: header_tags: the sorted list of top-level tags to read
     """
-    Given a list of individual summaries of each subject/visit/scan, this function will bring all those givens
-    together into a single dataframe for easy viewing
-    :param import_summaries: a list of dicts, with each dict being the parameters of that subject-visit-scan
+    header_tags = set() if extra_tags is None else set(extra_tags)
+    for value in tags_dict.values():
+        for tag_set in value["tags"]:
+            # Some pathways are given as a single tuple rather than a list of tuples
+            header_tags.add(tag_set[0] if isinstance(tag_set[0], tuple) else tuple(tag_set))
+    return sorted(header_tags)
+
+
+def read_dicom_header(dcm_file: Union[Path, BinaryIO],
+                      specific_tags: List[Tuple[int, int]] = None) -> pydicom.Dataset:
+    """
+    Convenience function for reading only the header of a DICOM file. Parsing stops before the pixel data and, if
+    specific tags are given, all other top-level elements are skipped over.
+    :param dcm_file: the filepath to the DICOM file or the DICOM file opened in binary mode
+    :param specific_tags: the top-level tags to read. If None, the entire header is read
+    :return: the header as a Pydicom Dataset object
+    """
+    return pydicom.dcmread(dcm_file if hasattr(dcm_file, "read") else str(dcm_file), stop_before_pixels=True,
+                           specific_tags=specific_tags)
+
+
+def get_source_fingerprint(dcm_dir: Path) -> dict:
+    """
+    Convenience function for cheaply fingerprinting the contents of a DICOM directory without reading any files
+    :param dcm_dir: the DICOM directory
+    :return: a dict of the file count, total size in bytes, and the most recent modification time in nanoseconds
+    """
+    n_files, total_size, max_mtime = 0, 0, 0
+    with os.scandir(dcm_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stat_result = entry.stat()
+            n_files += 1
+            total_size += stat_result.st_size
+            max_mtime = max(max_mtime, stat_result.st_mtime_ns)
+    return {"FileCount": n_files, "TotalSize": total_size, "MaxMtime": max_mtime}
+
+
+# The short names under which the usage of each conversion stage is recorded in the import summary, in the order in
+# which the stages run
+STAGE_ABBREVIATIONS = {"Getting File Structure Components": "Structure",
+                       "Acquiring Additional DICOM Parms": "DICOMParms",
+                       "Generating a TEMP Destination": "TempDst",
+                       "DCM2NIIX Conversion": "DCM2NIIX",
+                       "NIFTI Cleanup": "NIFTICleanup",
+                       "Post-Processing JSON sidecar and NIFTI files": "PostProcessing"}
+STAGE_METRICS = ["WallTime", "CPUTime", "BytesRead", "BytesWritten"]
+STAGE_SUMMARY_KEYS = [f"{abbreviation}{metric}" for abbreviation in STAGE_ABBREVIATIONS.values()
+                      for metric in STAGE_METRICS]
+
+# ASL4D series larger than this many bytes are concatenated into a memory-mapped file in the TEMP directory
+CONCAT_MEMMAP_THRESHOLD = 2 * 1024 ** 3
+
+# Import settings that have no bearing on the produced NIFTI and JSON files
+MANIFEST_IGNORED_KEYS = {"Header Samples", "Number of Workers", "Incremental Import", "Scratch Directory",
+                         "Compression Level", "Batch DCM2NIIX", "Skip Duplicate Series"}
+
+
+def get_import_config_hash(config: dict, b_legacy: bool) -> str:
+    """
+    Convenience function for hashing the parts of the import configuration that determine the import outputs
+    :param config: the import configuration
+    :param b_legacy: whether the import is in legacy format (True) or BIDS format (False)
+    :return: the hex digest of the hash
+    """
+    relevant_config = {key: value for key, value in config.items() if key not in MANIFEST_IGNORED_KEYS}
+    relevant_config["Legacy"] = b_legacy
+    return hashlib.sha1(json.dumps(relevant_config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_default_scratch_dir() -> Path:
+    """
+    Convenience function for the default location of the TEMP directories that DCM2NIIX writes into. Prefers the
+    RAM-backed /dev/shm where available, otherwise the temporary directory of the system (which respects $TMPDIR)
+    :return: the default scratch directory
+    """
+    shm_dir = Path("/dev/shm")
+    if shm_dir.is_dir() and os.access(shm_dir, os.W_OK | os.X_OK):
+        return shm_dir
+    return Path(tempfile.gettempdir())
+
+
+def get_dir_size(directory: Path) -> int:
+    """
+    Convenience function for the total size of the files directly within a directory
+    :param directory: the directory
+    :return: the total size in bytes
+    """
+    with os.scandir(directory) as entries:
+        return sum(entry.stat().st_size for entry in entries if entry.is_file())
+
+
+# The columns of the import summary, in the order they are written
+SUMMARY_COLUMNS = ['subject', 'visit', 'run', 'scan', 'Manufacturer', 'dx', 'dy', 'dz', 'dt', 'nx', 'ny', 'nz', 'nt',
+                   *STAGE_SUMMARY_KEYS, "RepetitionTime", "EchoTime", "NumberOfAverages", "RescaleSlope",
+                   "RescaleIntercept", "MRScaleSlope", "AcquisitionTime", "AcquisitionMatrix", "TotalReadoutTime",
+                   "EffectiveEchoSpacing", "ScratchIOSaved", "CompressionRatio", "CompressionTime", "DuplicateOf",
+                   "DuplicateSkipped"]
+
+
+class ImportSummaryWriter:
+    """
+    Writes the import summary as the DICOM directories finish: each summary is appended as a row of the TSV file
+    straight away, such that a partial summary exists even if the import is terminated and memory does not grow with
+    the number of scans. Once the import is done, the rows are sorted in a single pass
+    """
+
+    def __init__(self, summary_path: Union[Path, str]):
+        """
+        :param summary_path: the filepath of the TSV file. It is only created once the first row arrives
+        """
+        self.summary_path = Path(summary_path)
+        self.summary_file = None
+        self.summary_writer = None
+        self.n_rows = 0
+
+    def append(self, summary_data: dict):
+        """
+        Appends the summary of a converted DICOM directory as a row
+        :param summary_data: the givens of the scan, as returned by convert_dicom_directory or finalize_dicom_directory
+        """
+        if self.summary_file is None:
+            self.summary_path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                self.summary_file = open(self.summary_path, "w", newline="")
+            except PermissionError:
+                self.summary_path = self.summary_path.with_name(f"{self.summary_path.stem}_copy.tsv")
+                self.summary_file = open(self.summary_path, "w", newline="")
+            self.summary_writer = csv.writer(self.summary_file, delimiter="\t")
+            self.summary_writer.writerow(SUMMARY_COLUMNS)
+
+        row = dict(summary_data, dt=summary_data.get("RepetitionTime"))
+        self.summary_writer.writerow(["n/a" if row.get(column) is None else row[column] for column in SUMMARY_COLUMNS])
+        self.summary_file.flush()
+        self.n_rows += 1
+
+    def close(self):
+        if self.summary_file is not None:
+            self.summary_file.close()
+            self.summary_file = None
+
+    def finalize(self, logger: logging.Logger = logging.getLogger()) -> Union[pd.DataFrame, None]:
+        """
+        Closes the TSV file and rewrites it with its rows sorted by scan, subject, visit, and run
+        :param logger: the logging object that records how many conversions were avoided by skipping duplicate series
+        :return: the sorted import summary or None if no rows were written
+        """
+        self.close()
+        if self.n_rows == 0:
+            return None
+        with open(self.summary_path, newline="") as summary_reader:
+            df = pd.DataFrame.from_records(list(csv.DictReader(summary_reader, delimiter="\t")),
+                                           columns=SUMMARY_COLUMNS)
+        # Missing visits and runs sort last
+        df = df.sort_values(by=["scan", "subject", "visit", "run"],
+                            key=lambda column: column.replace("n/a", np.nan)).reset_index(drop=True)
+        print(df)
+        n_duplicates = int((df["DuplicateOf"] != "n/a").sum())
+        if n_duplicates > 0:
+            logger.info(f"{n_duplicates} DICOM directories held a series that was already part of the import. "
+                        f"Conversions avoided by skipping them: {int((df['DuplicateSkipped'] == 'True').sum())}")
+        df.to_csv(self.summary_path, sep='\t', index=False)
+        return df
+
+
+def create_import_profile(summary_df: pd.DataFrame, config: dict, logger: logging.Logger = logging.getLogger()):
+    """
+    Aggregates the per-stage usage of each converted DICOM directory into a profile of the median and 95th percentile
+    per scan type and vendor, such that the bottleneck stage of a dataset can be determined
+    :param summary_df: the import summary, as returned by ImportSummaryWriter.finalize
     :param config: the import configuration file generated by the GUI to help locate the analysis directory
+    :param logger: the logging object that records the profile
     """
     analysis_dir = Path(config["RawDir"]).parent / "analysis"
-    try:
-        df = pd.concat([pd.Series(import_summary) for import_summary in import_summaries], axis=1, sort=True).T
-    except ValueError as concat_error:
-        print(concat_error)
+    df = summary_df[["scan", "Manufacturer"]].replace("n/a", np.nan)
+    df = df.join(summary_df[STAGE_SUMMARY_KEYS].apply(pd.to_numeric, errors="coerce"))
+    # DICOM directories skipped by an incremental import did not run any stage
+    df = df.dropna(subset=STAGE_SUMMARY_KEYS, how="all")
+    if len(df) == 0:
+        logger.info("create_import_profile found no DICOM directories with recorded stage usage")
         return
-
-    df["dt"] = df["RepetitionTime"]
-    appropriate_ordering = ['subject', 'visit', 'run', 'scan', 'dx', 'dy', 'dz', 'dt', 'nx', 'ny', 'nz', 'nt',
-                            "RepetitionTime", "EchoTime", "NumberOfAverages", "RescaleSlope", "RescaleIntercept",
-                            "MRScaleSlope", "AcquisitionTime",
-                            "AcquisitionMatrix", "TotalReadoutTime", "EffectiveEchoSpacing"]
-    df = df.reindex(columns=appropriate_ordering)
-    df = df.sort_values(by=["scan", "subject", "visit", "run"]).reset_index(drop=True)
-    print(df)
+    df["Manufacturer"] = df["Manufacturer"].fillna("Unknown")
+
+    profile = []
+    for (scan, manufacturer), group in df.groupby(["scan", "Manufacturer"]):
+        total_wall_time = sum(group[f"{abbreviation}WallTime"].sum() for abbreviation in STAGE_ABBREVIATIONS.values())
+        for abbreviation in STAGE_ABBREVIATIONS.values():
+            row = {"scan": scan, "Manufacturer": manufacturer, "Stage": abbreviation, "N": len(group)}
+            for metric in STAGE_METRICS:
+                values = group[f"{abbreviation}{metric}"]
+                row[f"{metric}_p50"], row[f"{metric}_p95"] = values.quantile(0.5), values.quantile(0.95)
+            # The share of the total wall time shows the bottleneck stage at a glance
+            row["WallTimeShare"] = group[f"{abbreviation}WallTime"].sum() / total_wall_time \
+                if total_wall_time > 0 else 0.
+            profile.append(row)
+    profile = pd.DataFrame(profile)
+    logger.info(f"Per-stage profile of the import:\n{profile}")
     now_str = datetime.now().strftime("%a-%b-%d-%Y %H-%M-%S")
     try:
-        df.to_csv(analysis_dir / f"Import_Dataframe_{now_str}.tsv", sep='\t', index=False, na_rep='n/a')
+        profile.to_csv(analysis_dir / f"Import_Profile_{now_str}.tsv", sep='\t', index=False, na_rep='n/a')
     except PermissionError:
-        df.to_csv(analysis_dir / f"Import_Dataframe_{now_str}_copy.tsv", sep='\t', index=False, na_rep='n/a')
+        profile.to_csv(analysis_dir / f"Import_Profile_{now_str}_copy.tsv", sep='\t', index=False, na_rep='n/a')
 
 
-def bids_m0_followup(analysis_dir: Path):
+def bids_m0_followup(analysis_dir: Path, logger: logging.Logger = logging.getLogger()):
     """
-    In a BIDS import, this function will run through the imported dataset and adjust any BIDS-standard fields that
-    should be present in the m0scan.json sidecar, such as "IntendedFor"
+    In a BIDS import, this function will adjust any BIDS-standard fields that should be present in the m0scan.json
+    sidecar, such as "IntendedFor". The ASL/M0 pairs are taken from the BIDS manifest of the importer rather than by
+    searching the study, and the M0 sidecars are rewritten in parallel
     :param analysis_dir: the absolute path to the analysis directory
+    :param logger: the logging object that records the sidecars which could not be found or updated
     """
-    m0_jsons = peekable(analysis_dir.rglob("*_m0scan.json"))
-    if not m0_jsons:
-        print("bids_m0_followup could not find any _m0scan.json files")
+    intended_for = {}
+    for asl_json, m0_json in get_bids_asl_m0_pairs(analysis_dir, logger=logger):
+        asl_nifti = get_sidecar_nifti(asl_json)
+        # Ensure that the asl json sidecar and nifti images actually exist adjacent to the m0scan.json
+        if m0_json is None or not asl_json.exists() or asl_nifti is None:
+            continue
+        # BIDS standard: the "IntendedFor" filepath must be relative to the subject (exclusive)
+        # and contain forward slashes
+        intended_for[m0_json] = "/".join(asl_nifti.relative_to(analysis_dir).parts[1:])
+    if len(intended_for) == 0:
+        logger.info("bids_m0_followup could not find any _m0scan.json files")
         return
-    for m0_json in m0_jsons:
-        asl_json = m0_json.with_name("_asl.json")
-        asl_nifti = m0_json.with_name("_asl.nii")
 
-        # Ensure that the asl json sidecar and nifti images actually exist adjacent to the m0scan.json
-        if asl_json.exists() and asl_nifti.exists():
-            # BIDS standard: the "IntendedFor" filepath must be relative to the subject (exclusive)
-            # and contain forward slashes
-            truncated_asl_nifti = str(asl_nifti).replace(str(analysis_dir), "").replace("\\", "/")
-            by_parts = truncated_asl_nifti.split(sep='/')
-            truncated_asl_nifti = "/".join(by_parts[2:])
+    def set_intended_for(m0_json: Path, m0_parms: dict):
+        m0_parms["IntendedFor"] = intended_for[m0_json]
 
-            with open(m0_json) as m0_json_reader:
-                m0_parms = json.load(m0_json_reader)
-            m0_parms["IntendedFor"] = truncated_asl_nifti
-            with open(m0_json, 'w') as m0_json_writer:
-                json.dump(m0_parms, m0_json_writer, indent=3)
+    _, failures = update_json_sidecars(list(intended_for), set_intended_for)
+    for m0_json, reason in failures.items():
+        logger.warning(f"bids_m0_followup could not set the IntendedFor field of {m0_json}: {reason}")
 
 
 class DCM2NIFTI_Converter:
-    def __init__(self, config: dict, name: str, logger: logging.Logger, b_legacy: bool = True):
+    def __init__(self, config: dict, name: str, logger: logging.Logger, b_legacy: bool = True,
+                 b_use_header_index: bool = True):
         """
-        Class to perform DCM2NIFTI Conversion & Logging
+        Class to perform DCM2NIFTI Conversion & Logging. The logger is expected to already have its handlers, i.e. a
+        queue logger of the import's StudyLogService. Converters that only resolve destinations (i.e. the import
+        planner) should not use the header index, as opening it creates (and possibly clears) a file in the RawDir
         """
         self.config: dict = config
         self.b_legacy: bool = b_legacy
@@ -220,10 +535,7 @@ class DCM2NIFTI_Converter:
 
         # Prepare the logging credentials
         self.logger: logging.Logger = logger
-        self.handler = logging.FileHandler(filename=self.path_sourcedir / f"tmpImport_{name}.log", mode="w")
-        self.handler.setFormatter(logging.Formatter(fmt="%(asctime)s - %(name)s - %(levelname)s\n%(message)s"))
-        self.handler.setLevel(logging.DEBUG)
-        self.logger.addHandler(self.handler)
+        self.b_verbose: bool = True  # Whether messages are also printed to the console
 
         # Other attributes
         # Prep a translator that maps scan aliases to standard names (i.e. "ASL4D", "M0", etc.)
@@ -272,24 +584,166 @@ class DCM2NIFTI_Converter:
                 "default": None,
                 "for_byte_array": b'\x18\x00%\x90\x04\x00\x00\x00(FAT|WATER|NONE|FAT_AND_WATER)'}
         }
+        # Only the top-level tags needed by the tags_dict (plus Manufacturer, series identifiers, and GE temporal tags)
+        # are read
+        self.header_tags: List[Tuple[int, int]] = get_header_tags(self.tags_dict,
+                                                                  extra_tags=[(0x0008, 0x0070), (0x0019, 0x0010),
+                                                                              (0x0020, 0x000E), (0x0020, 0x0011),
+                                                                              (0x0020, 0x0105), (0x0020, 0x1002)])
+        # The pathways are compiled once; the record plan also decides whether the tags_dict plan is needed at all
+        self.tags_plan = DICOM_TagPlan(self.tags_dict)
+        self.record_plan = DICOM_TagPlan({
+            "Manufacturer": {"tags": [[(0x0008, 0x0070)], [(0x0019, 0x0010)]], "default": None},
+            "SeriesNumber": {"tags": [[(0x0020, 0x0011)]], "default": None},
+            "SeriesInstanceUID": {"tags": [[(0x0020, 0x000E)]], "default": None},
+            "AcquisitionTime": {"tags": [[(0x0008, 0x0032)]], "default": None},
+            "NumberOfTemporalPositions": {"tags": [[(0x0020, 0x0105)]], "default": None},
+            "ImagesInAcquisition": {"tags": [[(0x0020, 0x1002)]], "default": None},
+            "AcquisitionMatrixBackup": {"tags": [[(0x5200, 0x9230), (0x0021, 0x10FE), (0x0021, 0x1058)]],
+                                        "default": None}
+        })
+        # How many DICOM files should be sampled and checked for agreement; 1 stops after the first valid file
+        self.n_header_samples: int = max(int(self.config.get("Header Samples", 1)), 1)
+
+        # Incremental imports skip DICOM directories whose manifest shows them to be unchanged
+        self.b_incremental: bool = self.config.get("Incremental Import", False)
+        self.config_hash: str = get_import_config_hash(self.config, b_legacy=self.b_legacy)
+
+        # DCM2NIIX writes into a TEMP directory on fast local storage, such that only the final files reach the study
+        scratch_dir = self.config.get("Scratch Directory", "")
+        self.path_scratchdir: Path = Path(scratch_dir) if scratch_dir else get_default_scratch_dir()
+
+        # DICOM directories holding the same series as another DICOM directory of the import are skipped or flagged
+        self.b_skip_duplicates: bool = self.config.get("Skip Duplicate Series", True)
+
+        # DCM2NIIX may convert all DICOM directories of a subject at once, which each converter then takes its share of
+        self.b_batch_dcm2niix: bool = self.config.get("Batch DCM2NIIX", False)
+        self.n_levels_subject: int = self.config["Directory Structure"].index("Subject") + 1
+
+        # The final NIFTI may be gzip-compressed, with its chunks spread over several threads of the finalizer
+        self.b_compress: bool = self.config.get("Compress Output", False)
+        self.compression_level: int = int(self.config.get("Compression Level", 6))
+        self.n_compression_threads: int = max(2, get_usable_cpu_count() // max(self.config.get("Number of Workers",
+                                                                                               1), 1))
+
+        # The header index allows re-imports of unchanged DICOM files to skip reading their headers altogether
+        spec_hash = hashlib.sha1(repr((self.tags_dict, self.header_tags)).encode()).hexdigest()
+        self.header_index: Union[DICOM_HeaderIndex, None] = None
+        if b_use_header_index:
+            try:
+                self.header_index = DICOM_HeaderIndex(get_header_index_path(self.path_sourcedir), spec_hash=spec_hash)
+            except sqlite3.Error as index_error:
+                self.logger.warning(f"The header index could not be opened and will not be used: {index_error}")
         self.summary_data = {}
+        self.stage_usage = {"CPUTime": 0., "BytesRead": 0, "BytesWritten": 0}
+        # Set by the import pools when the import is terminated; conversions then stop at the next stage boundary
+        self.cancel_event = None
         self.logger.info(f"Initialized Logger for {name}")
 
+    # The attributes that carry a DICOM directory from the conversion stages over to the finalization stages
+    STATE_ATTRIBUTES = ("subject", "visit", "run", "scan", "subject_dst_name", "visit_dst_name", "run_dst_name",
+                        "scan_dst_name", "path_dstdir", "path_tempdir", "b_tempdir_in_scratch", "header_record",
+                        "dcm_info", "summary_data", "source_fingerprint", "processing_time")
+
     def process_dcm_dir(self, dcm_dir: Path):
-        module_names = ["Getting File Structure Components", "Generating a TEMP Destination",
-                        "Acquiring Additional DICOM Parms",
-                        "DCM2NIIX Conversion", "NIFTI Cleanup", "Post-Processing JSON sidecar and NIFTI files"]
-        funcs = [self.get_structure_components, self.get_tempdst_dirname, self.get_additional_dicom_parms,
-                 self.run_dcm2niix, self.process_niftis_in_temp, self.update_final_json_and_nifti]
+        """
+        Runs all stages of the conversion of a DICOM directory in sequence
+        """
+        success, job_description = self.convert_dcm_dir(dcm_dir)
+        if not success or self.b_skipped:
+            return success, job_description
+        return self.finalize_dcm_dir(dcm_dir)
+
+    def convert_dcm_dir(self, dcm_dir: Path):
+        """
+        Runs the stages up to and including the DCM2NIIX conversion, leaving the outputs in the TEMP directory. Sets
+        the b_skipped attribute if this was an incremental import of an unchanged DICOM directory
+        """
+        module_names = ["Getting File Structure Components", "Acquiring Additional DICOM Parms",
+                        "Generating a TEMP Destination", "DCM2NIIX Conversion"]
+        funcs = [self.get_structure_components, self.get_additional_dicom_parms, self.get_tempdst_dirname,
+                 self.run_dcm2niix]
 
-        self.summary_data.clear()
+        self.summary_data = {}
+        self.b_skipped = False
+        self.duplicate_of = None
+        self.path_tempdir, self.b_tempdir_in_scratch = None, False
+        self.processing_time = 0.
+        start_time = perf_counter()
         start_str = f"START PROCESSING DICOM DIR {str(dcm_dir)}\n"
         self.logger.info("%" * len(start_str) + "\n" +
                          start_str +
                          "%" * len(start_str) + "\n")
+
+        # Incremental imports skip DICOM directories that are unchanged since their last successful conversion
+        self.source_fingerprint = get_source_fingerprint(dcm_dir)
+        manifest = self.read_manifest(dcm_dir)
+        if self.b_incremental and self.is_manifest_current(manifest, self.source_fingerprint):
+            # The stage usage of the previous import does not belong to this one
+            self.summary_data.update({key: value for key, value in manifest["Summary"].items()
+                                      if key not in STAGE_SUMMARY_KEYS}, ScratchIOSaved=0)
+            self.summary_data["JSONPath"] = next((output_path for output_path in manifest["Outputs"]
+                                                  if output_path.endswith(".json")), None)
+            # Even unchanged DICOM directories hold a series that later DICOM directories may duplicate
+            self.register_series(dcm_dir, self.summary_data.get("SeriesInstanceUID"))
+            self.b_skipped = True
+            self.release_dcm2niix_batch(dcm_dir)
+            self.print_and_log(f"SKIPPED IMPORT: unchanged since the import of {manifest['Timestamp']}\n\n", "info")
+            return True, f"{str(dcm_dir)} was unchanged since its last conversion and was skipped"
+        # Any previous manifest no longer holds once the outputs start being overwritten
+        self.get_manifest_path(dcm_dir).unlink(missing_ok=True)
+
+        # The headers are read before anything is created, such that a duplicate series leaves no trace in the study
+        success, job_description = self.run_stages(dcm_dir, funcs[:2], module_names[:2])
+        if success and self.duplicate_of is not None and self.b_skip_duplicates:
+            self.summary_data.update(subject=self.subject_dst_name, visit=self.visit_dst_name, run=self.run_dst_name,
+                                     scan=self.scan_dst_name, Manufacturer=self.dcm_info.get("Manufacturer"),
+                                     DuplicateSkipped=True)
+            self.b_skipped = True
+            self.release_dcm2niix_batch(dcm_dir)
+            # The manifest keeps incremental imports from converting the duplicate should it be reached first next time
+            self.write_manifest(dcm_dir, self.source_fingerprint)
+            self.print_and_log(f"SKIPPED IMPORT: the series is already imported from {self.duplicate_of}\n\n", "info")
+            return True, f"{str(dcm_dir)} held the same series as {self.duplicate_of} and was skipped"
+        if success:
+            success, job_description = self.run_stages(dcm_dir, funcs[2:], module_names[2:])
+        self.release_dcm2niix_batch(dcm_dir)
+        self.processing_time += perf_counter() - start_time
+        # A failed conversion leaves its TEMP directory for inspection, but not at the expense of scratch space, nor if
+        # the import was terminated
+        if not success and (self.b_tempdir_in_scratch or self.is_cancelled()):
+            self.cleanup()
+        return success, job_description
+
+    def finalize_dcm_dir(self, dcm_dir: Path):
+        """
+        Runs the stages that turn the TEMP directory outputs of DCM2NIIX into the final NIFTI and JSON files
+        """
+        module_names = ["NIFTI Cleanup", "Post-Processing JSON sidecar and NIFTI files"]
+        funcs = [self.process_niftis_in_temp, self.update_final_json_and_nifti]
+        start_time = perf_counter()
+        success, job_description = self.run_stages(dcm_dir, funcs, module_names)
+        self.processing_time += perf_counter() - start_time
+        if not success:
+            if self.b_tempdir_in_scratch or self.is_cancelled():
+                self.cleanup()
+            return success, job_description
+
+        self.print_and_log(f"SUCCESSFUL IMPORT\n\n", msg_type="info")
+        self.cleanup()
+        self.write_manifest(dcm_dir, self.source_fingerprint)
+        return True, f"{str(dcm_dir)} was correctly converted from DICOM to NIFTI format"
+
+    def run_stages(self, dcm_dir: Path, funcs: list, module_names: List[str]):
         for func, desc in zip(funcs, module_names):
+            if self.is_cancelled():
+                self.print_and_log(f"The import was terminated prior to Module - {desc}", msg_type="warning")
+                return False, f"\nCANCELLED DICOM DIRECTORY {str(dcm_dir)} prior to section {desc}"
             self.logger.info(f"Beginning Module - {desc}")
+            self.stage_usage = {"CPUTime": 0., "BytesRead": 0, "BytesWritten": 0}
+            start_time, start_cpu_time = perf_counter(), thread_time()
             successfully_completed = func(dcm_dir)
+            self.record_stage_usage(desc, perf_counter() - start_time, thread_time() - start_cpu_time)
             if not successfully_completed:
                 return False, f"\nERROR_LISTING FOR DICOM DIRECTORY WITH GIVENS:\n\t" \
                               f"SUBECT: {self.subject}\n\t" \
@@ -299,19 +753,112 @@ class DCM2NIFTI_Converter:
                               f"ERROR at section {desc}"
             else:
                 self.logger.info(f"Completed Module - {desc}\n")
+        return True, ""
 
-        self.print_and_log(f"SUCCESSFUL IMPORT\n\n", msg_type="info")
-        self.cleanup()
-        return True, f"{str(dcm_dir)} was correctly converted from DICOM to NIFTI format"
+    def add_stage_usage(self, cpu_time: float = 0., bytes_read: int = 0, bytes_written: int = 0):
+        """
+        Adds usage of the current stage that cannot be measured from the thread running it, such as the CPU time of
+        a subprocess or the bytes read and written
+        :param cpu_time: the CPU time in seconds spent outside the current thread
+        :param bytes_read: the bytes read from disk
+        :param bytes_written: the bytes written to disk
+        """
+        self.stage_usage["CPUTime"] += cpu_time
+        self.stage_usage["BytesRead"] += bytes_read
+        self.stage_usage["BytesWritten"] += bytes_written
+
+    def record_stage_usage(self, desc: str, wall_time: float, cpu_time: float):
+        abbreviation = STAGE_ABBREVIATIONS[desc]
+        self.summary_data[f"{abbreviation}WallTime"] = wall_time
+        self.summary_data[f"{abbreviation}CPUTime"] = cpu_time + self.stage_usage["CPUTime"]
+        self.summary_data[f"{abbreviation}BytesRead"] = self.stage_usage["BytesRead"]
+        self.summary_data[f"{abbreviation}BytesWritten"] = self.stage_usage["BytesWritten"]
+        self.logger.info(f"Module usage - {desc}: {wall_time:.3f} s wall; "
+                         f"{self.summary_data[f'{abbreviation}CPUTime']:.3f} s CPU; "
+                         f"{self.stage_usage['BytesRead'] / 1e6:.1f} MB read; "
+                         f"{self.stage_usage['BytesWritten'] / 1e6:.1f} MB written")
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def get_state(self) -> dict:
+        return {attribute: getattr(self, attribute) for attribute in self.STATE_ATTRIBUTES}
+
+    def set_state(self, state: dict):
+        for attribute, value in state.items():
+            setattr(self, attribute, value)
+        self.b_skipped = False
 
     def print_and_log(self, msg: str, msg_type: str = "error"):
         if msg_type in {"info", "warning", "error"}:
             getattr(self.logger, msg_type)(msg)
-        print(msg)
+        if self.b_verbose:
+            print(msg)
+
+    def get_manifest_path(self, dcm_dir: Path) -> Path:
+        relative_dcm_dir = str(dcm_dir.relative_to(self.path_sourcedir)).replace("\\", "/")
+        manifest_name = hashlib.sha1(relative_dcm_dir.encode()).hexdigest()
+        return self.path_sourcedir.parent / "analysis" / "Logs" / "Import Manifests" / f"{manifest_name}.json"
+
+    def read_manifest(self, dcm_dir: Path) -> Union[dict, None]:
+        try:
+            with open(self.get_manifest_path(dcm_dir)) as manifest_reader:
+                return json.load(manifest_reader)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def is_manifest_current(self, manifest: Union[dict, None], source_fingerprint: dict) -> bool:
+        """
+        Determines whether a DICOM directory can be skipped: its files, the import configuration, and all produced
+        outputs must be identical to when the manifest was written
+        :param manifest: the manifest of the previous conversion of the DICOM directory
+        :param source_fingerprint: the current fingerprint of the DICOM directory
+        :return: whether the previous conversion still holds
+        """
+        if manifest is None or manifest["Source Fingerprint"] != source_fingerprint or \
+                manifest["Config Hash"] != self.config_hash:
+            return False
+        # A skipped duplicate must still be converted once duplicates are no longer skipped
+        if manifest["Summary"].get("DuplicateSkipped", False) and not self.b_skip_duplicates:
+            return False
+        for output_path, output_size in manifest["Outputs"].items():
+            try:
+                if Path(output_path).stat().st_size != output_size:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def write_manifest(self, dcm_dir: Path, source_fingerprint: dict):
+        """
+        Records the successful conversion of a DICOM directory in analysis/Logs/Import Manifests. A DICOM directory
+        that was skipped as a duplicate series is recorded without outputs
+        :param dcm_dir: the DICOM directory that was converted
+        :param source_fingerprint: the fingerprint of the DICOM directory prior to its conversion
+        """
+        manifest = {"DICOM Directory": str(dcm_dir),
+                    "Timestamp": datetime.now().strftime("%a-%b-%d-%Y %H-%M-%S"),
+                    "Source Fingerprint": source_fingerprint,
+                    "Config Hash": self.config_hash,
+                    "Processing Time": self.processing_time,
+                    "Subject": self.subject_dst_name,
+                    "Visit": self.visit_dst_name,
+                    "Run": self.run_dst_name,
+                    "Scan": self.scan_dst_name,
+                    "Outputs": {} if self.b_skipped else {str(path): path.stat().st_size
+                                                          for path in [self.path_final_nifti, self.path_final_json]},
+                    "Summary": self.summary_data}
+        manifest_path = self.get_manifest_path(dcm_dir)
+        try:
+            manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(manifest_path, "w") as manifest_writer:
+                json.dump(manifest, manifest_writer, indent=3, default=str)
+        except OSError as manifest_error:
+            self.print_and_log(f"Could not write the import manifest {manifest_path}: {manifest_error}", "warning")
 
     def cleanup(self):
         # Remove the TEMP directory
-        if self.path_tempdir.exists():
+        if self.path_tempdir is not None and self.path_tempdir.exists():
             shutil.rmtree(path=str(self.path_tempdir), ignore_errors=True)
 
     def get_structure_components(self, dcm_dir: Path):
@@ -340,33 +887,74 @@ class DCM2NIFTI_Converter:
             else None
         return True
 
-    def get_tempdst_dirname(self, _):
+    def get_destination_paths(self) -> Tuple[Path, Path, Path]:
         """
-        Step 2: Determine the appropriate destination path for DCM2NIIX to act on
+        Determines where the scan given by the structure components of Step 1 will end up, without creating anything
+        :return: path_dstdir, the destination directory; path_final_nifti, the final NIFTI filepath; path_final_json,
+        the final JSON sidecar filepath
         """
         path_study_dir = self.path_sourcedir.parent / "analysis"
+        nifti_suffix = ".nii.gz" if self.b_compress else ".nii"
         # Non-BIDS FORMAT
         if self.b_legacy:
             subject_str = self.subject_dst_name
             visit_str = "" if self.visit_dst_name is None else f"_{self.visit_dst_name}"
             run_str = "ASL_1" if self.run_dst_name is None else self.run_dst_name
             if self.scan_dst_name not in {"T1", "T2", "FLAIR"}:
-                self.path_tempdir = path_study_dir / f"{subject_str}{visit_str}" / run_str / "TEMP"
+                path_dstdir = path_study_dir / f"{subject_str}{visit_str}" / run_str
             else:
-                self.path_tempdir = path_study_dir / f"{subject_str}{visit_str}" / "TEMP"
+                path_dstdir = path_study_dir / f"{subject_str}{visit_str}"
+            return (path_dstdir, path_dstdir / f"{self.scan_dst_name}{nifti_suffix}",
+                    path_dstdir / f"{self.scan_dst_name}.json")
+
         # BIDS FORMAT
+        # Get rid of illegal characters for subject
+        subject_str = self.subject_dst_name.replace("-", "").replace("_", "")
+        anat_or_perf = "anat" if self.scan_dst_name not in {"T1", "T2", "FLAIR"} else "perf"
+        if self.visit_dst_name is None:
+            path_dstdir = path_study_dir / f"sub-{subject_str}" / anat_or_perf
         else:
-            # Get rid of illegal characters for subject
-            subject_str = self.subject_dst_name.replace("-", "").replace("_", "")
-            anat_or_perf = "anat" if self.scan_dst_name not in {"T1", "T2", "FLAIR"} else "perf"
-            if self.visit_dst_name is None:
-                self.path_tempdir = path_study_dir / f"sub-{subject_str}" / anat_or_perf / "TEMP"
-            else:
-                # Get rid of illegal characters for visit
-                visit_str = self.visit_dst_name.replace("-", "").replace("_", "")
-                self.path_tempdir = path_study_dir / f"sub-{subject_str}" / f"ses-{visit_str}" / anat_or_perf / "TEMP"
+            # Get rid of illegal characters for visit
+            visit_str = self.visit_dst_name.replace("-", "").replace("_", "")
+            path_dstdir = path_study_dir / f"sub-{subject_str}" / f"ses-{visit_str}" / anat_or_perf
+        run_str = "" if self.run_dst_name is None else f"run-{self.run_dst_name.replace('-', '').replace('_', '')}"
+        visit_str = "" if self.visit_dst_name is None \
+            else f"ses-{self.visit_dst_name.replace('-', '').replace('_', '')}_"
+        scan_str = {"ASL4D": "asl", "M0": "m0scan", "T1": "T1w", "T2": "T2w", "FLAIR": "FLAIR"}[self.scan_dst_name]
+        basename_str = f"sub-{subject_str}_{visit_str}{run_str}{scan_str}"
+        return path_dstdir, path_dstdir / f"{basename_str}{nifti_suffix}", path_dstdir / f"{basename_str}.json"
 
-        self.path_tempdir.mkdir(parents=True, exist_ok=True)
+    def get_tempdst_dirname(self, _):
+        """
+        Step 3: Determine the appropriate destination path for DCM2NIIX to act on. This is a uniquely-named TEMP
+        directory within the scratch directory, unless the scratch directory lacks the space for the conversion
+        """
+        self.path_dstdir, self.path_final_nifti, self.path_final_json = self.get_destination_paths()
+        self.path_dstdir.mkdir(parents=True, exist_ok=True)
+
+        # The NIFTI output of DCM2NIIX is roughly the size of the DICOM files; the margin allows for the workers
+        # converting other DICOM directories into the same scratch directory at the same time
+        self.path_tempdir, self.b_tempdir_in_scratch = None, False
+        space_needed = 2 * self.source_fingerprint["TotalSize"]
+        try:
+            space_available = shutil.disk_usage(self.path_scratchdir).free
+            if space_available >= space_needed:
+                self.path_tempdir = Path(tempfile.mkdtemp(prefix=f"xASL_Import_{self.scan_dst_name}_",
+                                                          dir=self.path_scratchdir))
+                self.b_tempdir_in_scratch = True
+            else:
+                self.print_and_log(f"The scratch directory {self.path_scratchdir} only has {space_available} bytes "
+                                   f"free of the {space_needed} bytes needed. Falling back to the study directory",
+                                   msg_type="warning")
+        except OSError as scratch_error:
+            self.print_and_log(f"The scratch directory {self.path_scratchdir} could not be used: {scratch_error}. "
+                               f"Falling back to the study directory", msg_type="warning")
+
+        if not self.b_tempdir_in_scratch:
+            # Each scan receives its own TEMP directory, as scans sharing a destination directory (i.e. ASL4D and M0)
+            # may be converted at the same time by different workers
+            self.path_tempdir = self.path_dstdir / f"TEMP_{self.scan_dst_name}"
+            self.path_tempdir.mkdir(parents=True, exist_ok=True)
         msg = f"The DICOM directory will have its DICOM files temporarily converted to NIFTI format and output to:\n" \
               f"{str(self.path_tempdir)}"
         self.print_and_log(msg, "info")
@@ -374,37 +962,137 @@ class DCM2NIFTI_Converter:
 
     def get_additional_dicom_parms(self, dcm_dir: Path):
         """
-        Step 3: DCM2NIIX does not always retrieve the needed DICOM parameters, some must be retrieved
+        Step 2: DCM2NIIX does not always retrieve the needed DICOM parameters, some must be retrieved. Only the headers
+        are read, stopping after the first valid DICOM file unless more samples were requested in the config. Headers
+        already present in the header index are not read at all. The series of the first header also tells whether
+        another DICOM directory of the import holds the same series
         """
-        dcm_files = peekable(dcm_dir.glob("*"))
+        start_time = perf_counter()
+        header_records = self.get_header_records(dcm_dir)
+        if header_records is None:
+            return False
+        self.header_record: dict = header_records[0]
+
+        if self.header_record["Manufacturer"] is None:
+            self.print_and_log(f"The DICOM directory could not have its Manufacturer tag determined!!!", "error")
+            return False
+        if self.header_record["DICOM Info"] is None:
+            self.print_and_log(f"The DICOM directory did not have a manufacturer of either Philips, Siemens, or GE!!!",
+                               msg_type="error")
+            return False
+        self.dcm_info = dict(self.header_record["DICOM Info"])
+
+        # If several files were sampled, they must agree on everything except the per-slice acquisition time
+        disagreements = set()
+        for other_record in header_records[1:]:
+            other_info = other_record["DICOM Info"] or {}
+            disagreements.update(key for key, value in self.dcm_info.items()
+                                 if key != "AcquisitionTime" and other_info.get(key) != value)
+        if len(disagreements) > 0:
+            self.print_and_log(f"The {len(header_records)} sampled DICOM files disagreed on the following parameters: "
+                               f"{sorted(disagreements)}. The values of the first sampled file will be used.",
+                               msg_type="warning")
+
+        msg = "\n".join([f"The following DICOM Parameters were additionally extracted from {len(header_records)} "
+                         f"DICOM header(s) in {perf_counter() - start_time:.3f} seconds:"] +
+                        [f"\t{k}: {v}" for k, v in self.dcm_info.items()])
+        self.print_and_log(msg, msg_type="info")
+
+        self.summary_data["SeriesInstanceUID"] = self.header_record.get("SeriesInstanceUID")
+        self.duplicate_of = self.register_series(dcm_dir, self.summary_data["SeriesInstanceUID"])
+        if self.duplicate_of is not None:
+            self.summary_data.update(DuplicateOf=str(self.duplicate_of), DuplicateSkipped=False)
+            self.print_and_log(f"The DICOM directory holds the same series ({self.summary_data['SeriesInstanceUID']}, "
+                               f"{self.source_fingerprint['FileCount']} files) as {self.duplicate_of}", "warning")
+        return True
+
+    def register_series(self, dcm_dir: Path, series_uid: Union[str, None]) -> Union[Path, None]:
+        """
+        Records the series of a DICOM directory, fingerprinted by its SeriesInstanceUID and its number of files (i.e.
+        SOP instances), among the series of the import
+        :param dcm_dir: the DICOM directory
+        :param series_uid: the SeriesInstanceUID of the DICOM directory. If None, the series cannot be compared
+        :return: the DICOM directory that already holds the same series, or None if this series is new
+        """
+        if series_uid is None:
+            return None
+        with _series_registry_lock:
+            first_dcm_dir = _series_registry.setdefault((series_uid, self.source_fingerprint["FileCount"]), dcm_dir)
+        return None if first_dcm_dir == dcm_dir else first_dcm_dir
+
+    def get_header_records(self, dcm_dir: Path) -> Union[List[dict], None]:
+        """
+        Retrieves the header records of up to n_header_samples valid DICOM files in the directory, either from the
+        header index or by reading the headers. When more than one sample is requested, the samples are spread evenly
+        across the sorted directory listing.
+        :param dcm_dir: the directory containing the DICOM files
+        :return: the list of header records or None if the directory could not provide any
+        """
+        if self.n_header_samples == 1:
+            dcm_files = peekable(dcm_dir.iterdir())
+        else:
+            dcm_files = sorted(dcm_dir.iterdir())
+            stride = max(len(dcm_files) // self.n_header_samples, 1)
+            dcm_files = dcm_files[::stride] + [file for idx, file in enumerate(dcm_files) if idx % stride != 0]
         if not dcm_files:
             self.print_and_log(f"The DICOM directory was empty!", msg_type="error")
-            return False
+            return None
 
-        dcm_data = None
+        header_records, new_entries, n_index_hits = [], [], 0
         for dcm_file in dcm_files:
-
             if dcm_file.name.startswith("XX"):
                 continue
             try:
-                dcm_data = pydicom.read_file(dcm_file)
-            except (InvalidDicomError, PermissionError):
+                stat_result = dcm_file.stat()
+                hit, record = self.lookup_header_index(dcm_file, stat_result)
+                if hit:
+                    n_index_hits += 1
+                else:
+                    with open(dcm_file, "rb") as dcm_reader:
+                        try:
+                            record = self.get_header_record(read_dicom_header(dcm_reader,
+                                                                              specific_tags=self.header_tags))
+                        except InvalidDicomError:
+                            record = None
+                        self.add_stage_usage(bytes_read=dcm_reader.tell())
+                    new_entries.append((dcm_file, stat_result, record))
+            except PermissionError:
                 continue
             except IsADirectoryError:
                 self.print_and_log(f"Bad Folder Structure Provided! User probably forgot to indicate a DUMMY variable!",
                                    msg_type="error")
-                return False
-        if dcm_data is None:
+                return None
+            if record is None:
+                continue
+            header_records.append(record)
+            if len(header_records) == self.n_header_samples:
+                break
+
+        self.store_header_index(new_entries)
+        self.print_and_log(f"Header index: {n_index_hits} hit(s); {len(new_entries)} file(s) parsed", msg_type="info")
+        if len(header_records) == 0:
             self.print_and_log(f"The DICOM directory did not contain any valid DICOM files which could be parsed",
                                msg_type="error")
-            return False
-        else:
-            self.dcm_dataset: pydicom.Dataset = dcm_data
+            return None
+        return header_records
 
-        manufacturer = get_dicom_value(data=dcm_data, tags=[[(0x0008, 0x0070)], [(0x0019, 0x0010)]], default=None)
+    def get_header_record(self, dcm_data: pydicom.Dataset) -> dict:
+        """
+        Extracts everything this converter needs from a single DICOM header
+        :param dcm_data: the DICOM header as a Pydicom Dataset object
+        :return: record: a JSON-friendly dict of the Manufacturer, the DICOM Info of the tags_dict (None if the
+        Manufacturer is not supported), and the additional series-level givens
+        """
+        record_values = self.record_plan.extract(dcm_data)
+        manufacturer = record_values["Manufacturer"]
+        record = {"Manufacturer": manufacturer, "DICOM Info": None,
+                  "SeriesNumber": record_values["SeriesNumber"],
+                  "SeriesInstanceUID": record_values["SeriesInstanceUID"],
+                  "AcquisitionTime": record_values["AcquisitionTime"],
+                  "NumberOfTemporalPositions": record_values["NumberOfTemporalPositions"],
+                  "ImagesInAcquisition": record_values["ImagesInAcquisition"]}
         if manufacturer is None:
-            self.print_and_log(f"The DICOM directory could not have its Manufacturer tag determined!!!", "error")
-            return False
+            return record
         if "SIEMENS" in manufacturer.upper():
             manufacturer = "Siemens"
         elif "PHILIPS" in manufacturer.upper():
@@ -412,22 +1100,49 @@ class DCM2NIFTI_Converter:
         elif "GE" in manufacturer.upper():
             manufacturer = "GE"
         else:
-            self.print_and_log(f"The DICOM directory did not have a manufacturer of either Philips, Siemens, or GE!!!",
-                               msg_type="error")
-            return False
+            return record
+        record["DICOM Info"] = self.get_dcm_info(dcm_data=dcm_data, manufacturer=manufacturer,
+                                                 acq_matrix_backup=record_values["AcquisitionMatrixBackup"])
+        # Round-trip through JSON such that the record is identical whether it came from the index or the header
+        return json.loads(json.dumps(record, default=str))
+
+    def lookup_header_index(self, dcm_file: Path, stat_result: os.stat_result) -> Tuple[bool, Union[dict, None]]:
+        if self.header_index is None:
+            return False, None
         try:
-            if manufacturer != 'Philips':
-                del self.tags_dict["RealWorldValueSlope"]
-                del self.tags_dict["MRScaleSlope"]
-        except KeyError:
-            pass
+            return self.header_index.lookup(dcm_file, stat_result)
+        except sqlite3.Error as index_error:
+            self.print_and_log(f"The header index could not be read and will no longer be used: {index_error}",
+                               msg_type="warning")
+            self.header_index = None
+            return False, None
+
+    def store_header_index(self, entries: List[Tuple[Path, os.stat_result, Union[dict, None]]]):
+        if self.header_index is None:
+            return
+        try:
+            self.header_index.store(entries)
+        except sqlite3.Error as index_error:
+            self.print_and_log(f"The header index could not be written to and will no longer be used: {index_error}",
+                               msg_type="warning")
+            self.header_index = None
 
-        self.dcm_info = {}.fromkeys(self.tags_dict.keys())
-        self.dcm_info["Manufacturer"] = manufacturer
-        value: dict
-        for key, value in self.tags_dict.items():
-            result = get_dicom_value(data=dcm_data, tags=value["tags"], default=value["default"],
-                                     for_byte_array=value.get("for_byte_array", None))
+    def get_dcm_info(self, dcm_data: pydicom.Dataset, manufacturer: str, acq_matrix_backup=None) -> dict:
+        """
+        Extracts the values of the tags_dict from a DICOM header and applies the vendor-specific corrections
+        :param dcm_data: the DICOM header as a Pydicom Dataset object
+        :param manufacturer: one of "Siemens", "Philips", or "GE"
+        :param acq_matrix_backup: the "cols*rows" string to fall back on if the AcquisitionMatrix cannot be found
+        :return: dcm_info: the dict of extracted parameters
+        """
+        extracted_values = self.tags_plan.extract(dcm_data)
+        # The Philips-specific tags are not of interest for the other vendors
+        tags_dict = {key: value for key, value in self.tags_dict.items()
+                     if manufacturer == "Philips" or key not in {"RealWorldValueSlope", "MRScaleSlope"}}
+        dcm_info = {}.fromkeys(tags_dict.keys())
+        dcm_info["Manufacturer"] = manufacturer
+        for key in tags_dict.keys():
+            result = extracted_values[key]
             if isinstance(result, MultiValue):
                 result = list(result)
             # Additional processing for specific keys
@@ -437,9 +1152,8 @@ class DCM2NIFTI_Converter:
                 elif isinstance(result, list):
                     result = [int(number) for number in result]
                 elif result is None:
-                    backup = get_dicom_value(dcm_data, [[(0x5200, 0x9230), (0x0021, 0x10FE), (0x0021, 0x1058)]])
-                    if backup is not None:
-                        col, row = [int(x) for x in backup.split("*")]
+                    if acq_matrix_backup is not None:
+                        col, row = [int(x) for x in acq_matrix_backup.split("*")]
                         result = [row, 0, 0, col]
 
             # Convert any lingering strings to float
@@ -450,38 +1164,33 @@ class DCM2NIFTI_Converter:
                     except ValueError:
                         pass
 
-            self.dcm_info[key] = result
+            dcm_info[key] = result
             # Final corrections for Philips scans in particular
             if manufacturer == "Philips":
                 # First correction - disagreeing values between RescaleSlope and RealWorldValueSlope if they ended up
                 # in the same dicom. Choose the small value of the two and set it for both
-                if all([self.dcm_info["RescaleSlope"] is not None,
-                        self.dcm_info["RealWorldValueSlope"] is not None,
-                        self.dcm_info["RescaleSlope"] != 1,
-                        self.dcm_info["RealWorldValueSlope"] != 1,
-                        self.dcm_info["RescaleSlope"] != self.dcm_info["RealWorldValueSlope"]
+                if all([dcm_info["RescaleSlope"] is not None,
+                        dcm_info["RealWorldValueSlope"] is not None,
+                        dcm_info["RescaleSlope"] != 1,
+                        dcm_info["RealWorldValueSlope"] != 1,
+                        dcm_info["RescaleSlope"] != dcm_info["RealWorldValueSlope"]
                         ]):
-                    self.dcm_info["RescaleSlope"] = min([self.dcm_info["RescaleSlope"],
-                                                         self.dcm_info["RealWorldValueSlope"]])
-                    self.dcm_info["RealWorldValueSlope"] = min([self.dcm_info["RescaleSlope"],
-                                                                self.dcm_info["RealWorldValueSlope"]])
+                    dcm_info["RescaleSlope"] = min([dcm_info["RescaleSlope"], dcm_info["RealWorldValueSlope"]])
+                    dcm_info["RealWorldValueSlope"] = min([dcm_info["RescaleSlope"], dcm_info["RealWorldValueSlope"]])
 
                 # Second correction - just to ease things on the side of ExploreASL; if RescaleSlope could not be
                 # determined while "RealWorldValueSlope" could be, copy over the latter's value for the former
-                if all([self.dcm_info["RealWorldValueSlope"] is not None,
-                        self.dcm_info["RealWorldValueSlope"] != 1,
-                        self.dcm_info["RescaleSlope"] == 1]):
-                    self.dcm_info["RescaleSlope"] = self.dcm_info["RealWorldValueSlope"]
+                if all([dcm_info["RealWorldValueSlope"] is not None,
+                        dcm_info["RealWorldValueSlope"] != 1,
+                        dcm_info["RescaleSlope"] == 1]):
+                    dcm_info["RescaleSlope"] = dcm_info["RealWorldValueSlope"]
 
         # remove the "RealWorldValueSlope" as it is no longer needed
         try:
-            del self.dcm_info["RealWorldValueSlope"]
+            del dcm_info["RealWorldValueSlope"]
         except KeyError:
             pass
-        msg = "\n".join(["The following DICOM Parameters were additionally extracted:"] +
-                        [f"\t{k}: {v}" for k, v in self.dcm_info.items()])
-        self.print_and_log(msg, msg_type="info")
-        return True
+        return dcm_info
 
     def run_dcm2niix(self, dcm_dir: Path):
         """
@@ -497,29 +1206,180 @@ class DCM2NIFTI_Converter:
               f"\tRun: {self.run_dst_name}\n\tOutputTEMPDir: {self.path_tempdir}"
         self.print_and_log(msg, msg_type="info")
 
-        # Prepare the body of the main command
-        header = "" if system() == "Windows" else "./"
-        command = f"{header}dcm2niix -b y -z n -x n -t n -m n -s n -v n " \
-                  f"-f {output_filename_format} -o {str(self.path_tempdir)} {str(dcm_dir)}"
-
-        # Execute DCM2NIIX
-        if system() == "Windows":
-            result = subprocess.run(command.split(" "), creationflags=subprocess.CREATE_NO_WINDOW)
-            stderr, return_code = result.stderr, result.returncode
+        # In a batched import, the outputs may already await in the conversion of the whole subject
+        if self.b_batch_dcm2niix and self.claim_dcm2niix_batch_outputs(dcm_dir, output_filename_format[:-2]):
+            return_code, output = 0, ""
         else:
-            p = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE, stdout=subprocess.PIPE,
-                                 text=True, shell=True)
-            p.wait()
-            stdout, stderr = p.communicate()
-            return_code = p.returncode
+            return_code, output = self.execute_dcm2niix(dcm_dir, output_filename_format, self.path_tempdir)
 
         if return_code == 0:
             self.print_and_log(f"DCM2NIIX successfully converted files to NIFTI format!", msg_type="info")
+            # The TEMP files are written once and read back once; in scratch, neither happens on the study directory
+            temp_size = get_dir_size(self.path_tempdir)
+            self.add_stage_usage(bytes_read=self.source_fingerprint["TotalSize"], bytes_written=temp_size)
+            self.summary_data["ScratchIOSaved"] = 2 * temp_size if self.b_tempdir_in_scratch else 0
+            self.print_and_log(f"DCM2NIIX wrote {temp_size / 1e6:.1f} MB of TEMP files to the "
+                               f"{'scratch' if self.b_tempdir_in_scratch else 'study'} directory. Study directory "
+                               f"I/O saved: {self.summary_data['ScratchIOSaved'] / 1e6:.1f} MB", msg_type="info")
             return True
         else:
-            self.print_and_log(f"DCM2NIIX Did not exit gracefully!!!\nStd Err:\n{stderr}", msg_type="error")
+            self.print_and_log(f"DCM2NIIX Did not exit gracefully!!!\nOutput:\n{output}", msg_type="error")
+            return False
+
+    def execute_dcm2niix(self, input_dir: Path, output_filename_format: str, output_dir: Path) -> Tuple[int, str]:
+        """
+        Runs DCM2NIIX on a directory and waits for it to finish
+        :param input_dir: the directory to search for DICOM files
+        :param output_filename_format: the format of the output filenames, in the DCM2NIIX -f notation
+        :param output_dir: the directory to write the NIFTI and JSON files into
+        :return: return_code, the exit code of DCM2NIIX; output, the combined stdout and stderr of DCM2NIIX
+        """
+        # Prepare the body of the main command; as a list of arguments, paths with spaces need no quoting
+        command = [str(DCM2NIIX_PATH), "-b", "y", "-z", "n", "-x", "n", "-t", "n", "-m", "n", "-s", "n", "-v", "n",
+                   "-f", output_filename_format, "-o", str(output_dir), str(input_dir)]
+
+        # Execute DCM2NIIX; it is registered such that terminating the import can kill it (see kill_dcm2niix_processes)
+        if self.is_cancelled():
+            return -1, "The import was terminated"
+        # Outside of Windows, DCM2NIIX leads its own process group, such that a kill also reaches anything it started
+        popen_kwargs = {"creationflags": subprocess.CREATE_NO_WINDOW} if system() == "Windows" else \
+            {"start_new_session": True}
+        p = subprocess.Popen(command, stdin=subprocess.DEVNULL, stderr=subprocess.STDOUT, stdout=subprocess.PIPE,
+                             text=True, **popen_kwargs)
+        with _dcm2niix_processes_lock:
+            _dcm2niix_processes.add(p)
+        # The termination may have come in between the check above and the registration
+        if self.is_cancelled():
+            kill_dcm2niix_processes()
+        try:
+            output = p.stdout.read()
+            p.stdout.close()
+            try:
+                if not hasattr(os, "wait4"):
+                    raise ChildProcessError
+                # Reaping DCM2NIIX directly also yields its CPU time, which the CPU time of this thread does not include
+                _, wait_status, resource_usage = os.wait4(p.pid, 0)
+                p.returncode = os.WEXITSTATUS(wait_status) if os.WIFEXITED(wait_status) else \
+                    -os.WTERMSIG(wait_status)
+                self.add_stage_usage(cpu_time=resource_usage.ru_utime + resource_usage.ru_stime)
+            except ChildProcessError:
+                # Either wait4 is unavailable or a kill of the import already reaped the process
+                p.wait()
+        finally:
+            with _dcm2niix_processes_lock:
+                _dcm2niix_processes.discard(p)
+        return p.returncode, output
+
+    def get_dcm2niix_batch(self, dcm_dir: Path) -> "DCM2NIIX_Batch":
+        """
+        Retrieves the batch of the subject of a DICOM directory, creating it if this is the first DICOM directory of
+        the subject to ask for it
+        :param dcm_dir: the DICOM directory
+        :return: the batch shared by all converters of the subject's DICOM directories
+        """
+        subject_root = self.path_sourcedir.joinpath(*dcm_dir.relative_to(self.path_sourcedir).parts[
+                                                       :self.n_levels_subject])
+        with _dcm2niix_batches_lock:
+            batch = _dcm2niix_batches.get(subject_root)
+            if batch is None:
+                scan_aliases = set(self.config["Scan Aliases"].values())
+                level_filters = [scan_aliases if dir_type == "Scan" else None
+                                 for dir_type in self.config["Directory Structure"][self.n_levels_subject:]]
+                batch = DCM2NIIX_Batch(subject_root, tuple(scandir_levels(subject_root, level_filters)))
+                _dcm2niix_batches[subject_root] = batch
+            return batch
+
+    def run_dcm2niix_batch(self, batch: "DCM2NIIX_Batch") -> bool:
+        """
+        Converts all DICOM directories of a batch with a single DCM2NIIX run in the scratch directory. Outputs are
+        named after their SeriesInstanceUID, such that each converter can find the outputs of its own series
+        :param batch: the batch to convert
+        :return: whether the batch was converted; if not, its DICOM directories are converted one by one
+        """
+        try:
+            space_needed = 2 * sum(get_dir_size(member) for member in batch.members)
+            space_available = shutil.disk_usage(self.path_scratchdir).free
+            if space_available < space_needed:
+                self.print_and_log(f"The scratch directory {self.path_scratchdir} only has {space_available} bytes "
+                                   f"free of the {space_needed} bytes needed to convert {batch.subject_root} at once. "
+                                   f"Its DICOM directories will be converted one by one", msg_type="warning")
+                return False
+            batch.path_batchdir = Path(tempfile.mkdtemp(prefix="xASL_ImportBatch_", dir=self.path_scratchdir))
+        except OSError as scratch_error:
+            self.print_and_log(f"The scratch directory {self.path_scratchdir} could not be used for a batched "
+                               f"conversion: {scratch_error}. The DICOM directories of {batch.subject_root} will be "
+                               f"converted one by one", msg_type="warning")
             return False
 
+        # Links to the DICOM directories of the import keep DCM2NIIX from converting other series of the subject
+        path_inputdir, batch.path_outputdir = batch.path_batchdir / "Input", batch.path_batchdir / "Output"
+        path_inputdir.mkdir()
+        batch.path_outputdir.mkdir()
+        try:
+            for idx, member in enumerate(batch.members):
+                os.symlink(member, path_inputdir / str(idx), target_is_directory=True)
+        except OSError:
+            path_inputdir = batch.subject_root
+
+        self.print_and_log(f"Converting the {len(batch.members)} DICOM directories of {batch.subject_root} with a "
+                           f"single DCM2NIIX run", msg_type="info")
+        return_code, output = self.execute_dcm2niix(path_inputdir, "%j_%s", batch.path_outputdir)
+        if return_code != 0:
+            self.print_and_log(f"The batched DCM2NIIX run did not exit gracefully. The DICOM directories of "
+                               f"{batch.subject_root} will be converted one by one. Output:\n{output}", "warning")
+            shutil.rmtree(batch.path_batchdir, ignore_errors=True)
+            batch.path_batchdir, batch.path_outputdir = None, None
+            return False
+        return True
+
+    def claim_dcm2niix_batch_outputs(self, dcm_dir: Path, output_prefix: str) -> bool:
+        """
+        Moves the outputs of the DICOM directory's series from the batched conversion of its subject into the TEMP
+        directory, under the same filenames that a conversion of the DICOM directory by itself would have produced
+        :param dcm_dir: the DICOM directory
+        :param output_prefix: the start of the output filenames, which the series number would otherwise follow
+        :return: whether outputs were found; if not, the DICOM directory should be converted by itself
+        """
+        series_uid = self.header_record.get("SeriesInstanceUID")
+        if series_uid is None:
+            return False
+        batch = self.get_dcm2niix_batch(dcm_dir)
+        with batch.lock:
+            if not batch.b_attempted:
+                batch.b_attempted = True
+                self.run_dcm2niix_batch(batch)
+        if batch.path_outputdir is None:
+            return False
+
+        uid_prefix = f"{series_uid}_"
+        outputs = [output for output in batch.path_outputdir.iterdir() if output.name.startswith(uid_prefix)]
+        for output in outputs:
+            shutil.move(str(output), str(self.path_tempdir / f"{output_prefix}{output.name[len(uid_prefix):]}"))
+        if len(outputs) == 0:
+            self.print_and_log(f"The batched DCM2NIIX run of {batch.subject_root} did not produce outputs for series "
+                               f"{series_uid}. The DICOM directory will be converted by itself", msg_type="warning")
+            return False
+        self.print_and_log(f"Took {len(outputs)} files from the batched DCM2NIIX run of {batch.subject_root}",
+                           msg_type="info")
+        return True
+
+    def release_dcm2niix_batch(self, dcm_dir: Path):
+        """
+        Signals that a DICOM directory no longer needs the batch of its subject. The scratch files of the batch are
+        removed once every DICOM directory of the subject has released it
+        :param dcm_dir: the DICOM directory
+        """
+        if not self.b_batch_dcm2niix:
+            return
+        batch = self.get_dcm2niix_batch(dcm_dir)
+        with _dcm2niix_batches_lock:
+            batch.pending.discard(dcm_dir)
+            if len(batch.pending) > 0:
+                return
+            _dcm2niix_batches.pop(batch.subject_root, None)
+        if batch.path_batchdir is not None:
+            shutil.rmtree(batch.path_batchdir, ignore_errors=True)
+
     def process_niftis_in_temp(self, _):
         """
         Step 5: Clean up the mess that is present in the TEMP directory
@@ -541,6 +1401,7 @@ class DCM2NIFTI_Converter:
         for json_file in jsons:
             with open(json_file) as json_reader:
                 sidecar_data: dict = json.load(json_reader)
+                self.add_stage_usage(bytes_read=json_reader.tell())
                 for parm in json_data.keys():
                     try:
                         json_data[parm][json_file.with_suffix(".nii")] = sidecar_data[parm]
@@ -590,13 +1451,13 @@ class DCM2NIFTI_Converter:
         ########################################
         # PART 2 PROCESSING THE ORGANIZED NIFTIS
         ########################################
+        # Vendor and BIDS corrections are only flagged here and applied in memory in Step 6, prior to the only write
+        b_ge_epi_fix, b_bids_4d_fix = False, False
         self.print_and_log(f"Attempting to process NIFTI Files in the TEMP directory", msg_type="info")
         # Must process niftis differently depending on the scan and the number present after conversion
         # Scenario: ASL4D
         if len(reorganized_niftis) > 1 and self.scan_dst_name == "ASL4D":
             self.print_and_log(f"NIFTI Scenario: Multiple ASL NIFTIs needing to be concatenated", msg_type="info")
-            initial_shape_history = []
-            nii_objs = []
 
             # GE Fix, sometimes the vendors mix up the Perfusion vs M0 ordering; best to make sure each time
             if self.dcm_info["Manufacturer"] == "GE" and len(reorganized_niftis) == 2:
@@ -630,62 +1491,19 @@ class DCM2NIFTI_Converter:
                                        f"attempt", msg_type="error")
                     pass
 
-            for idx, nifti in enumerate(reorganized_niftis):
-                nii_obj: nib.Nifti1Image = nib.load(str(nifti))
-
-                # Must keep a history of incoming shapes to prevent incompatible later scans from ruining the concat
-                if idx > 0 and nii_obj.shape not in initial_shape_history:
-                    break
-                initial_shape_history.append(nii_obj.shape)
-
-                # dcm2niix error: imports a 4D NIFTI instead of a 3D one. Solution: must be split first and concatenated
-                # with the others at a later step
-                if len(nii_obj.shape) == 4:
-                    volumes = nib.funcs.four_to_three(nii_obj)
-                    for volume in volumes:
-                        nii_objs.append(volume)
-
-                # Otherwise, correct 3D import
-                elif len(nii_obj.shape) == 3:
-
-                    # dcm2niix error: imports a 3D mosaic. Solution: reformat as a 3D stack
-                    if nii_obj.shape[2] == 1:
-                        if idx == 0:
-                            self.print_and_log("The NIFTI Files were determined to be incorrectly processed by DCM2NIX "
-                                               ", resulting in a mosaic outcome. Converting mosaic to 3D volume",
-                                               "warning")
-
-                        # Get the acquisition matrix
-                        acq_matrix = self.dcm_info["AcquisitionMatrix"]
-                        if acq_matrix[0] == 0:
-                            acq_rows = int(acq_matrix[1])
-                            acq_cols = int(acq_matrix[2])
-                        else:
-                            acq_rows = int(acq_matrix[0])
-                            acq_cols = int(acq_matrix[3])
-
-                        nii_obj = self.fix_mosaic(mosaic_nifti=nii_obj, acq_dims=(acq_rows, acq_cols))
-                    nii_objs.append(nii_obj)
-                else:
-                    self.print_and_log(f"An uncanny NIFTI set was encountered. A single NIFTI in this set had the "
-                                       f"following shape: {nii_obj.shape}", msg_type="error")
-                    return False
-
-            final_nifti_obj = nib.funcs.concat_images(nii_objs)
+            final_nifti_obj = self.concat_asl_niftis(reorganized_niftis)
+            if final_nifti_obj is None:
+                return False
+            self.add_stage_usage(bytes_read=sum(Path(nifti).stat().st_size for nifti in reorganized_niftis))
 
         # Scenario: multiple M0; will take their mean as final
         elif len(reorganized_niftis) > 1 and self.scan_dst_name == "M0":
             self.print_and_log(f"NIFTI Scenario: Multiple M0 to be averaged", msg_type="info")
             nii_objs = [nib.load(nifti) for nifti in reorganized_niftis]
             final_nifti_obj = image.mean_img(nii_objs)
+            self.add_stage_usage(bytes_read=sum(Path(nifti).stat().st_size for nifti in reorganized_niftis))
             # Must correct for bad headers under BIDS specification
-            if not self.b_legacy and final_nifti_obj.ndim < 4:
-                pixdim_copy = final_nifti_obj.header["pixdim"].copy()
-                final_nifti_obj.header["dim"][0] = 4
-                final_nifti_obj.header["pixdim"] = pixdim_copy
-                final_nifti_obj = nib.Nifti1Image(np.expand_dims(image.get_data(final_nifti_obj), axis=-1),
-                                                  final_nifti_obj.affine,
-                                                  final_nifti_obj.header)
+            b_bids_4d_fix = not self.b_legacy
 
         # Scenario: single M0 or single ASL4D
         elif len(reorganized_niftis) == 1 and self.scan_dst_name in ["M0", "ASL4D"]:
@@ -696,25 +1514,13 @@ class DCM2NIFTI_Converter:
             if all([self.dcm_info["Manufacturer"] == "GE", "EPI" in sidecar_data.get("ScanOptions", ""),
                     len(final_nifti_obj.shape) == 3
                     ]):
-                n_temporal = get_dicom_value(self.dcm_dataset, [[(0x0020, 0x0105)]], default=None)
-                n_images = get_dicom_value(self.dcm_dataset, [[(0x0020, 0x1002)]], default=None)
-                if any([n_images is None, n_temporal is None]):
-                    self.print_and_log("Could not parse GE 2D-EPI ")
-                self.print_and_log("Weird GE 2D-EPI Scenario: DCM2NIIX Concatenated Incorrectly. Fixing Issue.")
-                old_data = final_nifti_obj.get_fdata(dtype=np.float32)
-                new_data = np.stack(tuple(reversed(np.dsplit(old_data, n_temporal))))
-                new_data = np.transpose(new_data, (1, 2, 3, 0))
-                final_nifti_obj: nib.Nifti1Image = image.new_img_like(final_nifti_obj, data=new_data,
-                                                                      affine=final_nifti_obj.affine)
+                if self.header_record["NumberOfTemporalPositions"] is None:
+                    self.print_and_log("Could not parse the NumberOfTemporalPositions of the GE 2D-EPI scan")
+                    return False
+                b_ge_epi_fix = True
 
             # Must correct for bad headers under BIDS specification
-            if not self.b_legacy and final_nifti_obj.ndim < 4:
-                pixdim_copy = final_nifti_obj.header["pixdim"].copy()
-                final_nifti_obj.header["dim"][0] = 4
-                final_nifti_obj.header["pixdim"] = pixdim_copy
-                final_nifti_obj = nib.Nifti1Image(np.expand_dims(image.get_data(final_nifti_obj), axis=-1),
-                                                  final_nifti_obj.affine,
-                                                  final_nifti_obj.header)
+            b_bids_4d_fix = not self.b_legacy
 
         # Scenario: one of the structural types
         elif len(reorganized_niftis) == 1 and self.scan_dst_name in ["T1", "T2", "FLAIR"]:
@@ -726,6 +1532,7 @@ class DCM2NIFTI_Converter:
             self.print_and_log(f"NIFTI Scenario: Multiple T1 Scans. Taking their mean...", msg_type="info")
             nii_objs = [nib.load(str(nifti)) for nifti in reorganized_niftis]
             final_nifti_obj = image.mean_img(nii_objs)
+            self.add_stage_usage(bytes_read=sum(Path(nifti).stat().st_size for nifti in reorganized_niftis))
 
         # Otherwise, something went wrong and the operation should stop
         else:
@@ -737,142 +1544,175 @@ class DCM2NIFTI_Converter:
             return False
 
         self.print_and_log("Successfully created a single NIFTI file appropriate for analysis", msg_type="info")
+        self.final_nifti_obj, self.b_ge_epi_fix, self.b_bids_4d_fix = final_nifti_obj, b_ge_epi_fix, b_bids_4d_fix
         # Take the oppurtunity to get more givens for the import summary and add it to the summary_data attribute
-        zooms = final_nifti_obj.header.get_zooms()
-        shape = final_nifti_obj.shape
         import_summary["subject"] = self.subject_dst_name
         import_summary["visit"] = self.visit_dst_name
         import_summary["run"] = self.run_dst_name
         import_summary["scan"] = self.scan_dst_name
-        import_summary["filename"] = self.scan_dst_name + ".nii"
-
-        if len(zooms) >= 4:
-            import_summary["dx"], import_summary["dy"], import_summary["dz"] = zooms[0:3]
-        else:
-            import_summary["dx"], import_summary["dy"], import_summary["dz"] = zooms
-
-        if len(shape) == 4:
-            (import_summary["nx"], import_summary["ny"],
-             import_summary["nz"], import_summary["nt"]) = shape
-        else:
-            (import_summary["nx"], import_summary["ny"],
-             import_summary["nz"], import_summary["nt"]) = shape[0], shape[1], shape[2], 1
+        import_summary["filename"] = self.scan_dst_name + (".nii.gz" if self.b_compress else ".nii")
         self.summary_data.update(import_summary)
-        self.print_and_log("Successfully added shape and zoom information to the main data summary", msg_type="info")
 
-        ################################
-        # PART 3 NAMING AND MOVING FILES
-        ################################
+        ###############################
+        # PART 3 NAMING THE FINAL FILES
+        ###############################
 
         # Get the destination filepaths
-        self.print_and_log("Moving NIFTI and JSON files out of the TEMP directory", msg_type="info")
-        run_str = "" if self.run_dst_name is None else f"run-{self.run_dst_name.replace('-', '').replace('_', '')}"
-        visit_str = "" if self.visit_dst_name is None \
-            else f"ses-{self.visit_dst_name.replace('-', '').replace('_', '')}_"
-        if self.b_legacy:
-            self.path_final_nifti = self.path_tempdir.parent / f"{self.scan_dst_name}.nii"
-            self.path_final_json = self.path_tempdir.parent / f"{self.scan_dst_name}.json"
-        else:
-            scan_str = {"ASL4D": "asl", "M0": "m0scan", "T1": "T1w", "T2": "T2w", "FLAIR": "FLAIR"}[self.scan_dst_name]
-            subject_str = self.subject_dst_name.replace("-", "").replace("_", "")
-            basename_str = f"sub-{subject_str}_{visit_str}{run_str}{scan_str}"
-            self.path_final_nifti = self.path_tempdir.parent / f"{basename_str}.nii"
-            self.path_final_json = self.path_tempdir.parent / f"{basename_str}.json"
+        self.print_and_log("Determining the final NIFTI and JSON filepaths", msg_type="info")
+        self.path_dstdir, self.path_final_nifti, self.path_final_json = self.get_destination_paths()
         self.print_and_log(f"Determined the final NIFTI and JSON filepaths to be as follows:\n"
                            f"\t NIFTI: {str(self.path_final_nifti)}\n"
                            f"\t JSON: {str(self.path_final_json)}", msg_type="info")
 
-        # Perform the file move operations
-        nib.save(final_nifti_obj, self.path_final_nifti)
+        # Both the NIFTI and the JSON sidecar are only written to the study directory once they are final, in Step 6
         if ge_fix_flag and ge_json_file is not None:
-            ge_json_file.replace(self.path_final_json)
+            self.path_temp_json = ge_json_file
         else:
             jsons = peekable(self.path_tempdir.glob("*json"))
             if not jsons:
                 self.print_and_log(f"Error in clean_niftis_in_temp while attempting to rename remaining json files",
                                    msg_type="error")
                 return False
-            json_file = next(jsons)
-            json_file.replace(self.path_final_json)
+            self.path_temp_json = next(jsons)
 
         return True
 
+    def concat_asl_niftis(self, niftis: List[Path]) -> Union[nib.Nifti1Image, None]:
+        """
+        Concatenates several ASL NIFTIs into a single 4D NIFTI. The headers are read first to determine the final
+        shape, after which a single output array is allocated and each NIFTI is read in turn and copied into its slot,
+        such that the series is only held in memory about once
+        :param niftis: the NIFTI files in the order they should be concatenated
+        :return: the concatenated NIFTI image or None if the NIFTIs could not be concatenated
+        """
+        # First pass over the headers. Later NIFTIs with a different shape than the first are incompatible and are
+        # disregarded, as they would otherwise ruin the concatenation
+        nii_objs: List[nib.Nifti1Image] = []
+        for idx, nifti in enumerate(niftis):
+            nii_obj: nib.Nifti1Image = nib.load(str(nifti))
+            if idx > 0 and nii_obj.shape != nii_objs[0].shape:
+                break
+            if len(nii_obj.shape) not in {3, 4}:
+                self.print_and_log(f"An uncanny NIFTI set was encountered. A single NIFTI in this set had the "
+                                   f"following shape: {nii_obj.shape}", msg_type="error")
+                return None
+            nii_objs.append(nii_obj)
+
+        # dcm2niix error: imports a 3D mosaic. Solution: reformat each as a 3D stack, the first one already being
+        # needed to know the shape of the output
+        b_mosaic = nii_objs[0].shape[2] == 1 and len(nii_objs[0].shape) == 3
+        if b_mosaic:
+            self.print_and_log("The NIFTI Files were determined to be incorrectly processed by DCM2NIX "
+                               ", resulting in a mosaic outcome. Converting mosaic to 3D volume", "warning")
+            acq_matrix = self.dcm_info["AcquisitionMatrix"]
+            if acq_matrix[0] == 0:
+                acq_dims = int(acq_matrix[1]), int(acq_matrix[2])
+            else:
+                acq_dims = int(acq_matrix[0]), int(acq_matrix[3])
+            nii_objs[0] = self.fix_mosaic(mosaic_nifti=nii_objs[0], acq_dims=acq_dims)
+            if nii_objs[0] is None:
+                self.print_and_log(f"The mosaic could not be split given the AcquisitionMatrix {acq_matrix}")
+                return None
+
+        # dcm2niix error: imports a 4D NIFTI instead of a 3D one. Its volumes are concatenated with the others
+        template = nii_objs[0]
+        n_vols_per_nifti = template.shape[3] if len(template.shape) == 4 else 1
+        out_shape = template.shape[:3] + (n_vols_per_nifti * len(nii_objs),)
+        out_dtype = np.result_type(*[nii_obj.dataobj.dtype if getattr(nii_obj.dataobj, "slope", 1) == 1 and
+                                     getattr(nii_obj.dataobj, "inter", 0) == 0 else np.float64
+                                     for nii_obj in nii_objs])
+        n_bytes = int(np.prod(out_shape)) * out_dtype.itemsize
+        self.print_and_log(f"Concatenating {len(nii_objs)} NIFTIs into a {out_shape} array of {out_dtype} "
+                           f"({n_bytes / 1e6:.1f} MB)", msg_type="info")
+        # Fortran order, as in the NIFTI file itself, makes each volume a contiguous slot
+        if n_bytes > CONCAT_MEMMAP_THRESHOLD:
+            out_data = np.memmap(self.path_tempdir / "ASL4D_concat.dat", dtype=out_dtype, mode="w+", shape=out_shape,
+                                 order="F")
+        else:
+            out_data = np.empty(out_shape, dtype=out_dtype, order="F")
+
+        # Second pass over the data, holding a single NIFTI in memory besides the output
+        for idx, nii_obj in enumerate(nii_objs):
+            if b_mosaic and idx > 0:
+                nii_obj = self.fix_mosaic(mosaic_nifti=nii_obj, acq_dims=acq_dims)
+            if nii_obj is None or nii_obj.shape[:3] != out_shape[:3] or not np.all(nii_obj.affine == template.affine):
+                self.print_and_log(f"The NIFTI {niftis[idx]} could not be concatenated with the others, as its "
+                                   f"shape or affine differ")
+                return None
+            out_data[..., idx * n_vols_per_nifti:(idx + 1) * n_vols_per_nifti] = \
+                np.asanyarray(nii_obj.dataobj).reshape(out_shape[:3] + (n_vols_per_nifti,))
+
+        return nib.Nifti1Image(out_data, template.affine, template.header)
+
     @staticmethod
     def fix_mosaic(mosaic_nifti: nib.Nifti1Image, acq_dims: tuple):
         """
         Fixes incorrectly-processed NIFTIs by dcm2niix where they still remain mosaics due to a lack of
-        NumberOfImagesInMosaic header. This function implements a hack to
+        NumberOfImagesInMosaic header. This function implements a hack to split the mosaic into its tiles
         :param mosaic_nifti: the nifti image object that needs to be fixed. Should be of shape m x n x 1
-        the sliding window algorithm
         :param acq_dims: the (row, col) acquisition dimensions for rows and columns from the AcquisitionMatrix DICOM
         field.
-        Used to determine the appropriate kernel size to use for the sliding window algorithm
+        Used to determine the appropriate tile size to split the mosaic with
         :return: new_nifti; a 3D NIFTI that is no longer mosaic
         """
         acq_rows, acq_cols = acq_dims
 
-        # Get the shape and array values of the mosaic (flatten the latter into a 2D array)
+        # Get the shape and array values of the mosaic (flatten the latter into a 2D array). Unscaled data keeps its
+        # stored dtype; scaled data is read in float64 as before
         img_shape = mosaic_nifti.shape
+        if getattr(mosaic_nifti.dataobj, "slope", 1) == 1 and getattr(mosaic_nifti.dataobj, "inter", 0) == 0:
+            img_data = np.asanyarray(mosaic_nifti.dataobj)
+        else:
+            img_data = mosaic_nifti.get_fdata()
         # noinspection PyTypeChecker
-        img_data = np.rot90(np.squeeze(mosaic_nifti.get_fdata()))
+        img_data = np.rot90(np.squeeze(img_data))
 
         # If this is a square, and the rows perfectly divides the mosaic
         if img_shape[0] == img_shape[1] and img_shape[0] % acq_rows == 0:
-            nsplits_w, nsplits_h = img_shape[0] / acq_rows, img_shape[0] / acq_rows
+            nsplits_w, nsplits_h = img_shape[0] // acq_rows, img_shape[0] // acq_rows
             kernel_w, kernel_h = acq_rows, acq_rows
         # If this is a square, and the cols perfectly divides the mosaic
         elif img_shape[0] == img_shape[1] and img_shape[0] % acq_cols == 0:
-            nsplits_w, nsplits_h = img_shape[0] / acq_cols, img_shape[0] / acq_cols
+            nsplits_w, nsplits_h = img_shape[0] // acq_cols, img_shape[0] // acq_cols
             kernel_w, kernel_h = acq_cols, acq_cols
         # If this is a rectangle
         elif all([img_shape[0] != img_shape[1],
                   img_shape[0] % acq_rows == 0,
                   img_shape[1] % acq_cols == 0
                   ]):
-            nsplits_w, nsplits_h = img_shape[0] / acq_rows, img_shape[1] / acq_cols
+            nsplits_w, nsplits_h = img_shape[0] // acq_rows, img_shape[1] // acq_cols
             kernel_w, kernel_h = acq_rows, acq_cols
         else:
             return
 
-        # Initialize the data that will house the split mosaic into slices
-        new_img_data = np.zeros(shape=(kernel_w, kernel_h, int(nsplits_w * nsplits_h)))
-        slice_num = 0
-
-        # Sliding Window algorithm
-        for ii in range(int(nsplits_w)):
-            for jj in range(int(nsplits_h)):
-                x_start, x_end = ii * kernel_w, (ii + 1) * kernel_w
-                y_start, y_end = jj * kernel_h, (jj + 1) * kernel_h
-                img_slice = img_data[x_start:x_end, y_start:y_end]
-
-                # Disregard slices that are only zeros
-                if np.nanmax(img_slice) == 0:
-                    continue
-                # Otherwise update the zeros array at the appropriate slice with the new values
-                else:
-                    new_img_data[:, :, slice_num] = img_slice
-                    slice_num += 1
+        # Split the mosaic into a (tiles, rows, cols) array in one operation; tiles are ordered row of tiles by row of
+        # tiles, as in the mosaic itself
+        tiles = img_data[:nsplits_w * kernel_w, :nsplits_h * kernel_h] \
+            .reshape(nsplits_w, kernel_w, nsplits_h, kernel_h) \
+            .swapaxes(1, 2) \
+            .reshape(nsplits_w * nsplits_h, kernel_w, kernel_h)
 
-        # Filter off slices that had only zeros
-        new_img_data = np.rot90(new_img_data[:, :, 0:slice_num], 3)
+        # Disregard slices that are only zeros, using a single reduction over all tiles
+        is_filled = np.nanmax(tiles, axis=(1, 2)) != 0
+
+        # Stack the remaining tiles as slices along the third dimension
+        new_img_data = np.rot90(np.moveaxis(tiles[is_filled], 0, -1), 3)
         new_nifti = image.new_img_like(mosaic_nifti, new_img_data, affine=mosaic_nifti.affine)
         return new_nifti
 
     def update_final_json_and_nifti(self, _):
         """
-        Step 6 Add in missing data to the JSON sidecars and Account for the Philips NIFTI correction that may need to
-        take place
+        Step 6 Add in missing data to the JSON sidecars and apply the vendor and BIDS corrections that the NIFTI may
+        need, then write both to the study directory
         """
-        if any([not self.path_final_json.exists(), not self.path_final_nifti.exists()]):
-            msg = f"Could not find the remaining json sidecar or NIFTI file for updating json " \
-                  f"sidecars or fixing NIFTI headers, respectively." \
-                  f"\n\tJSON exists? {self.path_final_json.exists()}\n" \
-                  f"\n\tNIFTI exists? {self.path_final_nifti.exists()}"
-            self.print_and_log(msg, msg_type="error")
+        if not self.path_temp_json.exists():
+            self.print_and_log(f"Could not find the remaining json sidecar {self.path_temp_json} for updating json "
+                               f"sidecars", msg_type="error")
             return False
 
-        with open(self.path_final_json) as json_sidecar_reader:
+        with open(self.path_temp_json) as json_sidecar_reader:
             json_sidecar_parms: dict = json.load(json_sidecar_reader)
+            self.add_stage_usage(bytes_read=json_sidecar_reader.tell())
 
         json_sidecar_parms.update({k: v for k, v in self.dcm_info.items() if v is not None})
         # First, rename certain elements
@@ -882,6 +1722,7 @@ class DCM2NIFTI_Converter:
                 json_sidecar_parms[new_name] = json_sidecar_parms.pop(old_name)
 
         # Next, must see if Philips-related fixes post-DCM2NIIX are necessary
+        philips_offset, philips_divisor = None, None
         manufac = json_sidecar_parms.get("Manufacturer", None)
         if manufac == "Philips":
             # One possibility: Array values are Stored Values and must be corrected to Philips Floating Point
@@ -893,16 +1734,10 @@ class DCM2NIFTI_Converter:
                     ]):
                 nifti_msg = f"NIFTI Additional Tweaks Scenario: Philips NIFTI featured Stored Values " \
                             f"that had to be converted to Philips Floating Point"
-                nifti_img: nib.Nifti1Image = image.load_img(str(self.path_final_nifti))
-                nifti_data: np.ndarray = image.get_data(nifti_img)
                 RI = json_sidecar_parms["PhilipsRescaleIntercept"]
                 RS = json_sidecar_parms["PhilipsRescaleSlope"]
                 SS = json_sidecar_parms["PhilipsScaleSlope"]
-                new_nifti_data = (nifti_data + (RI / RS)) / SS
-                new_nifti = nib.Nifti1Image(dataobj=new_nifti_data, header=nifti_img.header, affine=nifti_img.affine)
-                del nifti_img, nifti_data, RI, RS, SS, new_nifti_data
-                new_nifti.to_filename(str(self.path_final_nifti))
-                del new_nifti
+                philips_offset, philips_divisor = RI / RS, SS
                 json_sidecar_parms["UsePhilipsFloatNotDisplayScaling"] = 1
 
             # Another possibility: Array values were incorrectly converted to Display Values rather than Philips
@@ -915,21 +1750,258 @@ class DCM2NIFTI_Converter:
                       ]):
                 nifti_msg = f"NIFTI Additional Tweaks Scenario: Philips NIFTI featured arrays values " \
                             f"that were incorrectly converted to Display Values rather than Philips Floating Point."
-                nifti_img: nib.Nifti1Image = image.load_img(str(self.path_final_nifti))
-                nifti_data: np.ndarray = image.get_data(nifti_img)
                 RS, SS = json_sidecar_parms["PhilipsRescaleSlope"], json_sidecar_parms["PhilipsScaleSlope"]
-                new_nifti_data = nifti_data / (RS * SS)
-                new_nifti = nib.Nifti1Image(dataobj=new_nifti_data, header=nifti_img.header, affine=nifti_img.affine)
-                del nifti_img, nifti_data, RS, SS, new_nifti_data
-                new_nifti.to_filename(str(self.path_final_nifti))
-                del new_nifti
+                philips_offset, philips_divisor = 0, RS * SS
 
             else:
                 nifti_msg = f"NIFTI Additional Tweaks Scenario: Philips NIFTI already had proper values."
             self.print_and_log(nifti_msg, msg_type="info")
 
+        # A NIFTI that was loaded but not yet combined with others is only read from the TEMP directory now
+        if not self.final_nifti_obj.in_memory and self.final_nifti_obj.get_filename() is not None:
+            self.add_stage_usage(bytes_read=Path(self.final_nifti_obj.get_filename()).stat().st_size)
+        final_nifti_obj = self.get_corrected_nifti(self.final_nifti_obj, philips_offset, philips_divisor)
+        if self.b_compress:
+            start_time, start_cpu_time, start_thread_time = perf_counter(), process_time(), thread_time()
+            # nibabel streams the header and the data array into the writer slice by slice, sparing a full in-memory
+            # copy of the NIFTI
+            with ParallelGzipWriter(self.path_final_nifti, level=self.compression_level,
+                                    n_threads=self.n_compression_threads) as gz_writer:
+                final_nifti_obj.to_file_map({"image": nib.FileHolder(fileobj=gz_writer)})
+            self.summary_data["CompressionTime"] = perf_counter() - start_time
+            self.summary_data["CompressionRatio"] = gz_writer.raw_size / gz_writer.gz_size
+            # The compression threads are not covered by the CPU time of the thread running this stage
+            self.add_stage_usage(cpu_time=(process_time() - start_cpu_time) - (thread_time() - start_thread_time))
+            self.print_and_log(f"Compressed the NIFTI {self.summary_data['CompressionRatio']:.2f}-fold in "
+                               f"{self.summary_data['CompressionTime']:.2f} s", msg_type="info")
+        else:
+            nib.save(final_nifti_obj, self.path_final_nifti)
+        self.final_nifti_obj = None
+        # A previous import with the other output format must not leave a second image of the scan behind
+        other_suffix = ".nii" if self.b_compress else ".nii.gz"
+        self.path_final_json.with_suffix(other_suffix).unlink(missing_ok=True)
+
+        # Take the oppurtunity to get more givens for the import summary now that the final shape is known
+        zooms = final_nifti_obj.header.get_zooms()
+        shape = final_nifti_obj.shape
+        self.summary_data["dx"], self.summary_data["dy"], self.summary_data["dz"] = zooms[0:3]
+        (self.summary_data["nx"], self.summary_data["ny"], self.summary_data["nz"]) = shape[0:3]
+        self.summary_data["nt"] = shape[3] if len(shape) == 4 else 1
+        self.print_and_log("Successfully added shape and zoom information to the main data summary", msg_type="info")
+
         self.summary_data.update(json_sidecar_parms)
+        self.summary_data["JSONPath"] = str(self.path_final_json)
         with open(self.path_final_json, "w") as json_sidecar_writer:
             json.dump(json_sidecar_parms, json_sidecar_writer, indent=3)
+        self.add_stage_usage(bytes_written=self.path_final_nifti.stat().st_size + self.path_final_json.stat().st_size)
 
         return True
+
+    def get_corrected_nifti(self, nifti_obj: nib.Nifti1Image, philips_offset: Union[float, None] = None,
+                            philips_divisor: Union[float, None] = None) -> nib.Nifti1Image:
+        """
+        Applies the corrections flagged by Step 5 and the Philips scaling of Step 6 in memory. Corrected values are
+        computed in float32, in place, and are also stored as float32 rather than being re-quantized
+        :param nifti_obj: the NIFTI image produced by Step 5
+        :param philips_offset: the value to add prior to dividing by philips_divisor; None if no scaling is needed
+        :param philips_divisor: the value to divide the array values by
+        :return: the NIFTI image that is ready to be written
+        """
+        header = nifti_obj.header.copy()
+        # Averaged images are held in memory as float64, which is no more precise than float32 for scanner data
+        b_float = any([philips_divisor is not None, self.b_ge_epi_fix,
+                       isinstance(nifti_obj.dataobj, np.ndarray) and nifti_obj.dataobj.dtype == np.float64])
+        slope, inter = None, None
+        if b_float:
+            data = nifti_obj.get_fdata(dtype=np.float32)
+            header.set_data_dtype(np.float32)
+        elif nib.is_proxy(nifti_obj.dataobj):
+            # The stored values pass through together with their scaling (which nibabel keeps on the proxy rather than
+            # the header of a loaded image); applying it here would have the image re-quantized on writing
+            data = nifti_obj.dataobj.get_unscaled()
+            slope, inter = nifti_obj.dataobj.slope, nifti_obj.dataobj.inter
+        else:
+            data = np.asanyarray(nifti_obj.dataobj)
+
+        # Weird GE flavor: the volumes were stacked along the slice dimension in reverse temporal order
+        if self.b_ge_epi_fix:
+            self.print_and_log("Weird GE 2D-EPI Scenario: DCM2NIIX Concatenated Incorrectly. Fixing Issue.",
+                               msg_type="info")
+            n_temporal = int(self.header_record["NumberOfTemporalPositions"])
+            nx, ny, nz = data.shape
+            data = data.reshape(nx, ny, n_temporal, nz // n_temporal)[:, :, ::-1, :].transpose(0, 1, 3, 2)
+
+        if philips_divisor is not None:
+            if philips_offset:
+                data += philips_offset
+            data /= philips_divisor
+
+        # BIDS specification: M0 and ASL images must be 4D, even if only a single volume
+        if self.b_bids_4d_fix and data.ndim < 4:
+            data = data[..., np.newaxis]
+
+        corrected_nifti_obj = nib.Nifti1Image(data, nifti_obj.affine, header)
+        # A new image resets the scaling of its header, so that of the source is restored for the unscaled values
+        if slope is not None:
+            corrected_nifti_obj.header.set_slope_inter(slope, inter)
+        return corrected_nifti_obj
+
+
+def get_usable_cpu_count() -> int:
+    """
+    Convenience function for determining the number of cores this process may actually run on, which can be fewer
+    than the machine's total if the process was restricted (i.e. by a cluster scheduler)
+    :return: the number of usable cores
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class DCM2NIIX_Batch:
+    """
+    A single DCM2NIIX conversion of all DICOM directories of a subject, shared by the converters of those DICOM
+    directories. The first converter to reach Step 4 runs it, while the others wait for it and then take their outputs
+    """
+
+    def __init__(self, subject_root: Path, members: Tuple[Path, ...]):
+        """
+        :param subject_root: the subject directory that the DICOM directories are found in
+        :param members: the DICOM directories of the subject that are part of the import
+        """
+        self.subject_root = subject_root
+        self.members = members
+        self.pending = set(members)  # The DICOM directories that have yet to release the batch
+        self.lock = threading.Lock()
+        self.b_attempted = False
+        self.path_batchdir: Union[Path, None] = None
+        self.path_outputdir: Union[Path, None] = None
+
+
+# The batches of the subjects currently being converted, keyed by their subject directory
+_dcm2niix_batches = {}
+_dcm2niix_batches_lock = threading.Lock()
+
+# The series of the current import, fingerprinted by SeriesInstanceUID and file count, and the first DICOM directory
+# found to hold each of them
+_series_registry = {}
+_series_registry_lock = threading.Lock()
+
+
+def clear_series_registry():
+    """
+    Forgets the series of the previous import, such that the next import does not consider them duplicates
+    """
+    with _series_registry_lock:
+        _series_registry.clear()
+
+
+# The DCM2NIIX processes currently running on behalf of the converters of this process
+_dcm2niix_processes: Set[subprocess.Popen] = set()
+_dcm2niix_processes_lock = threading.Lock()
+
+
+def kill_dcm2niix_processes():
+    """
+    Kills every DCM2NIIX process currently run by the converters of this process. Their conversions then fail
+    straight away rather than once DCM2NIIX is done
+    """
+    with _dcm2niix_processes_lock:
+        processes = list(_dcm2niix_processes)
+    for process in processes:
+        try:
+            if system() == "Windows":
+                process.kill()
+            elif process.returncode is None:
+                os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass  # The process had already exited
+
+
+def discard_dcm2niix_batches():
+    """
+    Removes the scratch files of all batches, including those with DICOM directories that never got to release them
+    because the import was terminated
+    """
+    with _dcm2niix_batches_lock:
+        batches = list(_dcm2niix_batches.values())
+        _dcm2niix_batches.clear()
+    for batch in batches:
+        if batch.path_batchdir is not None:
+            shutil.rmtree(batch.path_batchdir, ignore_errors=True)
+
+# Each thread or process of an import pool holds onto its own converter for the lifetime of the pool
+_worker_converters = threading.local()
+
+
+def init_import_worker(config: dict, use_legacy_mode: bool, log_queue=None, cancel_event=None,
+                       use_header_index: bool = True):
+    """
+    Initializer for the threads and processes of the import pools. Creates the converter that this thread or process
+    will use for every DICOM directory it is handed
+    :param config: the import configuration
+    :param use_legacy_mode: whether to import in legacy format (True) or BIDS format (False)
+    :param log_queue: the queue of the import's StudyLogService. If None, messages are printed rather than logged
+    :param cancel_event: a multiprocessing Event that is set once the import is terminated. If None, conversions always
+    run to completion
+    :param use_header_index: whether the converter should open the DICOM header index of the RawDir. Only the
+    conversion stages read DICOM headers, so the finalizers do without it
+    """
+    name = f"Converter_{str(os.getpid()).zfill(7)}_{str(threading.get_native_id()).zfill(7)}"
+    _worker_converters.converter = DCM2NIFTI_Converter(config=config, name=name,
+                                                       logger=get_queue_logger(name, log_queue),
+                                                       b_legacy=use_legacy_mode, b_use_header_index=use_header_index)
+    # The log service echoes to the console by itself when in DeveloperMode
+    _worker_converters.converter.b_verbose = log_queue is None
+    _worker_converters.converter.cancel_event = cancel_event
+
+
+def convert_dicom_directory(dcm_dir: Path) -> Tuple[bool, str, dict, Union[dict, None]]:
+    """
+    Runs the conversion stages of a single DICOM directory using the converter of the current pool thread
+    :param dcm_dir: the DICOM directory to convert
+    :return: success, whether the conversion was a success; job_description, the success or error description;
+    summary_data, the givens of the scan for the import summary; state, the converter state to hand over to
+    finalize_dicom_directory or None if the DICOM directory needs no finalization (failed or skipped)
+    """
+    converter: DCM2NIFTI_Converter = _worker_converters.converter
+    success, job_description = converter.convert_dcm_dir(dcm_dir=dcm_dir)
+    state = converter.get_state() if success and not converter.b_skipped else None
+    return success, job_description, converter.summary_data.copy(), state
+
+
+def finalize_dicom_directory(dcm_dir: Path, state: dict) -> Tuple[bool, str, dict, None]:
+    """
+    Runs the finalization stages of a single DICOM directory using the converter of the current pool process
+    :param dcm_dir: the DICOM directory whose TEMP outputs should be finalized
+    :param state: the converter state returned by convert_dicom_directory
+    :return: the same as convert_dicom_directory, with the state always being None
+    """
+    converter: DCM2NIFTI_Converter = _worker_converters.converter
+    converter.set_state(state)
+    success, job_description = converter.finalize_dcm_dir(dcm_dir=dcm_dir)
+    return success, job_description, converter.summary_data.copy(), None
+
+
+def rebuild_header_index(raw_dir: Union[Path, str]) -> Tuple[int, int]:
+    """
+    Clears the header index of a raw directory and re-indexes the headers of every DICOM directory described by the
+    ImportConfig.json file of that raw directory
+    :param raw_dir: the raw directory of the study
+    :return: n_dirs, the number of DICOM directories indexed; n_entries, the number of entries in the rebuilt index
+    """
+    with open(Path(raw_dir) / "ImportConfig.json") as import_config_reader:
+        config = json.load(import_config_reader)
+    config["RawDir"] = str(raw_dir)
+    # The rebuild is not an import, so it keeps no log
+    converter = DCM2NIFTI_Converter(config=config, name="IndexRebuild", logger=get_queue_logger("IndexRebuild", None))
+    if converter.header_index is None:
+        return 0, 0
+
+    converter.header_index.clear()
+    dicom_dirs = [dicom_dir for subject_dirs in get_dicom_directories(config) for dicom_dir in subject_dirs]
+    for dicom_dir in dicom_dirs:
+        converter.get_header_records(dicom_dir)
+    n_entries = len(converter.header_index)
+    return len(dicom_dirs), n_entries
@@ -0,0 +1,154 @@
+from pathlib import Path
+from typing import List, Tuple, Union
+import argparse
+import sqlite3
+import json
+import os
+
+
+class DICOM_HeaderIndex:
+    """
+    Persistent on-disk index of the values extracted from DICOM headers. Each row is keyed by the filepath and is only
+    considered valid if the size and modification time of the file are unchanged and if the header values were
+    extracted with the same tag specification. Files which could not be parsed as DICOM are also remembered (with a
+    NULL record) so that they are not attempted again.
+    """
+    INDEX_VERSION = 1
+
+    def __init__(self, index_path: Union[Path, str], spec_hash: str = "", timeout: float = 60):
+        """
+        :param index_path: the filepath of the SQLite database. Created if it does not exist
+        :param spec_hash: a hash of the tag specification used to extract the header values. If it differs from the
+        one the index was built with, the index is cleared
+        :param timeout: how many seconds to wait on a lock held by another import process
+        """
+        self.index_path = Path(index_path)
+        self.spec_hash = f"{self.INDEX_VERSION}_{spec_hash}"
+        self.connection = sqlite3.connect(str(self.index_path), timeout=timeout)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS headers "
+                                    "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, record TEXT)")
+            # Invalidation rule: a different tag specification makes every previously extracted value suspect
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'spec_hash'").fetchone()
+            if spec_hash and (row is None or row[0] != self.spec_hash):
+                self.connection.execute("DELETE FROM headers")
+                self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('spec_hash', ?)",
+                                        (self.spec_hash,))
+
+    def lookup(self, dcm_file: Path, stat_result: os.stat_result) -> Tuple[bool, Union[dict, None]]:
+        """
+        Retrieves the header record of a file if the index holds an up-to-date entry for it
+        :param dcm_file: the filepath of the DICOM file
+        :param stat_result: the current stat of the file
+        :return: hit, whether an up-to-date entry was found; record, the header values (None if the file is not DICOM)
+        """
+        row = self.connection.execute("SELECT size, mtime_ns, record FROM headers WHERE path = ?",
+                                      (str(dcm_file),)).fetchone()
+        # Invalidation rule: any change in size or modification time means the file must be parsed again
+        if row is None or row[0] != stat_result.st_size or row[1] != stat_result.st_mtime_ns:
+            return False, None
+        return True, (None if row[2] is None else json.loads(row[2]))
+
+    def store(self, entries: List[Tuple[Path, os.stat_result, Union[dict, None]]]):
+        """
+        Stores several header records within a single transaction
+        :param entries: tuples of the filepath, its stat at the time of parsing, and the header values (None if the
+        file is not DICOM)
+        """
+        if len(entries) == 0:
+            return
+        rows = [(str(dcm_file), stat_result.st_size, stat_result.st_mtime_ns,
+                 None if record is None else json.dumps(record, default=str))
+                for dcm_file, stat_result, record in entries]
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO headers (path, size, mtime_ns, record) "
+                                        "VALUES (?, ?, ?, ?)", rows)
+
+    def clear(self):
+        """
+        Removes all entries, such that every DICOM file will be parsed again during the next import
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM headers")
+
+    def prune(self) -> int:
+        """
+        Removes the entries of files that no longer exist or have changed since they were indexed
+        :return: the number of removed entries
+        """
+        stale = []
+        for path, size, mtime_ns in self.connection.execute("SELECT path, size, mtime_ns FROM headers").fetchall():
+            try:
+                stat_result = os.stat(path)
+                if stat_result.st_size != size or stat_result.st_mtime_ns != mtime_ns:
+                    stale.append((path,))
+            except OSError:
+                stale.append((path,))
+        with self.connection:
+            self.connection.executemany("DELETE FROM headers WHERE path = ?", stale)
+        return len(stale)
+
+    def vacuum(self) -> int:
+        """
+        Prunes stale entries and then compacts the database file
+        :return: the number of removed entries
+        """
+        n_pruned = self.prune()
+        self.connection.execute("VACUUM")
+        return n_pruned
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM headers").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def get_header_index_path(raw_dir: Union[Path, str]) -> Path:
+    """
+    Convenience function for the location of the header index, which lives next to the ImportConfig.json file
+    :param raw_dir: the raw directory of the study
+    :return: the filepath of the header index
+    """
+    return Path(raw_dir) / "DICOMHeaderIndex.sqlite"
+
+
+def main():
+    """
+    Maintenance entry point for the header index of a study's raw directory. Example usage:
+    python -m src.xASL_GUI_DCMHeaderIndex /home/jsmith/MyStudy/raw vacuum
+    """
+    parser = argparse.ArgumentParser(description="Maintain the DICOM header index of a raw directory")
+    parser.add_argument("raw_dir", type=Path, help="The raw directory containing the ImportConfig.json file")
+    parser.add_argument("action", choices=["rebuild", "clear", "prune", "vacuum", "info"],
+                        help="rebuild: clear and re-index all DICOM directories of the ImportConfig.json; "
+                             "clear: remove all entries; prune: remove entries of missing or changed files; "
+                             "vacuum: prune and then compact the database; info: print the number of entries")
+    args = parser.parse_args()
+
+    index_path = get_header_index_path(args.raw_dir)
+    if args.action == "rebuild":
+        # Imported here, as the converter itself depends on this module
+        from src.xASL_GUI_DCM2NIFTI import rebuild_header_index
+        n_dirs, n_entries = rebuild_header_index(args.raw_dir)
+        print(f"Re-indexed {n_dirs} DICOM directories into {n_entries} entries at {index_path}")
+        return
+    if not index_path.exists():
+        print(f"No header index exists at {index_path}")
+        return
+
+    header_index = DICOM_HeaderIndex(index_path)
+    if args.action == "clear":
+        header_index.clear()
+        print(f"Cleared the header index at {index_path}")
+    elif args.action == "prune":
+        print(f"Pruned {header_index.prune()} stale entries from {index_path}")
+    elif args.action == "vacuum":
+        print(f"Pruned {header_index.vacuum()} stale entries from and compacted {index_path}")
+    print(f"The header index contains {len(header_index)} entries")
+    header_index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from os import cpu_count, environ
+from os import environ
 from itertools import chain
 from time import sleep
 from datetime import datetime
@@ -11,13 +11,16 @@ from watchdog.observers import Observer
 from src.xASL_GUI_HelperClasses import DandD_FileExplorer2LineEdit
 from src.xASL_GUI_Executor_ancillary import *
 from src.xASL_GUI_AnimationClasses import xASL_ImagePlayer, xASL_Lab
+from src.xASL_GUI_Logging import StudyLogService, get_queue_logger
+from src.xASL_GUI_ProcessSupervisor import ProcessOutputSupervisor
 from src.xASL_GUI_Executor_Modjobs import (xASL_GUI_RerunPrep, xASL_GUI_TSValter,
                                            xASL_GUI_ModSidecars, xASL_GUI_MergeDirs)
 from src.xASL_GUI_HelperFuncs_WidgetFuncs import (set_widget_icon, make_droppable_clearable_le, set_formlay_options,
                                                   robust_qmsg, dir_check, robust_getdir)
 from pprint import pprint
-from collections import defaultdict
+from collections import defaultdict, deque
 import subprocess
+import threading
 from shutil import rmtree, which
 from pathlib import Path
 from functools import partial
@@ -25,7 +28,6 @@ from platform import system
 import signal
 import psutil
 import re
-import logging
 
 
 class ExploreASL_WorkerSignals(QObject):
@@ -35,11 +37,14 @@ class ExploreASL_WorkerSignals(QObject):
 
 class ExploreASL_Worker(QRunnable):
     """
-    Worker thread for running lauching an ExploreASL MATLAB session with the given arguments
+    Worker for launching an ExploreASL MATLAB session with the given arguments. The worker only occupies a pool thread
+    while launching the session; its output is thereafter drained and parsed by the shared ProcessOutputSupervisor
     """
 
     def __init__(self, worker_parms, iworker, nworkers, imodules, worker_env):
         super().__init__()
+        # The worker outlives its run(), as the supervisor still calls back into it after the session was launched
+        self.setAutoDelete(False)
         # Main Attributes
         self.worker_parms: dict = worker_parms
         self.easl_scenario: str = self.worker_parms["EXPLOREASL_TYPE"]
@@ -63,35 +68,55 @@ class ExploreASL_Worker(QRunnable):
                                            r"(?:%%%([^#%&{}\\<>*?/$!'\":@+`|=]+))?\b")
         self.is_collecting_stdout_err = False
         self.has_easl_errors = False
+        self.has_crashed = False
+        self.err_container, self.n_collected, self.context = [], 0, ""
 
-        # Set up the Logging-related Attributes
-        try:
-            study_name: str = self.worker_parms["name"]
-        except KeyError:
-            study_name: str = f"Unspecified Study Name"
-        self.logger = logging.Logger(name=study_name, level=logging.DEBUG)
-        basename = f"tmp_RunWorker_{str(self.iworker).zfill(3)}.log"
-        self.handler = logging.FileHandler(filename=Path(self.analysis_dir) / basename, mode='w')
-        self.handler.setFormatter(logging.Formatter(fmt="%(asctime)s - %(name)s - %(levelname)s\n%(message)s"))
-        self.handler.setLevel(logging.DEBUG)
-        self.logger.addHandler(self.handler)
+        # Set up the Logging-related Attributes; the queue of the study's StudyLogService is given prior to the start
+        self.study_name: str = self.worker_parms.get("name", "Unspecified Study Name")
+        self.log_queue = None
+
+        # The supervisor draining the output of the session is also given prior to the start, as is the queue of
+        # (subject, DataPar path) tuples shared by all workers of the study when subjects are dispatched one at a time
+        self.supervisor: Union[ProcessOutputSupervisor, None] = None
+        self.subject_queue: Union[deque, None] = None
 
         # Other Worker Attributes
         self.signals = ExploreASL_WorkerSignals()
         self.is_running = False
+
+    # noinspection RegExpRedundantEscape
+    def run(self):
+        self.logger = get_queue_logger(self.study_name, self.log_queue)
         self.print_and_log(f"%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%\n"
                            f"Initialized Worker {self.iworker} of {self.nworkers} with the following givens:\n"
                            f"\tExploreASL Type: {self.easl_scenario}\n"
                            f"\tDataPar Path: {self.par_path}\n"
-                           f"\tIModules: {self.imodules}", msg_type="info")
+                           f"\tIModules: {self.imodules}\n"
+                           f"\tDispatches Subjects: {self.subject_queue is not None}", msg_type="info")
+        self.print_and_log(f"Worker {self.iworker}: Beginning Run", msg_type="info")
 
-    # noinspection RegExpRedundantEscape
-    def run(self):
+        # A study stopped by the user while still queued never launches; when subjects are dispatched, each session of
+        # this worker processes the next subject in the queue of the study
+        if self.terminate_attempted or (self.subject_queue is not None and not self.pull_next_subject()):
+            self.emit_exit_signature()
+            return
+        try:
+            self.launch_session()
+        except OSError as launch_err:
+            self.print_and_log(f"Worker {self.iworker}: Could not launch ExploreASL:\n{launch_err}")
+            self.has_crashed = True
+            self.emit_exit_signature()
+
+    def launch_session(self):
+        """
+        Prepares the arguments for and starts an ExploreASL session, whose output is then drained by the supervisor
+        """
         ##################################################
         # PREPARE ARGUMENTS AND RUN THE UNDERLYING PROGRAM
         ##################################################
-        self.print_and_log(f"Worker {self.iworker}: Beginning Run", msg_type="info")
         self.print_and_log(f"Worker {self.iworker}: ExploreASL Type = {self.easl_scenario}", msg_type="info")
+        # A session on a single-subject DataPar file is the only worker on that file
+        iworker, nworkers = (1, 1) if self.subject_queue is not None else (self.iworker, self.nworkers)
         if self.easl_scenario == "LOCAL_UNCOMPILED":
             mpath = self.worker_parms["WORKER_MATLAB_CMD_PATH"]
             exploreasl_path = self.worker_parms["MyPath"]
@@ -99,7 +124,7 @@ class ExploreASL_Worker(QRunnable):
             skip_pause = 1
 
             # Generate the string that the command line will feed into the MATLAB session
-            func_line = f"('{self.par_path}', {process_data}, {skip_pause}, {self.iworker}, {self.nworkers}, " \
+            func_line = f"('{self.par_path}', {process_data}, {skip_pause}, {iworker}, {nworkers}, " \
                         f"[{' '.join([str(item) for item in self.imodules])}])"
             matlab_cmd = "matlab" if which("matlab") is not None else mpath
             if self.worker_parms["WORKER_MATLAB_VER"] >= 2019:
@@ -114,10 +139,10 @@ class ExploreASL_Worker(QRunnable):
                                f"{cmd_path}", msg_type="info")
             if system() == "Windows":
                 self.print_and_log(f"Worker {self.iworker}: Was instructed to not create any windows as well.", "info")
-                self.proc = psutil.Popen(cmd_path, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                self.proc = psutil.Popen(cmd_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                                          creationflags=subprocess.CREATE_NO_WINDOW)
             else:
-                self.proc = psutil.Popen(cmd_path, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                self.proc = psutil.Popen(cmd_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
         elif self.easl_scenario == "LOCAL_COMPILED":
             process_data = 1
@@ -136,101 +161,143 @@ class ExploreASL_Worker(QRunnable):
 
             # Generate the string that the command line will feed into the complied MATLAB session
             if system() == "Windows":
-                func_line = f'{self.par_path} {process_data} {skip_pause} {self.iworker} {self.nworkers} ' \
+                func_line = f'{self.par_path} {process_data} {skip_pause} {iworker} {nworkers} ' \
                             f'"[{" ".join([str(item) for item in self.imodules])}]"'
                 cmd_line = f"{compiled_easl_script} {func_line}"
                 self.print_and_log(f"Worker {self.iworker}: Preparing subprocess with the following commands:\n"
                                    f"{cmd_line}", msg_type="info")
-                self.proc = psutil.Popen(cmd_line, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                self.proc = psutil.Popen(cmd_line, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                                          env=self.worker_env, creationflags=subprocess.CREATE_NO_WINDOW)
             else:
                 linux_bs = f"'{self.imodules}'"
-                func_line = f'"{self.par_path} {process_data} {skip_pause} {self.iworker} {self.nworkers} {linux_bs}"'
+                func_line = f'"{self.par_path} {process_data} {skip_pause} {iworker} {nworkers} {linux_bs}"'
                 cmd_line = [compiled_easl_script, self.worker_parms["MCRPath"], func_line]
                 self.print_and_log(f"Worker {self.iworker}: Preparing subprocess with the following commands:\n"
                                    f"{' '.join(cmd_line)}", msg_type="info")
-                self.proc = psutil.Popen(cmd_line, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                self.proc = psutil.Popen(cmd_line, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                                          env=self.worker_env)
 
         #######################
         # LISTEN DURING THE RUN
         #######################
-        err_container, n_collected, module, subject, run, context = [], 0, None, None, None, ""
+        # Both pipes are drained by the supervisor as output arrives; this pool thread is released right away
         self.is_running = True
-        while self.proc.is_running():
-
+        # A Stop that arrived while the session was being started found nothing running to kill, so it is carried out
+        # here. The session is not waited on, as this may be the thread of the supervisor; its exit is reported as usual
+        if self.terminate_attempted:
+            self.print_and_log(f"Worker {self.iworker}: Was terminated while launching ExploreASL. Stopping all child "
+                               f"processes now", msg_type="warning")
             try:
-                if self.terminate_attempted or self.proc.status() == psutil.STATUS_ZOMBIE:
-                    break
+                self.proc_gone, self.proc_alive = self.kill_proc_tree(pid=self.proc.pid, include_parent=True, timeout=0)
             except psutil.NoSuchProcess:
-                break
+                pass
+        self.supervisor.watch(self.proc, on_stdout_line=self.parse_stdout_line, on_exit=self.finish_run)
 
-            output = self.proc.stdout.readline().strip()  # This line is blocking in nature
-            # Break out of the process is no longer running
-            if output == '' and self.proc.poll() is not None:
-                break
+    def parse_stdout_line(self, output: str):
+        """
+        Incrementally parses the stdout of the session for error blocks of ExploreASL. Called by the supervisor for
+        every line of stdout
+        :param output: the line of stdout, without its line ending
+        """
+        output = output.strip()
+        # TODO When ExploreASL grants the ability to latch onto a new module/subject/run, get those givens to
+        #  refresh the context of the error
+        # if self.regex_findtarget.search(output):
+        #     module, subject, run = self.regex_findtarget.search(output).groups()
+        #     self.context = f"Given the following context:\nModule:\t{module}\nSubject:\t{subject}\nRun:\t{run}"
+
+        # If the line is the start of an error message, activate collecting mode
+        if self.regex_errstart.search(output):
+            self.is_collecting_stdout_err = True
+            self.has_easl_errors = True
+
+        # If the line is the end of an error message, deactivate collecting mode and log the error away
+        elif self.regex_errend.search(output) or self.n_collected > 50:
+            self.flush_err_container()
+
+        # Collect ExploreASL error output if collecting mode is on
+        if self.is_collecting_stdout_err and output not in {"", " ", "\n"}:
+            self.err_container.append(output)
+            self.n_collected += 1
+
+    def flush_err_container(self):
+        self.err_container.append("")
+        msg = "\n".join(self.err_container)
+        self.print_and_log(f"Worker {self.iworker} detected the following Error message from "
+                           f"ExploreASL:{self.context}\n{msg}")
+        self.err_container.clear()
+        self.is_collecting_stdout_err = False
+        self.n_collected = 0
 
-            # TODO When ExploreASL grants the ability to latch onto a new module/subject/run, get those givens to
-            #  refresh the context of the error
-            # elif self.regex_findtarget.search(output):
-            #     module, subject, run = self.regex_findtarget.search(output).groups()
-            #     context = f"Given the following context:\nModule:\t{module}\nSubject:\t{subject}\nRun:\t{run}"
-
-            # If the line is the start of an error message, activate collecting mode
-            elif self.regex_errstart.search(output):
-                self.is_collecting_stdout_err = True
-                self.has_easl_errors = True
-
-            # If the line is the end of an error message, deactivate collecting mode and log the error away
-            elif self.regex_errend.search(output) or n_collected > 50:
-                err_container.append("")
-                msg = "\n".join(err_container)
-                self.print_and_log(f"Worker {self.iworker} detected the following Error message from "
-                                   f"ExploreASL:{context}\n{msg}")
-                err_container.clear()
-                self.is_collecting_stdout_err = False
-                n_collected = 0
-
-            # Collect ExploreASL error output if collecting mode is on
-            if self.is_collecting_stdout_err and output not in {"", " ", "\n"}:
-                err_container.append(output)
-                n_collected += 1
-                print(output)
-
-        _, stderr = self.proc.communicate()
-        self.print_and_log(f"Worker {self.iworker}: has received return code {self.proc.returncode}", msg_type="info")
+    def finish_run(self, exitcode: int, stderr: str):
+        """
+        Logs the outcome of the session and either launches the session for the next dispatched subject or informs the
+        Executor that this worker is done. Called by the supervisor once the session has exited and its output was
+        drained
+        :param exitcode: the return code of the session
+        :param stderr: the most recent lines of the stderr of the session
+        """
+        # An error block cut short by the end of the session is still logged
+        if self.is_collecting_stdout_err:
+            self.flush_err_container()
+        self.print_and_log(f"Worker {self.iworker}: has received return code {exitcode}", msg_type="info")
         self.is_running = False
         if self.terminate_attempted:
             self.print_and_log(f"Following Attempt to Terminate, the following givens were determined:\n"
                                f"{self.proc_gone=}\n{self.proc_alive=}", msg_type="warning")
 
+        session_crashed = all([not self.terminate_attempted, exitcode != 0])
+        if session_crashed:
+            self.has_crashed = True
+            self.print_and_log(f"Worker {self.iworker}: Has recovered the following crash report:\n{stderr}")
+
+        # An idle worker pulls the next subject, if any remain and the user has not stopped the study
+        if self.subject_queue is not None and not self.terminate_attempted and self.pull_next_subject():
+            try:
+                self.launch_session()
+                return
+            except OSError as launch_err:
+                self.print_and_log(f"Worker {self.iworker}: Could not launch ExploreASL:\n{launch_err}")
+                self.has_crashed = True
+        self.emit_exit_signature()
+
+    def emit_exit_signature(self):
         #################################
         # SEND THE APPROPRIATE END SIGNAL
         #################################
-        exitcode = self.proc.returncode
-        has_crashed = all([not self.terminate_attempted, exitcode != 0])
         log_msg = f"Worker {self.iworker}: Has finished with the following exit signature:\n" \
                   f"\t- Was terminated by user? {self.terminate_attempted}\n" \
                   f"\t- Had ExploreASL errors? {self.has_easl_errors}\n" \
-                  f"\t- Experienced a crash-like error? {has_crashed}"
+                  f"\t- Experienced a crash-like error? {self.has_crashed}"
         self.print_and_log(log_msg, "info")
-        if has_crashed:
-            self.print_and_log(f"Worker {self.iworker}: Has recovered the following crash report:\n{stderr}")
-        self.signals.signal_finished_processing.emit((self.terminate_attempted, self.has_easl_errors, has_crashed),
-                                                     self.analysis_dir)
+        self.signals.signal_finished_processing.emit((self.terminate_attempted, self.has_easl_errors,
+                                                      self.has_crashed), self.analysis_dir)
 
         ###############
         # FINAL CLEANUP
         ###############
-        self.logger.removeHandler(self.handler)
-        del self.handler
         del self.logger
 
+    def pull_next_subject(self) -> bool:
+        """
+        Takes the next subject from the queue of the study and points this worker at its single-subject DataPar file
+        :return: whether a subject remained in the queue
+        """
+        try:
+            subject, self.par_path = self.subject_queue.popleft()
+        except IndexError:
+            return False
+        self.print_and_log(f"Worker {self.iworker}: Pulled subject {subject} with DataPar Path: {self.par_path}",
+                           msg_type="info")
+        self.signals.signal_inform_output.emit(f"Worker {self.iworker} of {self.nworkers} for study "
+                                               f"{str(self.analysis_dir)} is now processing subject {subject}")
+        return True
+
     def print_and_log(self, msg: str, msg_type: str = "error"):
         try:
+            # The log service of the study echoes to the console by itself when in DeveloperMode
             if msg_type in {"info", "warning", "error", "critical"}:
                 getattr(self.logger, msg_type)(msg)
-            print(msg)
         except AttributeError as attr_err:
             print(f"Worker{self.iworker} received an attribute error in {self.print_and_log.__name__}\n:{attr_err}")
 
@@ -250,6 +317,9 @@ class ExploreASL_Worker(QRunnable):
 
     @Slot()
     def pause_run(self):
+        # A worker of a queued study has no session to pause yet
+        if not self.is_running:
+            return
         self.print_and_log(f"Worker {self.iworker}: Received a Request to Pause all Work. Attempting to pause all "
                            f"child processes now", msg_type="info")
         self.pause_resume_proc_tree(pid=self.proc.pid, pause=True, include_parent=True)
@@ -264,6 +334,8 @@ class ExploreASL_Worker(QRunnable):
 
     @Slot()
     def resume_run(self):
+        if not self.is_running:
+            return
         self.print_and_log(f"Worker {self.iworker}: Received a Request to Resume all Work. Attempting to wake up all "
                            f"child processes now", msg_type="info")
         self.pause_resume_proc_tree(pid=self.proc.pid, pause=False, include_parent=True)
@@ -329,6 +401,7 @@ class xASL_Executor(QMainWindow):
 
         # Other instance variables
         self.threadpool = QThreadPool()
+        self.output_supervisor = ProcessOutputSupervisor()
         self.movie_path = Path(self.config["ProjectDir"]) / "media" / "EASL_Running.gif"
 
         # MISC VARIABLES
@@ -403,15 +476,24 @@ class xASL_Executor(QMainWindow):
         self.vlay_scrollholder.addWidget(self.scroll_taskschedule)
 
         self.vlay_taskschedule = QVBoxLayout(self.cont_taskschedule)
-        self.lab_coresinfo = QLabel(text=f"CPU Count: A total of {cpu_count() // 2} "
-                                         f"processors are available on this machine")
-        self.ncores_left = cpu_count() // 2
-        self.lab_coresleft = QLabel(text=f"You are permitted to set up to {self.ncores_left} more core(s)")
+        # Studies beyond the core budget are queued, so the number of studies is no longer bound to the cores
+        self.ncores_physical, _ = get_core_budget(self.config.get("RAMPerCoreGB", 4.0))
+        self.lab_coresinfo = QLabel()
+        self.lab_coresleft = QLabel()
+        self.cont_ramper = QWidget()
+        self.hlay_ramper = QHBoxLayout(self.cont_ramper)
+        self.lab_ramper = QLabel(text=f"Indicate the memory (GB) each core of ExploreASL needs:")
+        self.spin_ramper = QDoubleSpinBox(self.cont_ramper, minimum=0, maximum=256, singleStep=0.5,
+                                          value=self.config.get("RAMPerCoreGB", 4.0))
+        self.spin_ramper.setToolTip(self.exec_tips["spin_ramper"])
+        self.spin_ramper.valueChanged.connect(self.set_ram_per_core)
+        self.hlay_ramper.addWidget(self.lab_ramper)
+        self.hlay_ramper.addWidget(self.spin_ramper)
         self.cont_nstudies = QWidget()
         self.hlay_nstudies = QHBoxLayout(self.cont_nstudies)
         self.lab_nstudies = QLabel(text=f"Indicate the number of studies you wish to process:")
         self.cmb_nstudies = QComboBox(self.cont_nstudies)
-        self.nstudies_options = ["Select"] + list(map(str, range(1, (cpu_count() // 2 + 1))))
+        self.nstudies_options = ["Select"] + list(map(str, range(1, 51)))
         self.cmb_nstudies.addItems(self.nstudies_options)
         self.cmb_nstudies.currentTextChanged.connect(self.UI_Setup_TaskScheduler_FormUpdate)
         self.cmb_nstudies.currentTextChanged.connect(self.set_ncores_left)
@@ -433,6 +515,7 @@ class xASL_Executor(QMainWindow):
         self.formlay_buttons_list = []
         self.formlay_cmbs_ncores_list = []
         self.formlay_cmbs_runopts_list = []
+        self.formlay_chks_dispatch_list = []
         self.formlay_nrows = 0
         self.formlay_progbars_list = []
         self.formlay_stopbtns_list = []
@@ -440,7 +523,8 @@ class xASL_Executor(QMainWindow):
         self.formlay_resumebtns_list = []
         self.formlay_movies_list = []
 
-        for widget in [self.lab_coresinfo, self.lab_coresleft, self.cont_nstudies, self.cont_tasks, self.cont_progbars]:
+        for widget in [self.lab_coresinfo, self.lab_coresleft, self.cont_ramper, self.cont_nstudies, self.cont_tasks,
+                       self.cont_progbars]:
             self.vlay_taskschedule.addWidget(widget)
         self.vlay_taskschedule.addStretch(2)
         self.cmb_nstudies.setCurrentIndex(1)
@@ -471,10 +555,8 @@ class xASL_Executor(QMainWindow):
                 inner_cmb_ncores = QComboBox()
                 inner_cmb_ncores.setMinimumWidth(140)
                 inner_cmb_ncores.setToolTip(self.exec_tips["inner_cmb_ncores"])
-                inner_cmb_ncores.addItems(list(map(str, range(1, cpu_count() // 2 + 1))))
+                inner_cmb_ncores.addItems(list(map(str, range(1, self.ncores_physical + 1))))
                 inner_cmb_ncores.currentTextChanged.connect(self.set_ncores_left)
-                inner_cmb_ncores.currentTextChanged.connect(self.set_ncores_selectable)
-                inner_cmb_ncores.currentTextChanged.connect(self.set_nstudies_selectable)
                 inner_cmb_ncores.currentTextChanged.connect(self.is_ready_to_run)
 
                 # Lineedit to specify
@@ -493,6 +575,10 @@ class xASL_Executor(QMainWindow):
                 inner_cmb_procopts.setCurrentIndex(2)
                 inner_cmb_procopts.currentTextChanged.connect(self.is_ready_to_run)
 
+                # Checkbox to specify whether subjects should be dispatched one at a time to the alloted cores
+                inner_chk_dispatch = QCheckBox(checked=False)
+                inner_chk_dispatch.setToolTip(self.exec_tips["inner_chk_dispatch"])
+
                 # Stop Button
                 stop_icon_path = Path(self.config["ProjectDir"]) / "media" / "stop_processing.png"
                 inner_btn_stop = QPushButton(QIcon(str(stop_icon_path)), "", enabled=False)
@@ -530,7 +616,7 @@ class xASL_Executor(QMainWindow):
                 inner_formlay = QFormLayout(inner_grp)
                 if system() == "Darwin":
                     set_formlay_options(inner_formlay, vertical_spacing=0)
-                    for widget in [inner_cmb_ncores, inner_le, inner_cmb_procopts, inner_btn_stop,
+                    for widget in [inner_cmb_ncores, inner_le, inner_cmb_procopts, inner_chk_dispatch, inner_btn_stop,
                                    inner_btn_pause, inner_btn_resume
                                    ]:
                         widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
@@ -541,6 +627,7 @@ class xASL_Executor(QMainWindow):
                 inner_hbox.addWidget(inner_btn_browsedirs)
                 inner_formlay.addRow("Study Folder", inner_hbox)
                 inner_formlay.addRow(xASL_Lab(inner_movie, "Which Modules to Run"), inner_cmb_procopts)
+                inner_formlay.addRow("Dispatch Subjects", inner_chk_dispatch)
                 inner_formlay.addRow(inner_movie, inner_hbox_ctrls)
 
                 # Add progressbars
@@ -557,6 +644,7 @@ class xASL_Executor(QMainWindow):
                 self.formlay_lineedits_list.append(inner_le)
                 self.formlay_buttons_list.append(inner_btn_browsedirs)
                 self.formlay_cmbs_runopts_list.append(inner_cmb_procopts)
+                self.formlay_chks_dispatch_list.append(inner_chk_dispatch)
                 self.formlay_progbars_list.append(inner_progbar)
                 self.formlay_stopbtns_list.append(inner_btn_stop)
                 self.formlay_pausebtns_list.append(inner_btn_pause)
@@ -577,6 +665,7 @@ class xASL_Executor(QMainWindow):
                 self.formlay_lineedits_list.pop()
                 self.formlay_buttons_list.pop()
                 self.formlay_cmbs_runopts_list.pop()
+                self.formlay_chks_dispatch_list.pop()
                 self.formlay_progbars_list.pop()
                 self.formlay_stopbtns_list.pop()
                 self.formlay_pausebtns_list.pop()
@@ -586,8 +675,6 @@ class xASL_Executor(QMainWindow):
 
         # Adjust the number of cores selectable in each of the comboboxes
         self.set_ncores_left()
-        self.set_ncores_selectable()
-        self.set_nstudies_selectable()
         self.is_ready_to_run()
 
     # Left side setup; launches additional windows for specialized jobs such as modifying participants.tsv, preparing
@@ -661,45 +748,23 @@ class xASL_Executor(QMainWindow):
     ##########################
     # TASK SCHEDULER FUNCTIONS
     ##########################
-    # Function responsible for adjusting the label of how many cores are still accessible
+    # Function responsible for adjusting the labels of the core budget and of how the requested cores relate to it
     def set_ncores_left(self):
-        self.ncores_left = cpu_count() // 2 - sum([int(cmb.currentText()) for cmb in self.formlay_cmbs_ncores_list])
-        if self.ncores_left > 0:
-            self.lab_coresleft.setText(f"You are permitted to set up to {self.ncores_left} more core(s)")
-        elif self.ncores_left == 0:
-            self.lab_coresleft.setText(f"No more cores are avaliable for allocation")
+        n_physical, n_by_ram = get_core_budget(self.spin_ramper.value())
+        self.lab_coresinfo.setText(f"CPU Count: A total of {n_physical} physical processors are available on this "
+                                   f"machine; the memory currently available can accommodate {n_by_ram} core(s)")
+        n_requested = sum([int(cmb.currentText()) for cmb in self.formlay_cmbs_ncores_list])
+        if n_requested <= min(n_physical, n_by_ram):
+            self.lab_coresleft.setText(f"All {n_requested} requested core(s) fit within the core budget")
         else:
-            self.lab_coresleft.setText(f"Something went terribly wrong")
-
-    # Function responsible for adjusting the choices avaliable within each of the comboboxes of a given task row
-    def set_ncores_selectable(self):
-        self.ncores_left = cpu_count() // 2 - sum([int(cmb.currentText()) for cmb in self.formlay_cmbs_ncores_list])
-        cores_left = self.ncores_left
-        for box in self.formlay_cmbs_ncores_list:
-            current_selection = int(box.currentText())
-            max_cores_allowed = current_selection + cores_left
-            for idx in range(box.count()):
-                val_at_idx = int(box.itemText(idx))
-                if val_at_idx <= max_cores_allowed:
-                    box.model().item(idx).setEnabled(True)
-                else:
-                    box.model().item(idx).setEnabled(False)
-
-    # Function responsible for adjusting the number of studies still permitted (assuming 1 core will be initially
-    # allocated to it)
-    def set_nstudies_selectable(self):
-        self.ncores_left = cpu_count() // 2 - sum([int(cmb.currentText()) for cmb in self.formlay_cmbs_ncores_list])
-        current_n_studies = int(self.cmb_nstudies.currentText())
-        max_studies_allowed = current_n_studies + self.ncores_left
-        for idx in range(self.cmb_nstudies.count()):
-            val_at_idx = self.cmb_nstudies.itemText(idx)
-            if not val_at_idx.isdigit():
-                continue
-            val_at_idx = int(val_at_idx)
-            if val_at_idx <= max_studies_allowed:
-                self.cmb_nstudies.model().item(idx).setEnabled(True)
-            else:
-                self.cmb_nstudies.model().item(idx).setEnabled(False)
+            self.lab_coresleft.setText(f"{n_requested} core(s) are requested; studies that do not fit within the core "
+                                       f"budget are queued until the cores of earlier studies free up")
+
+    # Function responsible for remembering the memory needed by a core of ExploreASL across sessions of the GUI
+    def set_ram_per_core(self, value: float):
+        self.config["RAMPerCoreGB"] = value
+        self.parent().save_config()
+        self.set_ncores_left()
 
     # This slot is responsible for setting the correct analysis directory to a given task row's lineedit correcting
     @Slot(int)
@@ -797,6 +862,12 @@ class xASL_Executor(QMainWindow):
         self.total_process_dbt += 1
         self.processing_summary_dict[study_dir].append(exit_signature)
 
+        # Once the last worker of a study is done, its cores go to the studies that are still queued
+        self.running_studies[study_dir][1] -= 1
+        if self.running_studies[study_dir][1] == 0:
+            self.ncores_running -= self.running_studies.pop(study_dir)[0]
+            self.start_queued_studies()
+
         # Do not proceed until the total debt is cleared
         if self.total_process_dbt != 0:
             return
@@ -827,24 +898,12 @@ class xASL_Executor(QMainWindow):
                 progbar.setPalette(self.red_palette)
                 s_missinglocks.append(study_dir)
 
-            # Next, for a given study, clean up the temporary worker log files into a single log
-            study_dir = Path(study_dir).resolve()
-            tmp_worker_files = sorted(study_dir.glob("tmp_RunWorker_*.log"))
-            if len(tmp_worker_files) == 0:
+            # Next, for a given study, let its log service write out the remaining messages of its workers
+            log_service = self.log_services.pop(study_dir, None)
+            if log_service is None:
                 continue
-            content = []
-            for tmp_file in tmp_worker_files:
-                with open(tmp_file) as tmp_reader:
-                    content.append(tmp_reader.read())
-                tmp_file.unlink(missing_ok=True)
-
-            # Concatenate content to write, prepare the log dir & file, then write to it
-            to_write = "\n\n".join(content)
-            err_write_date_str = datetime.now().strftime("%a-%b-%d-%Y_%H-%M-%S")
-            dst_logfile = study_dir / "Logs" / "Processing Logs" / f"Run_Log_{err_write_date_str}.log"
-            dst_logfile.parent.mkdir(parents=True, exist_ok=True)
-            with open(dst_logfile, "w") as log_writer:
-                log_writer.write(to_write)
+            log_service.stop()
+            study_dir = Path(study_dir).resolve()
 
             # Finally, parse the exit signatures
             b_userterm, b_has_easlerrs, b_has_crashed = tuple(zip(*exit_signatures))
@@ -882,19 +941,46 @@ class xASL_Executor(QMainWindow):
         robust_qmsg(self, "warning", title="One or more errors detected during run",
                     body="Please take a look at the text output for a summary of the errors detected")
 
+    def start_queued_studies(self):
+        """
+        Starts the studies at the front of the queue for as long as their alloted cores fit within the physical cores
+        not in use by running studies and within the memory currently available. The study at the front is always
+        started if no study is running, such that a budget smaller than its alloted cores cannot stall the queue
+        """
+        n_physical, n_by_ram = get_core_budget(self.config.get("RAMPerCoreGB", 4.0))
+        # Sessions started just now have yet to claim their memory, so their cores are reserved against the budget
+        n_reserved = 0
+        while self.study_queue:
+            watcher, worker_block = self.study_queue[0]
+            n_cores = len(worker_block)
+            if self.running_studies and n_cores > min(n_physical - self.ncores_running, n_by_ram - n_reserved):
+                break
+            self.study_queue.popleft()
+            study_dir = worker_block[0].analysis_dir
+            self.running_studies[study_dir] = [n_cores, n_cores]  # Alloted cores and workers yet to finish
+            self.ncores_running += n_cores
+            n_reserved += n_cores
+            self.formlay_progbars_list[watcher.study_idx].setFormat("%p%")
+            self.textedit_textoutput.append(f"Starting {n_cores} worker(s) for study:\n{study_dir}")
+            # The watcher is started first, such that it cannot miss the earliest status files of the workers
+            watcher.start()
+            for worker in worker_block:
+                self.threadpool.start(worker)
+
     # Convenience function; deactivates all widgets associated with running exploreASL
     def set_widgets_activation_states(self, state: bool):
         self.btn_runExploreASL.setEnabled(state)
         self.cmb_nstudies.setEnabled(state)
 
         zipper = zip(self.formlay_cmbs_ncores_list, self.formlay_lineedits_list, self.formlay_buttons_list,
-                     self.formlay_cmbs_runopts_list, self.formlay_stopbtns_list, self.formlay_pausebtns_list,
-                     self.formlay_resumebtns_list)
-        for core_cmb, le, browse_btn, runopt_cmb, stop_btn, pause_btn, resume_btn in zipper:
+                     self.formlay_cmbs_runopts_list, self.formlay_chks_dispatch_list, self.formlay_stopbtns_list,
+                     self.formlay_pausebtns_list, self.formlay_resumebtns_list)
+        for core_cmb, le, browse_btn, runopt_cmb, dispatch_chk, stop_btn, pause_btn, resume_btn in zipper:
             core_cmb.setEnabled(state)
             le.setEnabled(state)
             browse_btn.setEnabled(state)
             runopt_cmb.setEnabled(state)
+            dispatch_chk.setEnabled(state)
             stop_btn.setEnabled(not state)
 
             # Slightly different behaviors for the other btns
@@ -958,15 +1044,22 @@ class xASL_Executor(QMainWindow):
 
         # Dict whose keys are study dirs paths (str) and values are lists of booleans of whether a worker had errors
         self.processing_summary_dict = defaultdict(list)
+        # Dict whose keys are study dirs paths (str) and values are the log services writing the logs of those studies
+        self.log_services = {}
+        # The queue of studies that have yet to start and the bookkeeping of the cores used by the running studies
+        self.study_queue = deque()
+        self.running_studies = {}
+        self.ncores_running = 0
 
         # Clear the textoutput each time
         self.textedit_textoutput.clear()
 
         # Outer for loop; loops over the studies
-        for study_idx, (box, path, run_opts, progressbar, stop_btn, pause_btn, resume_btn) in enumerate(
+        for study_idx, (box, path, run_opts, dispatch_chk, progressbar, stop_btn, pause_btn, resume_btn) in enumerate(
                 zip(self.formlay_cmbs_ncores_list,  # Comboboxes for number of cores
                     self.formlay_lineedits_list,  # Lineedits for analysis directory path
                     self.formlay_cmbs_runopts_list,  # Comboboxes for the modules to run
+                    self.formlay_chks_dispatch_list,  # Checkboxes for dispatching subjects one at a time
                     self.formlay_progbars_list,  # Progressbars
                     self.formlay_stopbtns_list,  # Stop Buttons
                     self.formlay_pausebtns_list,  # Pause Buttons
@@ -1118,33 +1211,14 @@ class xASL_Executor(QMainWindow):
                                 variables=[str(ana_path)])
                     return
 
-            # %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
-            # Step 3 - Prepare the workers for that study
-            # Inner for loop: loops over the range of the num of cores within a study. Each core will be an iWorker
-            for ii in range(box.count()):
-                if ii < int(box.currentText()):
-                    worker = ExploreASL_Worker(
-                        worker_parms=parms,
-                        iworker=ii + 1,  # iWorker
-                        nworkers=int(box.currentText()),  # nWorkers
-                        imodules=translator[run_opts.currentText()],  # Which modules Structural, ASL, Both, Population
-                        worker_env=worker_env
-                    )
-
-                    inner_worker_block.append(worker)
-                    debt -= 1
-                    self.total_process_dbt -= 1
-
-            # Add the block to the main workers argument
-            self.workers.append(inner_worker_block)
-
             # %%%%%%%%%%%%%%%%%%%%%%%%%
-            # Step 4 - Calculate the anticipated workload based on missing .STATUS files; adjust the progressbar's
+            # Step 3 - Calculate the anticipated workload based on missing .STATUS files; adjust the progressbar's
             # maxvalue from that
             # This now ALSO makes the lock dirs that do not exist
-            workload, expected_status_files = calculate_anticipated_workload(parmsdict=parms,
-                                                                             run_options=run_opts.currentText(),
-                                                                             translators=self.exec_translators)
+            workload, status_index = calculate_anticipated_workload(parmsdict=parms,
+                                                                    run_options=run_opts.currentText(),
+                                                                    translators=self.exec_translators)
+            expected_status_files = [Path(status_file) for status_file in status_index]
 
             # Also delete any directories called "locked" in the study
             locked_dirs = peekable(ana_path.rglob("locked"))
@@ -1178,16 +1252,47 @@ class xASL_Executor(QMainWindow):
                 print(f"EXPECTED STATUS FILES TO BE GENERATED FOR STUDY: {str(ana_path)}")
                 pprint(sorted(expected_status_files))
 
+            # %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+            # Step 4 - Prepare the workers for that study
+            # When subjects are dispatched, the workers share a queue of single-subject DataPar files, slowest first,
+            # and there is no use for more workers than there are subjects with work remaining
+            n_workers, subject_queue = int(box.currentText()), None
+            if dispatch_chk.isChecked() and run_opts.currentText() != "Population":
+                subject_workloads = get_subject_workloads(status_index)
+                subject_queue = deque(prepare_subject_datapars(parms, subject_workloads))
+                n_workers = min(n_workers, len(subject_queue))
+                self.textedit_textoutput.append(f"Dispatching {len(subject_queue)} subjects one at a time over "
+                                                f"{n_workers} cores for study:\n{ana_path}")
+
+            # Inner for loop: loops over the range of the num of cores within a study. Each core will be an iWorker
+            for ii in range(box.count()):
+                if ii < n_workers:
+                    worker = ExploreASL_Worker(
+                        worker_parms=parms,
+                        iworker=ii + 1,  # iWorker
+                        nworkers=n_workers,  # nWorkers
+                        imodules=translator[run_opts.currentText()],  # Which modules Structural, ASL, Both, Population
+                        worker_env=worker_env
+                    )
+
+                    worker.subject_queue = subject_queue
+                    inner_worker_block.append(worker)
+                    debt -= 1
+                    self.total_process_dbt -= 1
+
+            # Add the block to the main workers argument
+            self.workers.append(inner_worker_block)
+
             # %%%%%%%%%%%%%%%%%%%%%%%%%%%
             # Step 5 - Create a Watcher for that study
-            watcher = ExploreASL_Watcher(target=path.text(),  # the analysis directory
+            watcher = ExploreASL_Watcher(target=str(ana_path),  # the analysis directory, as it appears in the index
                                          regex=str_regex,  # the regex used to recognize subjects
                                          watch_debt=debt,  # the debt used to determine when to stop watching
                                          study_idx=study_idx,
                                          # the identifier used to know which progressbar to signal
                                          translators=self.exec_translators,
                                          config=self.config,
-                                         anticipated_paths=set(expected_status_files),
+                                         status_index=status_index,
                                          datapar_dict=parms
                                          )
             self.textedit_textoutput.append(f"Setting a Watcher thread on {str(ana_path)}")
@@ -1221,12 +1326,26 @@ class xASL_Executor(QMainWindow):
         ######################################
         # THIS IS NOW OUTSIDE OF THE FOR LOOPS
 
-        # self.watchers is nested at this point; we need to flatten it
+        # Each study enters the queue with its watcher and its block of workers; self.workers is nested at this point,
+        # so it is flattened afterwards
+        self.study_queue = deque(zip(self.watchers, self.workers))
         self.workers = list(chain(*self.workers))
 
-        # Launch all threads in one go
-        for runnable in self.workers + self.watchers:
-            self.threadpool.start(runnable)
+        # One background log writer per study, only created now that every study has passed its checks
+        now_str = datetime.now().strftime("%a-%b-%d-%Y_%H-%M-%S")
+        for worker in self.workers:
+            if worker.analysis_dir not in self.log_services:
+                log_path = Path(worker.analysis_dir) / "Logs" / "Processing Logs" / f"Run_Log_{now_str}.log"
+                self.log_services[worker.analysis_dir] = StudyLogService(
+                    log_path=log_path, b_echo=self.config["DeveloperMode"],
+                    b_compress=self.config.get("CompressLogs", False))
+            worker.log_queue = self.log_services[worker.analysis_dir].queue
+            worker.supervisor = self.output_supervisor
+
+        # Launch as many studies as the core budget allows; the others start as the cores of earlier studies free up
+        for watcher, _ in self.study_queue:
+            self.formlay_progbars_list[watcher.study_idx].setFormat("Queued")
+        self.start_queued_studies()
 
         self.set_widgets_activation_states(False)
 
@@ -1244,23 +1363,35 @@ class ExploreASL_WatcherSignals(QObject):
 
 
 # noinspection PyCallingNonCallable
-class ExploreASL_Watcher(QRunnable):
+class ExploreASL_Watcher:
     """
     Modified file system watcher. Will monitor the appearance of STATUS files within the lock dirs of the analysis
     directory. If it detects a STATUS file, it will emit signals to:
     1) update the progress bars
     2) inform the text editor view of which STATUS file was made so as to give user feedback
     3)
+    The watcher occupies no thread of its own: events arrive on the thread of its observer, which is stopped the moment
+    the last worker of the study reports back
     """
 
-    def __init__(self, target, regex, watch_debt, study_idx, translators, config, anticipated_paths: set,
-                 datapar_dict: dict):
-        super().__init__()
+    def __init__(self, target, regex, watch_debt, study_idx, translators, config, status_index: dict,
+                 datapar_dict: dict, coalesce_interval: float = 0.5):
         self.signals = ExploreASL_WatcherSignals()
         self.dir_to_watch = Path(target) / "lock"
-        self.anticipated_paths: set = anticipated_paths
         self.datapar_dict = datapar_dict
 
+        # Anticipated status files are looked up by their filepath (str); a "locked" dir only signals the start of a
+        # module if its lock dir still anticipates status files
+        self.status_index: dict = status_index
+        self.lockdir_index = {str(Path(status_file).parent): (module, subject)
+                              for status_file, (_, subject, _, module, _) in status_index.items()}
+
+        # Events are coalesced over a short window and processed as one batch
+        self.coalesce_interval = coalesce_interval
+        self.pending_paths = []
+        self.pending_lock = threading.Lock()
+        self.pending_timer = None
+
         # Regexes
         self.subject_regex = re.compile(regex)
         self.module_regex = re.compile('module_(ASL|Structural|Population)')
@@ -1272,6 +1403,8 @@ class ExploreASL_Watcher(QRunnable):
                                     f"xASL_module_Population{delimiter}(.*\\.status)")
 
         self.watch_debt = watch_debt
+        self.debt_lock = threading.Lock()
+        self.workers_done = threading.Event()
         self.study_idx = study_idx
         self.config = config
 
@@ -1283,7 +1416,7 @@ class ExploreASL_Watcher(QRunnable):
 
         self.observer = Observer()
         self.event_handler = ExploreASL_EventHandler()
-        self.event_handler.signals.inform_file_creation.connect(self.process_message)
+        self.event_handler.signals.inform_file_creation.connect(self.queue_event)
         self.observer.schedule(event_handler=self.event_handler,
                                path=str(self.dir_to_watch),
                                recursive=True)
@@ -1341,88 +1474,115 @@ class ExploreASL_Watcher(QRunnable):
 
         return msgs_to_return
 
-    # Processes the information sent from the event hander and emits signals to update widgets in the main Executor
+    # Collects the paths sent from the event handler; the first path of a window schedules the processing of the batch
     @Slot(str)
-    def process_message(self, created_path):
-        if created_path in self.msgs_seen:
-            print(f"{created_path} was already seen")
-            return
-        else:
+    def queue_event(self, created_path: str):
+        with self.pending_lock:
+            self.pending_paths.append(created_path)
+            if self.pending_timer is not None:
+                return
+            self.pending_timer = threading.Timer(self.coalesce_interval, self.process_pending)
+            self.pending_timer.daemon = True
+            self.pending_timer.start()
+
+    # Processes a batch of collected paths and emits a single signal of each kind to update widgets in the Executor
+    def process_pending(self):
+        with self.pending_lock:
+            created_paths, self.pending_paths = self.pending_paths, []
+            self.pending_timer = None
+
+        msgs, workload_val = [], 0
+        for created_path in created_paths:
+            if created_path in self.msgs_seen:
+                continue
             self.msgs_seen.add(created_path)
-
-        detected_subject = self.subject_regex.search(created_path)
-        detected_module = self.module_regex.search(created_path)
-
-        created_path = Path(created_path)
-        msg = None
-        workload_val = None
-        files_to_skip = []
-
-        if created_path.name == "locked":  # Lock dir
-            n_statfile = len(list(created_path.parent.glob("*.status")))
-            if detected_module.group(1) == "Structural" and n_statfile < len(self.struct_status_file_translator.keys()):
-                msg = f"Structural Module has started for subject: {detected_subject.group()}"
-            elif detected_module.group(1) == "ASL" and n_statfile < len(self.asl_status_file_translator.keys()):
-                msg = f"ASL Module has started for subject: {detected_subject.group()}"
-            elif detected_module.group(1) == "Population" and not self.pop_mod_started:
-                self.pop_mod_started = True
-                msg = f"Population Module has started"
-            else:
-                pass
-
-        elif created_path.is_file():  # Status file
-            if detected_module.group(1) == "Structural" and detected_subject:
-                msg = f"Completed {self.struct_status_file_translator[created_path.name]} in the Structural module " \
-                      f"for subject: {detected_subject.group()}"
-                # files_to_skip = self.determine_skip(which_dict="Structural", created_status_path=created_path,
-                #                                     subject=detected_subject.group())
-            elif detected_module.group(1) == "ASL" and detected_subject:
-                run = self.asl_struct_regex.search(str(created_path)).group(2)
-                msg = f"Completed {self.asl_status_file_translator[created_path.name]} in the ASL module " \
-                      f"for subject: {detected_subject.group()} ; run: {run}"
-                # files_to_skip = self.determine_skip(which_dict="ASL", created_status_path=created_path,
-                #                                     subject=detected_subject.group(), run=run)
-            elif detected_module.group(1) == "Population":
-                msg = f"Completed {self.pop_status_file_translator[created_path.name]} in the Population module"
-                # files_to_skip = self.determine_skip(which_dict="Population", created_status_path=created_path)
-
-            workload_val = self.workload_translator[created_path.name]
-
-        else:
-            pass
-
-        # Emit the message to inform the user of the most recent progress
-        if msg:
-            self.signals.update_text_output_signal.emit(msg)
-            # print(f"{files_to_skip=}")
-            if len(files_to_skip) > 0:
-                for file_msg in files_to_skip:
-                    self.signals.update_text_output_signal.emit(file_msg)
-
-        # Avoid emitting workload values for anything that was not an anticipated path
-        if created_path not in self.anticipated_paths:
-            return
-
-        # Emit the workload value associated with the completion of that status file as well as the study idx so that
-        # the appropriate progressbar is updated
+            msg, path_workload = self.process_message(created_path)
+            if msg:
+                msgs.append(msg)
+            workload_val += path_workload
+
+        # Emit the messages to inform the user of the most recent progress
+        if msgs:
+            self.signals.update_text_output_signal.emit("\n".join(msgs))
+        # Emit the workload value associated with the completion of those status files as well as the study idx so
+        # that the appropriate progressbar is updated
         if workload_val:
             self.signals.update_progbar_signal.emit(workload_val, self.study_idx)
 
+    def process_message(self, created_path: str) -> Tuple[Union[str, None], int]:
+        """
+        Describes a single created path
+        :param created_path: the filepath of the created status file or "locked" dir
+        :return: the message to show the user (None if there is nothing to report) and the workload that the path
+        completes (0 if it was not anticipated)
+        """
+        # Anticipated status file; the common case is a single dict lookup
+        if created_path in self.status_index:
+            _, subject, run, module, workload_val = self.status_index[created_path]
+            filename = Path(created_path).name
+            if module == "Structural":
+                return f"Completed {self.struct_status_file_translator.get(filename, filename)} in the Structural " \
+                       f"module for subject: {subject}", workload_val
+            elif module == "ASL":
+                return f"Completed {self.asl_status_file_translator.get(filename, filename)} in the ASL module " \
+                       f"for subject: {subject} ; run: {run}", workload_val
+            return f"Completed {self.pop_status_file_translator.get(filename, filename)} in the Population " \
+                   f"module", workload_val
+
+        # Lock dir of a module with status files still to come
+        if Path(created_path).name == "locked":
+            module, subject = self.lockdir_index.get(str(Path(created_path).parent), (None, None))
+            if module in {"Structural", "ASL"}:
+                return f"{module} Module has started for subject: {subject}", 0
+            elif module == "Population" and not self.pop_mod_started:
+                self.pop_mod_started = True
+                return f"Population Module has started", 0
+            return None, 0
+
+        # Status file that was not anticipated (i.e. re-created by a re-run); it is reported but not counted
+        if created_path.endswith(".status"):
+            filename = Path(created_path).name
+            asl_struct_match = self.asl_struct_regex.search(created_path)
+            if asl_struct_match and self.module_regex.search(created_path).group(1) == "Structural":
+                return f"Completed {self.struct_status_file_translator.get(filename, filename)} in the Structural " \
+                       f"module for subject: {asl_struct_match.group(1)}", 0
+            elif asl_struct_match:
+                return f"Completed {self.asl_status_file_translator.get(filename, filename)} in the ASL module " \
+                       f"for subject: {asl_struct_match.group(1)} ; run: {asl_struct_match.group(2)}", 0
+            elif self.pop_regex.search(created_path):
+                return f"Completed {self.pop_status_file_translator.get(filename, filename)} in the Population " \
+                       f"module", 0
+        return None, 0
+
     @Slot(tuple, str)
     def slot_increment_debt(self):
-        self.watch_debt += 1
-
-    def run(self):
+        # Workers report back from the thread that drained their output, so the debt is guarded
+        with self.debt_lock:
+            self.watch_debt += 1
+            is_debt_cleared = self.watch_debt >= 0
+        if is_debt_cleared:
+            self.stop()
+
+    def start(self):
         self.observer.start()
         if self.config["DeveloperMode"]:
             print(f"THE WATCHER FOR {self.dir_to_watch} HAS STARTED")
-        while self.watch_debt < 0:
-            sleep(10)
+
+    def stop(self):
+        if self.workers_done.is_set():
+            return
+        self.workers_done.set()
+        # The thread of the observer is a daemon that winds down by itself; it is not joined, such that the thread of
+        # the last worker is not held up by it
         self.observer.stop()
-        self.observer.join()
+        # Events still waiting for their window to close are processed right away
+        with self.pending_lock:
+            pending_timer = self.pending_timer
+        if pending_timer is not None:
+            pending_timer.cancel()
+            self.process_pending()
         if self.config["DeveloperMode"]:
             print(f"THE WATCHER FOR {self.dir_to_watch} IS SHUTTING DOWN")
-        return
 
 
 class ExploreASL_EventHanderSignals(QObject):
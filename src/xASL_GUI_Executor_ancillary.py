@@ -2,6 +2,7 @@ from pathlib import Path
 import re
 from platform import system
 from typing import List, Tuple, Union
+import psutil
 import json
 
 
@@ -69,14 +70,17 @@ def calculate_anticipated_workload(parmsdict, run_options, translators):
     :param run_options: "Structural", "ASL", "Both" or "Population"; which module is being run
     :param translators: The ExecutorTranslators, primarily for calculating the workload
     :return: workload; a numerical representation of the cumulative value of all status files made; these will be
-    used to determine the appropriate maximum value for the progressbar
+    used to determine the appropriate maximum value for the progressbar. status_index; a dict whose keys are the
+    filepaths (str) of the anticipated status files and whose values are tuples of study, subject, run, module and the
+    workload of that status file (subject and run are None where not applicable), such that a watcher can look up any
+    created status file without parsing its path
     """
 
     def get_structural_workload(analysis_directory: Path, parms: dict, incl_regex: re.Pattern,
                                 workload_translator: dict):
         path_key = "MyPath" if parms["EXPLOREASL_TYPE"] == "LOCAL_UNCOMPILED" else "MyCompiledPath"
         structuralmod_dict = {}
-        status_files = []
+        status_index = {}
         workload = {"010_LinearReg_T1w2MNI.status", "020_LinearReg_FLAIR2T1w.status",
                     "030_FLAIR_BiasfieldCorrection.status", "040_LST_Segment_FLAIR_WMH.status",
                     "050_LST_T1w_LesionFilling_WMH.status", "060_Segment_T1w.status", "070_CleanUpWMH_SEGM.status",
@@ -106,17 +110,19 @@ def calculate_anticipated_workload(parmsdict, run_options, translators):
                 lock_dir.mkdir(parents=True)
             filtered_workload = [lock_dir / name for name in workload if not (lock_dir / name).exists()]
             # Filter out any anticipated status files that are already present in the lock dirs
-            status_files.extend(filtered_workload.copy())
+            for stat_file in filtered_workload:
+                status_index[str(stat_file)] = (str(analysis_directory), subject_path.name, None, "Structural",
+                                                workload_translator[stat_file.name])
             num_repr = sum([workload_translator[stat_file.name] for stat_file in filtered_workload])
             structuralmod_dict[subject_path.name] = num_repr
 
-        return structuralmod_dict, status_files
+        return structuralmod_dict, status_index
 
     def get_asl_workload(analysis_directory, parms: dict, workload_translator: dict, incl_regex: re.Pattern,
                          conditions: List[Tuple[str, bool]] = None):
         path_key = "MyPath" if parms["EXPLOREASL_TYPE"] == "LOCAL_UNCOMPILED" else "MyCompiledPath"
         aslmod_dict = {}
-        status_files = []
+        status_index = {}
         glob_dictionary = {"ASL": "*ASL*.nii*", "FLAIR": "*FLAIR.nii*", "M0": "*M0.nii*"}
         # OLD EXPECTATION
         if is_earlier_version(parms[path_key], threshold_higher=140, higher_eq=False):
@@ -163,12 +169,14 @@ def calculate_anticipated_workload(parmsdict, run_options, translators):
 
                 # Filter out any anticipated status files that are already present in the lock dirs
                 filtered_workload = [lock_dir / name for name in workload if not (lock_dir / name).exists()]
-                status_files.extend(filtered_workload)
+                for stat_file in filtered_workload:
+                    status_index[str(stat_file)] = (str(analysis_directory), subject_path.name, run_path.name, "ASL",
+                                                    workload_translator[stat_file.name])
                 # Calculate the numerical representation of the STATUS files workload
                 num_repr = sum([workload_translator[stat_file.name] for stat_file in filtered_workload])
                 aslmod_dict[subject_path.name][run_path.name] = num_repr
 
-        return aslmod_dict, status_files
+        return aslmod_dict, status_index
 
     def get_population_workload(analysis_directory, workload_translator):
         workload = {"010_CreatePopulationTemplates.status", "020_CreateAnalysisMask.status",
@@ -181,7 +189,9 @@ def calculate_anticipated_workload(parmsdict, run_options, translators):
             directory.mkdir(parents=True)
         status_files = [directory / name for name in workload if not (directory / name).exists()]
         numerical_representation = sum([workload_translator[stat_file.name] for stat_file in status_files])
-        return numerical_representation, status_files
+        status_index = {str(stat_file): (str(analysis_directory), None, None, "Population",
+                                         workload_translator[stat_file.name]) for stat_file in status_files}
+        return numerical_representation, status_index
 
     # Define the individual translators and analysis directory
     filename2workload = translators["ExploreASL_Filename2Workload"]
@@ -212,8 +222,8 @@ def calculate_anticipated_workload(parmsdict, run_options, translators):
 
         print(f"Structural Calculated Workload: {struct_totalworkload}")
         print(f"ASL Calculated Workload: {asl_totalworkload}")
-        # Return the numerical sum of the workload and the combined list of the expected status files
-        return struct_totalworkload + asl_totalworkload, sorted(struct_status + asl_status)
+        # Return the numerical sum of the workload and the combined index of the expected status files
+        return struct_totalworkload + asl_totalworkload, dict(sorted({**struct_status, **asl_status}.items()))
 
     elif run_options == "ASL":
         a_res = get_asl_workload(analysis_dir, parms=parmsdict, workload_translator=filename2workload,
@@ -221,7 +231,7 @@ def calculate_anticipated_workload(parmsdict, run_options, translators):
         asl_dict, asl_status = a_res
         asl_totalworkload = sum([sum(subject_dict.values()) for subject_dict in asl_dict.values()])
         print(f"ASL Calculated Workload: {asl_totalworkload}")
-        # Return the numerical sum of the workload and the list of expected status files
+        # Return the numerical sum of the workload and the index of expected status files
         return asl_totalworkload, asl_status
 
     elif run_options == "Structural":
@@ -230,19 +240,84 @@ def calculate_anticipated_workload(parmsdict, run_options, translators):
         struct_dict, struct_status = s_res
         struct_totalworkload = sum(struct_dict.values())
         print(f"Structural Calculated Workload: {struct_totalworkload}")
-        # Return the numerical sum of the workload and the list of expected status files
-        return struct_totalworkload, sorted(struct_status)
+        # Return the numerical sum of the workload and the index of expected status files
+        return struct_totalworkload, dict(sorted(struct_status.items()))
 
     elif run_options == "Population":
         pop_totalworkload, pop_status = get_population_workload(analysis_dir, workload_translator=filename2workload)
         print(f"Population Calculated Workload: {pop_totalworkload}")
-        # Return the numerical sum of the workload and the list of expected status files
+        # Return the numerical sum of the workload and the index of expected status files
         return pop_totalworkload, pop_status
 
     else:
         print("THIS SHOULD NEVER PRINT AS YOU HAVE SELECTED AN IMPOSSIBLE WORKLOAD OPTION")
 
 
+def get_core_budget(ram_per_core: float) -> Tuple[int, int]:
+    """
+    Convenience function for the resources that ExploreASL sessions may currently draw upon
+    :param ram_per_core: the memory (in GB) that a single ExploreASL session is expected to need
+    :return: n_physical, the number of physical cores of the machine; n_by_ram, the number of sessions that the
+    currently available memory can accommodate
+    """
+    n_physical = psutil.cpu_count(logical=False) or max(psutil.cpu_count() // 2, 1)
+    if ram_per_core <= 0:
+        return n_physical, n_physical
+    n_by_ram = int(psutil.virtual_memory().available / (ram_per_core * 1024 ** 3))
+    return n_physical, n_by_ram
+
+
+def get_subject_workloads(status_index: dict) -> dict:
+    """
+    Convenience function for the anticipated workload of each subject, based on the status files that remain to be
+    created in the subject-level lock dirs
+    :param status_index: the index of anticipated status files, as from calculate_anticipated_workload
+    :return: a dict whose keys are subject names and whose values are the workload that remains for that subject
+    """
+    subject_workloads = {}
+    for _, subject, _, module, workload in status_index.values():
+        if module == "Population":
+            continue
+        subject_workloads[subject] = subject_workloads.get(subject, 0) + workload
+    return subject_workloads
+
+
+def prepare_subject_datapars(parmsdict: dict, subject_workloads: dict) -> List[Tuple[str, str]]:
+    """
+    Writes one DataPar file per subject whose exclusion list holds all other subjects of the study, such that an
+    ExploreASL session started on that file only processes the one subject. The files are written to the
+    Logs/Subject DataPars folder of the analysis directory, as the analysis directory itself must only hold the
+    DataPar file of the study
+    :param parmsdict: the parameter file of the study
+    :param subject_workloads: a dict of subject names and their remaining workload, as from get_subject_workloads
+    :return: a list of tuples of subject name and the filepath of its DataPar file, in descending order of workload so
+    that the slowest subjects are started first
+    """
+    dst_dir = Path(parmsdict["D"]["ROOT"]) / "Logs" / "Subject DataPars"
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    for old_datapar in dst_dir.glob("DataPar_*.json"):
+        old_datapar.unlink()
+
+    # Subjects without remaining work are excluded as well, so that no two sessions ever visit the same subject
+    subject_regex = re.compile(parmsdict["subject_regexp"])
+    all_subjects = [subject_path.name for subject_path in Path(parmsdict["D"]["ROOT"]).iterdir()
+                    if subject_path.is_dir() and subject_path.name not in {"Population", "lock", "Logs"} and
+                    subject_regex.search(subject_path.name)]
+
+    subject_datapars = []
+    base_parms = {key: value for key, value in parmsdict.items() if not key.startswith("WORKER_")}
+    for subject in sorted(subject_workloads, key=subject_workloads.get, reverse=True):
+        subject_parms = dict(base_parms)
+        subject_parms["exclusion"] = list(parmsdict["exclusion"]) + [other for other in all_subjects
+                                                                     if other != subject and
+                                                                     other not in parmsdict["exclusion"]]
+        datapar_path = dst_dir / f"DataPar_{subject}.json"
+        with open(datapar_path, "w") as datapar_writer:
+            json.dump(subject_parms, datapar_writer, indent=1)
+        subject_datapars.append((subject, str(datapar_path)))
+    return subject_datapars
+
+
 # Called after processing is done to compare the present status files against the files that were expected to be created
 # at the time the run was initialized
 def calculate_missing_STATUS(analysis_dir: Path, expected_status_files: List[Path]):
@@ -1,10 +1,18 @@
 from pathlib import Path
 from json import load, loads, dump, JSONDecodeError
-from typing import Union, List, Any
+from typing import Union, List, Any, Tuple, Callable, Dict
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 import pandas as pd
 from numpy import isnan
 from shutil import copyfile
+import tempfile
+import io
 import logging
+import struct
+import stat
+import zlib
+import os
 
 
 ########################################################################################################################
@@ -14,6 +22,10 @@ import logging
 # Current Main Functions:
 #       - alter_sidecars ; using either a csv dataframe or a list of subjects + key + value ; alter the json sidecars
 #       in a given study
+#       - update_json_sidecars ; read, alter, and atomically rewrite many json sidecars in parallel
+#       - get_bids_asl_m0_pairs ; the ASL and M0 sidecars of a BIDS study, as recorded by the importer
+#       - ParallelGzipWriter ; a file object that gzip-compresses what is written to it using several threads
+#       - write_gzip_parallel ; gzip-compress data into a file using several threads
 ########################################################################################################################
 def robust_read_csv(df_path: Union[Path, str], **kwargs):
     """
@@ -269,3 +281,304 @@ def merge_directories(roots: List[Union[Path, str]],
         else:
             make_reallinks(parentpath=root, current_root=str(root),
                            target_root=str(merge_root), overwrite_links=symbolic)
+
+
+def write_json_atomic(json_path: Union[Path, str], data: Any, indent: int = 3):
+    """
+    Writes a json file by way of a temporary file in the same directory that then replaces the original, such that
+    readers never encounter a half-written file. The permissions of the original are kept
+    :param json_path: the json file to write
+    :param data: the data to serialize
+    :param indent: the indentation of the json file
+    """
+    json_path = Path(json_path)
+    fd, tmp_path = tempfile.mkstemp(dir=json_path.parent, prefix=f".{json_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as json_writer:
+            dump(data, json_writer, indent=indent)
+        os.chmod(tmp_path, stat.S_IMODE(json_path.stat().st_mode) if json_path.exists() else 0o644)
+        os.replace(tmp_path, json_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def update_json_sidecars(json_paths: List[Path], update_func: Callable[[Path, dict], Any],
+                         n_threads: int = 8) -> Tuple[list, Dict[Path, str]]:
+    """
+    Reads, alters, and atomically rewrites several json sidecars in parallel. A sidecar that cannot be read or written
+    (i.e. it was removed in the meantime or is not valid json) is left as it is and does not hold up the others
+    :param json_paths: the json sidecars to alter
+    :param update_func: a function of the sidecar path and its loaded data which alters the data in place; its return
+    value is collected
+    :param n_threads: how many sidecars may be processed at the same time
+    :return: results, the return values of update_func in the order of json_paths (None for the sidecars which could
+    not be altered); failures, a dict of the sidecars which could not be altered and the reason why
+    """
+    failures = {}
+
+    def update_json_sidecar(json_path: Path):
+        try:
+            with open(json_path) as sidecar_reader:
+                sidecar_data = load(sidecar_reader)
+            result = update_func(json_path, sidecar_data)
+            write_json_atomic(json_path, sidecar_data)
+        except (OSError, JSONDecodeError) as sidecar_error:
+            failures[json_path] = f"{type(sidecar_error).__name__}: {sidecar_error}"
+            return None
+        return result
+
+    if len(json_paths) == 0:
+        return [], failures
+    with ThreadPoolExecutor(max_workers=min(n_threads, len(json_paths))) as executor:
+        results = list(executor.map(update_json_sidecar, json_paths))
+    return results, failures
+
+
+def get_bids_manifest_path(analysis_dir: Union[Path, str]) -> Path:
+    """
+    Convenience function for the location of the manifest of the ASL and M0 sidecars produced by BIDS imports
+    :param analysis_dir: the analysis directory of the study
+    :return: the filepath of the manifest
+    """
+    return Path(analysis_dir) / "Logs" / "Import Manifests" / "BIDS_Sidecars.json"
+
+
+def get_bids_session_dirs(analysis_dir: Path) -> set:
+    """
+    Convenience function for the directories of a BIDS study that hold the scans of a session; these are the session
+    directories of subjects with several sessions and the subject directories otherwise. Only the directories are
+    listed, not their contents, which keeps this far cheaper than a search of the whole study
+    :param analysis_dir: the analysis directory of the study
+    :return: the set of session directories
+    """
+    ses_dirs = {ses_dir for ses_dir in analysis_dir.glob("sub-*/ses-*") if ses_dir.is_dir()}
+    sub_dirs = {sub_dir for sub_dir in analysis_dir.glob("sub-*") if sub_dir.is_dir()}
+    return ses_dirs | (sub_dirs - {ses_dir.parent for ses_dir in ses_dirs})
+
+
+def update_bids_manifest(analysis_dir: Union[Path, str], outputs: List[Tuple[str, str]]):
+    """
+    Adds the ASL and M0 sidecars produced by an import to the BIDS manifest of the study, dropping any sidecars of
+    earlier imports which no longer exist. The session directories of all produced sidecars are recorded as well, such
+    that sessions added to the study by other means can be told apart
+    :param analysis_dir: the analysis directory of the study
+    :param outputs: tuples of the scan type (i.e. "ASL4D", "M0") and the filepath of the JSON sidecar produced for it
+    """
+    analysis_dir = Path(analysis_dir)
+    manifest_path = get_bids_manifest_path(analysis_dir)
+    try:
+        with open(manifest_path) as manifest_reader:
+            manifest = load(manifest_reader)
+    except (FileNotFoundError, JSONDecodeError):
+        manifest = {}
+    manifest = {key: manifest.get(key, []) for key in ["ASL", "M0", "Sessions"]}
+
+    # Sidecars are recorded relative to the study, such that the manifest survives the study being moved
+    for scan, json_path in outputs:
+        if json_path is None:
+            continue
+        # Sidecars lie within the anat or perf directory of their session
+        manifest["Sessions"].append(Path(json_path).parent.parent.relative_to(analysis_dir).as_posix())
+        key = {"ASL4D": "ASL", "M0": "M0"}.get(scan)
+        if key is not None:
+            manifest[key].append(Path(json_path).relative_to(analysis_dir).as_posix())
+    manifest = {key: sorted({rel_path for rel_path in rel_paths if (analysis_dir / rel_path).exists()})
+                for key, rel_paths in manifest.items()}
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(manifest_path, manifest)
+
+
+def get_bids_asl_m0_pairs(analysis_dir: Union[Path, str],
+                          logger: logging.Logger = logging.getLogger()) -> List[Tuple[Path, Union[Path, None]]]:
+    """
+    Retrieves the ASL sidecars of a BIDS study along with the M0 sidecar of the same acquisition, if any. The BIDS
+    manifest written by the importer is used if it still describes the study. The study is searched instead if there is
+    no manifest (i.e. it was imported before the manifest existed), if sidecars of the manifest have since been removed
+    or renamed, or if the study holds sessions the manifest does not know of (i.e. sessions copied in by hand)
+    :param analysis_dir: the analysis directory of the study
+    :param logger: the logging object that records why the manifest was not used
+    :return: a list of tuples of the ASL sidecar and its M0 sidecar (None if there is no M0 sidecar)
+    """
+    analysis_dir = Path(analysis_dir)
+    try:
+        with open(get_bids_manifest_path(analysis_dir)) as manifest_reader:
+            manifest = load(manifest_reader)
+        asl_jsons = [analysis_dir / rel_path for rel_path in manifest["ASL"]]
+        m0_jsons = {analysis_dir / rel_path for rel_path in manifest["M0"]}
+        session_dirs = {analysis_dir / rel_path for rel_path in manifest["Sessions"]}
+    except (FileNotFoundError, JSONDecodeError, KeyError):
+        asl_jsons, m0_jsons = None, None
+
+    if asl_jsons is not None:
+        vanished = [json_path for json_path in asl_jsons + sorted(m0_jsons) if not json_path.exists()]
+        untracked = sorted(get_bids_session_dirs(analysis_dir) - session_dirs)
+        if vanished or untracked:
+            logger.warning(f"The BIDS manifest of {analysis_dir} is out of date and the study will be searched instead."
+                           f"\nSidecars that no longer exist: {[str(path) for path in vanished]}"
+                           f"\nSessions missing from the manifest: {[str(path) for path in untracked]}")
+            asl_jsons, m0_jsons = None, None
+
+    if asl_jsons is None:
+        asl_jsons = sorted(analysis_dir.rglob("*_asl.json"))
+        m0_jsons = set(analysis_dir.rglob("*_m0scan.json"))
+
+    # The M0 of an acquisition lies next to its ASL and only differs in the suffix of the filename
+    pairs = []
+    for asl_json in asl_jsons:
+        m0_json = asl_json.with_name(asl_json.name[:-len("asl.json")] + "m0scan.json")
+        pairs.append((asl_json, m0_json if m0_json in m0_jsons else None))
+    return pairs
+
+
+def get_sidecar_nifti(json_path: Union[Path, str]) -> Union[Path, None]:
+    """
+    Convenience function for the NIFTI image described by a json sidecar, which may or may not be gzip-compressed
+    :param json_path: the json sidecar
+    :return: the filepath of the NIFTI image, or None if there is none
+    """
+    json_path = Path(json_path)
+    for suffix in [".nii", ".nii.gz"]:
+        nifti_path = json_path.with_suffix(suffix)
+        if nifti_path.exists():
+            return nifti_path
+    return None
+
+
+class ParallelGzipWriter:
+    """
+    Write-only file object whose data is gzip-compressed into a file with its chunks deflated in parallel (as done by
+    pigz). Each chunk is primed with the last 32 KB of data before it, such that the compression ratio is nearly that
+    of a single-threaded gzip, and the result is a single regular gzip member that any gzip reader accepts. Only a few
+    chunks are held in memory at any time, so data may be streamed in piece by piece (i.e. by nibabel writing an
+    image). The file is written by way of a temporary file in the same directory, such that readers never encounter a
+    half-written file; it only appears once the writer is closed without error
+    """
+
+    def __init__(self, gz_path: Union[Path, str], level: int = 6, n_threads: int = 4, chunk_size: int = 1024 ** 2):
+        """
+        :param gz_path: the filepath of the gzip file
+        :param level: the compression level, from 1 (fastest) to 9 (smallest)
+        :param n_threads: how many chunks may be deflated at the same time
+        :param chunk_size: the number of uncompressed bytes per chunk
+        """
+        self.gz_path = Path(gz_path)
+        self.level = level
+        self.chunk_size = chunk_size
+        self.window = 32 * 1024
+        self.buffer = bytearray()
+        self.previous_tail = b""
+        self.crc = 0
+        self.raw_size = 0
+        self.gz_size = 0
+        self.closed = False
+        self.in_flight = deque()
+        self.max_in_flight = 2 * max(n_threads, 1)
+        self.executor = ThreadPoolExecutor(max_workers=max(n_threads, 1))
+        fd, self.tmp_path = tempfile.mkstemp(dir=self.gz_path.parent, prefix=f".{self.gz_path.name}.", suffix=".tmp")
+        self.gz_writer = os.fdopen(fd, "wb")
+        extra_flags = 2 if level == 9 else 4 if level == 1 else 0
+        self.gz_writer.write(b"\x1f\x8b\x08\x00" + struct.pack("<I", 0) + bytes([extra_flags, 255]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def readable(self) -> bool:
+        return False
+
+    def read(self, size: int = -1) -> bytes:
+        raise io.UnsupportedOperation(f"{self.__class__.__name__} is write-only")
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.raw_size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # Only "seeking" to the current position is possible, which lets writers that check their position carry on
+        if (whence == io.SEEK_SET and offset == self.raw_size) or (whence != io.SEEK_SET and offset == 0):
+            return self.raw_size
+        raise io.UnsupportedOperation(f"{self.__class__.__name__} cannot seek")
+
+    def write(self, data: Union[bytes, bytearray, memoryview]) -> int:
+        data = memoryview(data).cast("B")
+        self.crc = zlib.crc32(data, self.crc)
+        self.raw_size += len(data)
+        # The last chunk is held back until the writer is closed, as only that chunk may end the deflate stream
+        pos = 0
+        while len(self.buffer) + len(data) - pos > self.chunk_size:
+            n_taken = self.chunk_size - len(self.buffer)
+            chunk = bytes(self.buffer + data[pos:pos + n_taken]) if self.buffer else bytes(data[pos:pos + n_taken])
+            pos += n_taken
+            self.buffer = bytearray()
+            self._submit_chunk(chunk, b_final=False)
+        self.buffer += data[pos:]
+        return len(data)
+
+    def close(self):
+        """
+        Compresses the remaining data, completes the gzip file and moves it into place
+        """
+        if self.closed:
+            return
+        try:
+            self._submit_chunk(bytes(self.buffer), b_final=True)
+            self.buffer = bytearray()
+            while self.in_flight:
+                self.gz_writer.write(self.in_flight.popleft().result())
+            self.gz_writer.write(struct.pack("<II", self.crc, self.raw_size & 0xFFFFFFFF))
+            self.gz_size = self.gz_writer.tell()
+            self.gz_writer.close()
+            self.executor.shutdown()
+            os.chmod(self.tmp_path, 0o644)
+            os.replace(self.tmp_path, self.gz_path)
+            self.closed = True
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self):
+        """
+        Abandons the gzip file, leaving no trace of it behind
+        """
+        self.closed = True
+        self.executor.shutdown(cancel_futures=True)
+        self.gz_writer.close()
+        Path(self.tmp_path).unlink(missing_ok=True)
+
+    def _submit_chunk(self, chunk: bytes, b_final: bool):
+        zdict = self.previous_tail
+        self.previous_tail = (chunk if len(chunk) >= self.window else zdict + chunk)[-self.window:]
+        self.in_flight.append(self.executor.submit(self._deflate_chunk, chunk, zdict, b_final))
+        # Bound the memory held by chunks whose deflated data has not been written yet
+        while len(self.in_flight) > self.max_in_flight:
+            self.gz_writer.write(self.in_flight.popleft().result())
+
+    def _deflate_chunk(self, chunk: bytes, zdict: bytes, b_final: bool) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, **({"zdict": zdict} if zdict else {}))
+        # zlib releases the GIL while it works, so the chunks are deflated alongside each other. All chunks but the
+        # last end on a byte boundary without closing the deflate stream
+        return compressor.compress(chunk) + compressor.flush(zlib.Z_FINISH if b_final else zlib.Z_SYNC_FLUSH)
+
+
+def write_gzip_parallel(data: Union[bytes, bytearray, memoryview], gz_path: Union[Path, str], level: int = 6,
+                        n_threads: int = 4, chunk_size: int = 1024 ** 2) -> int:
+    """
+    Convenience function for gzip-compressing data that is already in memory by way of a ParallelGzipWriter
+    :param data: the uncompressed data
+    :param gz_path: the filepath of the gzip file
+    :param level: the compression level, from 1 (fastest) to 9 (smallest)
+    :param n_threads: how many chunks may be deflated at the same time
+    :param chunk_size: the number of uncompressed bytes per chunk
+    :return: the size of the gzip file in bytes
+    """
+    with ParallelGzipWriter(gz_path, level=level, n_threads=n_threads, chunk_size=chunk_size) as gz_writer:
+        gz_writer.write(data)
+    return gz_writer.gz_size
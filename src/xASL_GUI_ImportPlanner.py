@@ -0,0 +1,156 @@
+from src.xASL_GUI_DCM2NIFTI import DCM2NIFTI_Converter, iter_dicom_directories, get_source_fingerprint
+from src.xASL_GUI_Logging import get_queue_logger
+from concurrent.futures import ThreadPoolExecutor
+from more_itertools import flatten
+from pathlib import Path
+from typing import Dict, Tuple, Union
+import pandas as pd
+import argparse
+import json
+
+# Assumed conversion throughput (bytes of DICOM per second per worker) for scan types without an import history
+DEFAULT_THROUGHPUT = 20e6
+
+
+def get_throughput_history(analysis_dir: Union[Path, str]) -> Dict[str, float]:
+    """
+    Convenience function for the conversion throughput achieved by previous imports, as recorded in their manifests
+    :param analysis_dir: the analysis directory of the study
+    :return: a dict of the bytes of DICOM converted per second per worker for each scan type
+    """
+    total_bytes, total_seconds = {}, {}
+    for manifest_path in (Path(analysis_dir) / "Logs" / "Import Manifests").glob("*.json"):
+        try:
+            with open(manifest_path) as manifest_reader:
+                manifest = json.load(manifest_reader)
+            scan, seconds = manifest["Scan"], manifest["Processing Time"]
+            n_bytes = manifest["Source Fingerprint"]["TotalSize"]
+        except (OSError, json.JSONDecodeError, KeyError, TypeError):
+            continue
+        # Skipped duplicates were never converted and say nothing about the throughput
+        if seconds > 0 and len(manifest.get("Outputs", {})) > 0:
+            total_bytes[scan] = total_bytes.get(scan, 0) + n_bytes
+            total_seconds[scan] = total_seconds.get(scan, 0) + seconds
+    return {scan: total_bytes[scan] / total_seconds[scan] for scan in total_bytes}
+
+
+def plan_import(config: dict, b_legacy: bool = True, n_workers: int = 1,
+                n_threads: int = 8) -> Tuple[pd.DataFrame, dict]:
+    """
+    Resolves every DICOM directory of an import configuration to its destination without converting anything
+    :param config: the import configuration
+    :param b_legacy: whether the import would be in legacy format (True) or BIDS format (False)
+    :param n_workers: the number of workers the import would run with
+    :param n_threads: how many DICOM directories may be walked and fingerprinted at the same time
+    :return: plan, a dataframe with one row per DICOM directory; totals, a dict of the totals and the time estimate
+    """
+    # A dry run keeps no log and must not create or clear the header index in the RawDir, so it does without it
+    converter = DCM2NIFTI_Converter(config=config, name="ImportPlanner", logger=get_queue_logger("ImportPlanner", None),
+                                    b_legacy=b_legacy, b_use_header_index=False)
+    converter.b_verbose = False
+    throughputs = get_throughput_history(converter.path_sourcedir.parent / "analysis")
+
+    dicom_dirs = list(flatten(iter_dicom_directories(config, n_threads=n_threads)))
+    with ThreadPoolExecutor(max_workers=n_threads) as fingerprinters:
+        fingerprints = list(fingerprinters.map(get_source_fingerprint, dicom_dirs))
+
+    rows = []
+    for dicom_dir, fingerprint in zip(dicom_dirs, fingerprints):
+        row = {"DICOM Directory": str(dicom_dir), "Subject": None, "Visit": None, "Run": None, "Scan": None,
+               "Files": fingerprint["FileCount"], "Bytes": fingerprint["TotalSize"], "NIFTI": None, "JSON": None,
+               "Up To Date": False, "Estimated Seconds": None, "Problem": None}
+        try:
+            if not converter.get_structure_components(dicom_dir):
+                row["Problem"] = "Subject or Scan could not be determined"
+                rows.append(row)
+                continue
+            _, path_final_nifti, path_final_json = converter.get_destination_paths()
+        except KeyError as alias_error:
+            row["Problem"] = f"No alias for {alias_error}"
+            rows.append(row)
+            continue
+        row.update({"Subject": converter.subject_dst_name, "Visit": converter.visit_dst_name,
+                    "Run": converter.run_dst_name, "Scan": converter.scan_dst_name,
+                    "NIFTI": str(path_final_nifti), "JSON": str(path_final_json)})
+        if converter.b_incremental:
+            row["Up To Date"] = converter.is_manifest_current(converter.read_manifest(dicom_dir), fingerprint)
+        if not row["Up To Date"]:
+            row["Estimated Seconds"] = fingerprint["TotalSize"] / throughputs.get(converter.scan_dst_name,
+                                                                                  DEFAULT_THROUGHPUT)
+        rows.append(row)
+
+    plan = pd.DataFrame(rows, columns=["DICOM Directory", "Subject", "Visit", "Run", "Scan", "Files", "Bytes",
+                                       "NIFTI", "JSON", "Up To Date", "Estimated Seconds", "Problem"])
+    # Two DICOM directories resolving to the same NIFTI would overwrite one another
+    plan["Collision"] = plan["NIFTI"].notna() & plan.duplicated(subset="NIFTI", keep=False)
+
+    # The workers pull DICOM directories as they become free, so the import takes about its total work divided over
+    # the workers, but never less than its longest DICOM directory
+    seconds = plan["Estimated Seconds"].dropna()
+    estimated_seconds = max(seconds.sum() / max(n_workers, 1), seconds.max()) if len(seconds) > 0 else 0.
+    totals = {"DICOM Directories": len(plan),
+              "Files": int(plan["Files"].sum()),
+              "Bytes": int(plan["Bytes"].sum()),
+              "Up To Date": int(plan["Up To Date"].sum()),
+              "Collisions": int(plan["Collision"].sum()),
+              "Problems": int(plan["Problem"].notna().sum()),
+              "Workers": n_workers,
+              "Estimated Seconds": estimated_seconds,
+              "Throughput History": sorted(throughputs)}
+    return plan, totals
+
+
+def get_plan_report(plan: pd.DataFrame, totals: dict, max_listed: int = 10) -> str:
+    """
+    Convenience function for summarizing an import plan in a human-readable manner
+    :param plan: the dataframe returned by plan_import
+    :param totals: the totals returned by plan_import
+    :param max_listed: the most collisions and problems to list individually
+    :return: the report
+    """
+    hours, remainder = divmod(int(totals["Estimated Seconds"]), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    lines = [f"DICOM directories: {totals['DICOM Directories']} ({totals['Up To Date']} up to date)",
+             f"Files: {totals['Files']}; Size: {totals['Bytes'] / 1e6:.1f} MB",
+             f"Estimated time with {totals['Workers']} worker(s): {hours}h {minutes:02}m {seconds:02}s "
+             f"(from the history of: {', '.join(totals['Throughput History']) or 'no previous imports'})",
+             "", "Expected outputs per scan:"]
+    for scan, count in plan["Scan"].value_counts().sort_index().items():
+        lines.append(f"\t{scan}: {count}")
+
+    collisions = plan.loc[plan["Collision"]].sort_values(by="NIFTI")
+    lines += ["", f"Collisions (several DICOM directories with the same destination): {totals['Collisions']}"]
+    for _, row in collisions.head(max_listed).iterrows():
+        lines.append(f"\t{row['DICOM Directory']} -> {row['NIFTI']}")
+    problems = plan.loc[plan["Problem"].notna()]
+    lines += ["", f"DICOM directories that cannot be imported: {totals['Problems']}"]
+    for _, row in problems.head(max_listed).iterrows():
+        lines.append(f"\t{row['DICOM Directory']}: {row['Problem']}")
+    return "\n".join(lines)
+
+
+def main():
+    """
+    Dry-run entry point for the import described by the ImportConfig.json file of a raw directory. Example usage:
+    python -m src.xASL_GUI_ImportPlanner /home/jsmith/MyStudy/raw --workers 8 --tsv plan.tsv
+    """
+    parser = argparse.ArgumentParser(description="Plan the import of a raw directory without converting anything")
+    parser.add_argument("raw_dir", type=Path, help="The raw directory containing the ImportConfig.json file")
+    parser.add_argument("--bids", action="store_true", help="Plan a BIDS import rather than a legacy one")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="The number of workers; defaults to the Number of Workers of the ImportConfig.json")
+    parser.add_argument("--tsv", type=Path, default=None, help="Where to write the plan of every DICOM directory")
+    args = parser.parse_args()
+
+    with open(args.raw_dir / "ImportConfig.json") as import_config_reader:
+        config = json.load(import_config_reader)
+    config["RawDir"] = str(args.raw_dir)
+    n_workers = args.workers if args.workers is not None else config.get("Number of Workers", 1)
+    plan, totals = plan_import(config, b_legacy=not args.bids, n_workers=n_workers)
+    print(get_plan_report(plan, totals))
+    if args.tsv is not None:
+        plan.to_csv(args.tsv, sep="\t", index=False, na_rep="n/a")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,16 +5,23 @@ from src.xASL_GUI_HelperClasses import DandD_FileExplorer2LineEdit, xASL_PushBut
 from src.xASL_GUI_HelperFuncs_WidgetFuncs import set_formlay_options, robust_qmsg
 from src.xASL_GUI_Dehybridizer import xASL_GUI_Dehybridizer
 from src.xASL_GUI_DCM2NIFTI import *
+from src.xASL_GUI_ImportPlanner import plan_import, get_plan_report
+from src.xASL_GUI_Logging import StudyLogService, get_queue_logger
+from src.xASL_GUI_HelperFuncs_DirOps import update_bids_manifest
 from tdda import rexpy
-from pprint import pprint
-from collections import OrderedDict
-from more_itertools import divide, flatten, collapse
+from pprint import pformat
+from collections import OrderedDict, deque
+from more_itertools import flatten
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 import json
-from os import chdir
 from platform import system
 from pathlib import Path
-from typing import List, Iterator, Set
+from typing import List, Set, Iterable, Union
+from queue import Queue, Empty
+from threading import Thread
+import multiprocessing
 import logging
+import shutil
 from datetime import datetime
 
 
@@ -22,60 +29,207 @@ class Importer_WorkerSignals(QObject):
     """
     Class for handling the signals sent by an ExploreASL worker
     """
-    signal_send_summaries = Signal(list)  # Signal sent by worker to process the summaries of imported files
+    signal_send_summaries = Signal(list)  # Signal sent by worker with the (scan, JSON sidecar) of each imported dir
     signal_send_errors = Signal(list)  # Signal sent by worker to indicate the file where something has failed
     signal_update_progressbar = Signal()  # Signal sent by worker to indicate a completed directory
+    signal_update_progressbar_maximum = Signal(int)  # Signal sent by worker to indicate newly-discovered directories
     signal_confirm_terminate = Signal()  # Signal sent by worker to indicate a termination had occurred
 
 
+class Importer_PlannerSignals(QObject):
+    """
+    Class for handling the signals sent by an import planner
+    """
+    signal_send_plan = Signal(str, str)  # Signal sent by planner with the report of the plan and the path of its TSV
+    signal_send_error = Signal(str)  # Signal sent by planner to indicate that the plan could not be made
+
+
+class Importer_Planner(QRunnable):
+    """
+    Worker thread for planning an import (a dry run), as walking and fingerprinting every DICOM directory of a large
+    import would otherwise freeze the GUI
+    """
+
+    def __init__(self, config: dict, use_legacy_mode: bool, n_workers: int):
+        self.import_config: dict = config
+        self.use_legacy_mode: bool = use_legacy_mode
+        self.n_workers: int = n_workers
+        super().__init__()
+        self.signals = Importer_PlannerSignals()
+
+    def run(self):
+        try:
+            plan, totals = plan_import(config=self.import_config, b_legacy=self.use_legacy_mode,
+                                       n_workers=self.n_workers)
+            plan_path = Path(self.import_config["RawDir"]) / "ImportPlan.tsv"
+            plan.to_csv(plan_path, sep="\t", index=False, na_rep="n/a")
+        except Exception as plan_error:  # Any error must reach the GUI, which waits on the planner with its widgets off
+            self.signals.signal_send_error.emit(f"{type(plan_error).__name__}: {plan_error}")
+            return
+        self.signals.signal_send_plan.emit(get_plan_report(plan, totals), str(plan_path))
+
+
 # noinspection PyUnresolvedReferences
 class Importer_Worker(QRunnable):
     """
-    Worker thread for running the import for a particular group.
+    Worker thread for running the import as a two-stage pipeline. In the first stage, a pool of threads runs DCM2NIIX
+    on DICOM directories, each thread pulling the next DICOM directory as soon as it is done. In the second stage, a
+    pool of processes post-processes the TEMP outputs of the first stage. The number of DICOM directories between the
+    two stages is bounded, such that DCM2NIIX cannot run too far ahead of the post-processing. The DICOM directories
+    may be given as a stream, which is then drained in the background such that conversion starts before the
+    discovery of DICOM directories is complete. Terminating the import kills any running DCM2NIIX, stops the
+    post-processing at the next stage boundary, and removes the TEMP directories of everything that was in progress.
     """
 
-    def __init__(self, dcm_dirs: Iterator[Path], config: dict, use_legacy_mode: bool, name: str = None):
-        self.dcm_dirs: Iterator[Path] = dcm_dirs
+    def __init__(self, dcm_dirs: Iterable[Path], config: dict, use_legacy_mode: bool, n_workers: int,
+                 name: str = None, log_queue=None, summary_writer: ImportSummaryWriter = None):
+        self.dcm_dirs: Iterable[Path] = dcm_dirs
         self.import_config: dict = config
         self.use_legacy_mode: bool = use_legacy_mode
+        self.n_workers: int = n_workers
+        self.max_pending: int = 2 * n_workers  # The most DICOM directories that may be in the pipeline at once
         super().__init__()
         self.signals = Importer_WorkerSignals()
-        self.import_summaries = []
+        self.summary_writer = summary_writer  # Receives the summary of each converted DICOM directory as it finishes
+        self.outputs = []  # The scan type and JSON sidecar of each converted DICOM directory
         self.failed_runs = []
         self.name = name
         self._terminated = False
-
-        logger = logging.Logger(name=name, level=logging.DEBUG)
-        self.converter = DCM2NIFTI_Converter(config=config, name=name, logger=logger, b_legacy=use_legacy_mode)
-        print("Initialized Worker with args:\n")
-        pprint(self.import_config)
+        # Finalizer processes are spawned rather than forked, as forking while the converter threads, the log listener
+        # and the header index may hold locks can deadlock the children
+        self.mp_context = multiprocessing.get_context("spawn")
+        self.cancel_event = self.mp_context.Event()  # Shared with every converter thread and process
+        self.log_queue = log_queue  # The queue of the import's StudyLogService, shared with every converter
+        self.logger = get_queue_logger(name if name is not None else "Importer_Worker", log_queue)
+        self.logger.info(f"Initialized Worker with {self.n_workers} threads and processes and args:\n"
+                         f"{pformat(self.import_config)}")
+
+    def discover(self, discovered: Queue):
+        """
+        Drains the stream of DICOM directories into a queue, finishing with None once the stream is exhausted
+        """
+        try:
+            for dicom_dir in self.dcm_dirs:
+                if self._terminated:
+                    break
+                discovered.put(dicom_dir)
+        finally:
+            discovered.put(None)
 
     def run(self):
-        for dicom_dir in self.dcm_dirs:
-            if not self._terminated:
-                success, job_description = self.converter.process_dcm_dir(dcm_dir=dicom_dir)
-                if success:
-                    self.import_summaries.append(self.converter.summary_data.copy())
-                    self.signals.signal_update_progressbar.emit()
-                else:
-                    self.failed_runs.append(job_description)
+        clear_series_registry()
+        discovered, queued, n_discovered, b_discovering = Queue(), deque(), 0, True
+        Thread(target=self.discover, args=(discovered,), daemon=True).start()
+        initargs = (self.import_config, self.use_legacy_mode, self.log_queue, self.cancel_event)
+        # The finalizers read no DICOM headers, so they leave the header index in the RawDir to the converters
+        with ThreadPoolExecutor(max_workers=self.n_workers, initializer=init_import_worker,
+                                initargs=initargs + (True,)) as converters, \
+                ProcessPoolExecutor(max_workers=self.n_workers, mp_context=self.mp_context,
+                                    initializer=init_import_worker, initargs=initargs + (False,)) as finalizers:
+            converting, finalizing = {}, {}
+            while True:
+                # Take in whatever was discovered in the meantime; only wait on the discovery if nothing else can
+                # progress
+                n_new = 0
+                while b_discovering:
+                    b_idle = len(converting) + len(finalizing) + len(queued) == 0 and not self._terminated
+                    try:
+                        dicom_dir = discovered.get(timeout=0.5) if b_idle else discovered.get_nowait()
+                    except Empty:
+                        break
+                    if dicom_dir is None:
+                        b_discovering = False
+                    else:
+                        queued.append(dicom_dir)
+                        n_new += 1
+                if n_new > 0:
+                    n_discovered += n_new
+                    self.signals.signal_update_progressbar_maximum.emit(n_discovered)
+
+                # Backpressure: only feed in more DICOM directories if the pipeline has room for them
+                while len(converting) + len(finalizing) < self.max_pending and len(queued) > 0 \
+                        and not self._terminated:
+                    dicom_dir = queued.popleft()
+                    converting[converters.submit(convert_dicom_directory, dicom_dir)] = dicom_dir
+                if len(converting) + len(finalizing) == 0:
+                    if self._terminated or not b_discovering:
+                        break
+                    continue
+
+                # Wake up regularly so that a termination request is not stuck behind a long conversion
+                done, _ = wait(list(converting) + list(finalizing), timeout=0.5, return_when=FIRST_COMPLETED)
+                if self._terminated:
+                    self.cancel_pipeline(converting, finalizing)
+                    break
+
+                for future in done:
+                    if future in converting:
+                        dicom_dir = converting.pop(future)
+                        success, job_description, summary_data, state = self.get_result(future, dicom_dir)
+                        # Converted DICOM directories move on to the finalization stage
+                        if state is not None:
+                            finalizing[finalizers.submit(finalize_dicom_directory, dicom_dir, state)] = \
+                                (dicom_dir, state["path_tempdir"])
+                            continue
+                    else:
+                        dicom_dir, _ = finalizing.pop(future)
+                        success, job_description, summary_data, _ = self.get_result(future, dicom_dir)
+
+                    if success:
+                        if self.summary_writer is not None:
+                            self.summary_writer.append(summary_data)
+                        self.outputs.append((summary_data.get("scan"), summary_data.get("JSONPath")))
+                    else:
+                        self.failed_runs.append(job_description)
                     self.signals.signal_update_progressbar.emit()
 
-        # Cleanup handlers and such
-        if not self._terminated:
-            self.converter.logger.removeHandler(self.converter.handler)
+        # Whatever batched conversions were cut short by a termination no longer have anyone to clean up after them
+        if self._terminated:
+            discard_dcm2niix_batches()
 
-            self.signals.signal_send_summaries.emit(self.import_summaries)
+        # The failures must arrive before the summaries, as the latter trigger the post-import processing
+        if not self._terminated:
             if len(self.failed_runs) > 0:
                 self.signals.signal_send_errors.emit(self.failed_runs)
+            self.signals.signal_send_summaries.emit(self.outputs)
 
         else:
             self.signals.signal_confirm_terminate.emit()
 
+    def cancel_pipeline(self, converting: dict, finalizing: dict):
+        """
+        Cancels the DICOM directories that have yet to start a pipeline stage and removes the TEMP directories that
+        were handed over to finalization stages that will now never run. Running stages clean up after themselves
+        """
+        for future in converting:
+            future.cancel()
+        abandoned_tempdirs = [path_tempdir for future, (_, path_tempdir) in finalizing.items() if future.cancel()]
+        if len(abandoned_tempdirs) == 0:
+            return
+        self.logger.info(f"Removing the TEMP directories of {len(abandoned_tempdirs)} DICOM directories that were "
+                         f"awaiting finalization")
+        with ThreadPoolExecutor(max_workers=min(self.n_workers, len(abandoned_tempdirs))) as cleaners:
+            for path_tempdir in abandoned_tempdirs:
+                cleaners.submit(shutil.rmtree, path_tempdir, ignore_errors=True)
+
+    @staticmethod
+    def get_result(future: Future, dicom_dir: Path):
+        """
+        Retrieves the result of a pipeline stage, converting any unexpected error into a failed result
+        """
+        try:
+            return future.result()
+        except Exception as conversion_error:
+            return False, f"\nERROR_LISTING FOR DICOM DIRECTORY {str(dicom_dir)}:" \
+                          f"\n\tUnexpected error: {conversion_error}", None, None
+
     @Slot()
     def slot_stop_import(self):
-        print(f"{self.name} received a termination signal! Terminating at the next available DICOM dir.")
+        self.logger.warning(f"{self.name} received a termination signal! Killing the DCM2NIIX conversions in progress "
+                            f"and stopping the post-processing at the next stage boundary.")
         self._terminated = True
+        self.cancel_event.set()
+        kill_dcm2niix_processes()
 
 
 # noinspection PyCallingNonCallable
@@ -107,9 +261,11 @@ class xASL_GUI_Importer(QMainWindow):
         self.scan_aliases = dict.fromkeys(["ASL4D", "T1", "T2" "M0", "FLAIR"])
         self.cmb_runaliases_dict = {}
         self.threadpool = QThreadPool()
-        self.import_summaries = []
+        self.import_summary_writer = None
+        self.import_outputs = []
         self.failed_runs = []
         self.import_workers = []
+        self.import_log_service = None
 
         # Window Size and initial visual setup
         self.setWindowTitle("ExploreASL - DICOM to NIFTI Import")
@@ -157,10 +313,14 @@ class xASL_GUI_Importer(QMainWindow):
         self.btn_run_importer = xASL_PushButton(text="Convert DICOM to NIFTI", func=self.run_importer,
                                                 font=self.labfont, fixed_height=50, enabled=False, icon=icon_import,
                                                 icon_size=QSize(40, 40))
+        self.btn_plan_importer = xASL_PushButton(text="Plan Import (Dry Run)", func=self.run_import_planner,
+                                                 font=self.labfont, enabled=False)
+        self.btn_plan_importer.setToolTip(self.import_tips["btn_plan_importer"])
         self.btn_terminate_importer = xASL_PushButton(enabled=False, icon=icon_terminate, icon_size=QSize(40, 40),
                                                       func=self.signal_stop_import.emit)
         self.vlay_runbtns.addStretch(1)
-        for widget in [self.progbar_import, self.btn_run_importer, self.btn_terminate_importer]:
+        for widget in [self.progbar_import, self.btn_plan_importer, self.btn_run_importer,
+                       self.btn_terminate_importer]:
             self.vlay_runbtns.addWidget(widget)
         self.vlay_import.addWidget(self.mainsplit)
 
@@ -194,8 +354,38 @@ class xASL_GUI_Importer(QMainWindow):
         self.hlay_rootdir.addWidget(self.btn_setrootdir)
         self.chk_uselegacy = QCheckBox(checked=True)
         self.chk_uselegacy.setToolTip(self.import_tips["chk_uselegacy"])
+        self.spin_headersamples = QSpinBox(minimum=1, maximum=100, value=1, singleStep=1)
+        self.spin_headersamples.setToolTip(self.import_tips["spin_headersamples"])
+        self.spin_nworkers = QSpinBox(minimum=1, maximum=get_usable_cpu_count(), value=get_usable_cpu_count(),
+                                      singleStep=1)
+        self.spin_nworkers.setToolTip(self.import_tips["spin_nworkers"])
+        self.chk_incremental = QCheckBox(checked=False)
+        self.chk_incremental.setToolTip(self.import_tips["chk_incremental"])
+        self.hlay_scratchdir = QHBoxLayout()
+        self.le_scratchdir = DandD_FileExplorer2LineEdit(acceptable_path_type="Directory")
+        self.le_scratchdir.setPlaceholderText(f"Default: {get_default_scratch_dir()}")
+        self.le_scratchdir.setToolTip(self.import_tips["le_scratchdir"])
+        self.btn_setscratchdir = QPushButton("...", clicked=self.set_import_scratch_directory)
+        self.hlay_scratchdir.addWidget(self.le_scratchdir)
+        self.hlay_scratchdir.addWidget(self.btn_setscratchdir)
+        self.chk_skipduplicates = QCheckBox(checked=True)
+        self.chk_skipduplicates.setToolTip(self.import_tips["chk_skipduplicates"])
+        self.chk_batchdcm2niix = QCheckBox(checked=False)
+        self.chk_batchdcm2niix.setToolTip(self.import_tips["chk_batchdcm2niix"])
+        self.chk_compress = QCheckBox(checked=False)
+        self.chk_compress.setToolTip(self.import_tips["chk_compress"])
+        self.spin_complevel = QSpinBox(minimum=1, maximum=9, value=6, singleStep=1)
+        self.spin_complevel.setToolTip(self.import_tips["spin_complevel"])
         self.formlay_rootdir.addRow("Source Root Directory", self.hlay_rootdir)
         self.formlay_rootdir.addRow("Use Legacy Import", self.chk_uselegacy)
+        self.formlay_rootdir.addRow("DICOM Header Samples", self.spin_headersamples)
+        self.formlay_rootdir.addRow("Number of Workers", self.spin_nworkers)
+        self.formlay_rootdir.addRow("Incremental Import", self.chk_incremental)
+        self.formlay_rootdir.addRow("Scratch Directory", self.hlay_scratchdir)
+        self.formlay_rootdir.addRow("Skip Duplicate Series", self.chk_skipduplicates)
+        self.formlay_rootdir.addRow("Batch DCM2NIIX per Subject", self.chk_batchdcm2niix)
+        self.formlay_rootdir.addRow("Compress NIFTI Output", self.chk_compress)
+        self.formlay_rootdir.addRow("Compression Level", self.spin_complevel)
 
         # Next specify the QLabels that can be dragged to have their text copied elsewhere
         self.hlay_placeholders = QHBoxLayout()
@@ -297,6 +487,17 @@ class xASL_GUI_Importer(QMainWindow):
             return
         self.le_rootdir.setText(str(Path(dir_path)))
 
+    # Purpose of this function is to set the directory of the scratch path lineedit based on the adjacent pushbutton
+    @Slot()
+    def set_import_scratch_directory(self):
+        dir_path = QFileDialog.getExistingDirectory(QFileDialog(),
+                                                    "Select a fast local directory for temporary conversion files",
+                                                    str(get_default_scratch_dir()),
+                                                    QFileDialog.ShowDirsOnly)
+        if dir_path == "":
+            return
+        self.le_scratchdir.setText(str(Path(dir_path)))
+
     # Purpose of this function is to change the value of the rawdir attribute based on the current text
     @Slot()
     def set_rootdir_variable(self, path: str):
@@ -550,17 +751,20 @@ class xASL_GUI_Importer(QMainWindow):
         # First requirement; raw directory must be an existent directory without spaces
         if any([not rootpath.exists(), not rootpath.is_dir(), " " in self.le_rootdir.text()]):
             self.btn_run_importer.setEnabled(False)
+            self.btn_plan_importer.setEnabled(False)
             return
 
             # Next requirement; a minimum of "Subject" and "Scan" must be present in the lineedits
         if not all(["Subject" in current_texts, "Scan" in current_texts]):
             self.btn_run_importer.setEnabled(False)
+            self.btn_plan_importer.setEnabled(False)
             return
 
         # Next requirement; at least one scan must be indicated
         cmb_texts: Set[str] = {cmb.currentText() for cmb in self.cmb_scanaliases_dict.values()}
         if len(cmb_texts) <= 1:
             self.btn_run_importer.setEnabled(False)
+            self.btn_plan_importer.setEnabled(False)
             return
 
         # Next requirement; if Run is indicated, the aliases and ordering must both be unique
@@ -572,9 +776,11 @@ class xASL_GUI_Importer(QMainWindow):
                 len(set(current_run_ordering)) != len(current_run_ordering)  # unique ordering required
             ]):
                 self.btn_run_importer.setEnabled(False)
+                self.btn_plan_importer.setEnabled(False)
                 return
 
         self.btn_run_importer.setEnabled(True)
+        self.btn_plan_importer.setEnabled(True)
 
     def set_widgets_on_or_off(self, state: bool):
         """
@@ -582,9 +788,19 @@ class xASL_GUI_Importer(QMainWindow):
         :param state: the boolean state of whether the widgets should be enabled or not
         """
         self.btn_run_importer.setEnabled(state)
+        self.btn_plan_importer.setEnabled(state)
         self.btn_clear_receivers.setEnabled(state)
         self.btn_setrootdir.setEnabled(state)
         self.le_rootdir.setEnabled(state)
+        self.spin_headersamples.setEnabled(state)
+        self.spin_nworkers.setEnabled(state)
+        self.chk_incremental.setEnabled(state)
+        self.btn_setscratchdir.setEnabled(state)
+        self.le_scratchdir.setEnabled(state)
+        self.chk_skipduplicates.setEnabled(state)
+        self.chk_batchdcm2niix.setEnabled(state)
+        self.chk_compress.setEnabled(state)
+        self.spin_complevel.setEnabled(state)
 
         le: QLineEdit
         for le in self.levels.values():
@@ -700,6 +916,14 @@ class xASL_GUI_Importer(QMainWindow):
         import_parms["Directory Structure"] = valid_directories
         import_parms["Scan Aliases"] = scan_aliases
         import_parms["Ordered Run Aliases"] = run_aliases
+        import_parms["Header Samples"] = self.spin_headersamples.value()
+        import_parms["Number of Workers"] = self.spin_nworkers.value()
+        import_parms["Incremental Import"] = self.chk_incremental.isChecked()
+        import_parms["Scratch Directory"] = self.le_scratchdir.text()
+        import_parms["Skip Duplicate Series"] = self.chk_skipduplicates.isChecked()
+        import_parms["Batch DCM2NIIX"] = self.chk_batchdcm2niix.isChecked()
+        import_parms["Compress Output"] = self.chk_compress.isChecked()
+        import_parms["Compression Level"] = self.spin_complevel.value()
 
         # Save a copy of the import parms to the raw directory in question
         with open(Path(self.le_rootdir.text()) / "ImportConfig.json", 'w') as w:
@@ -717,8 +941,6 @@ class xASL_GUI_Importer(QMainWindow):
     @Slot()
     def slot_cleanup_postterminate(self):
         self.n_import_workers -= 1
-        if len(self.import_summaries) > 0:
-            self.import_summaries.clear()
         if len(self.failed_runs) > 0:
             self.failed_runs.clear()
 
@@ -731,21 +953,25 @@ class xASL_GUI_Importer(QMainWindow):
         self.btn_terminate_importer.setEnabled(False)
 
         analysis_dir = Path(self.import_parms["RawDir"]).parent / "analysis"
+        self.finalize_import_log(analysis_dir)
+        # Whatever was converted prior to the termination keeps its (sorted) summary
+        if self.import_summary_writer is not None:
+            self.import_summary_writer.finalize()
+            self.import_summary_writer = None
         if analysis_dir.exists():
             robust_qmsg(self, title=self.import_errs["CleanupImportPostTerm"][0],
                         body=self.import_errs["CleanupImportPostTerm"][1], variables=[str(analysis_dir)])
         QApplication.restoreOverrideCursor()
 
     @Slot(list)
-    def slot_is_ready_postprocessing(self, signalled_summaries: list):
+    def slot_is_ready_postprocessing(self, signalled_outputs: list):
         """
-        Creates the summary file. Increments the "debt" due to launching workers back towards zero. Resets widgets
-        once importer workers are done.
-        :param signalled_summaries: A list of dicts, each dict being all the relevant DICOM and NIFTI parameters of
-        a converted directory
+        Increments the "debt" due to launching workers back towards zero. Starts the post-import processing once
+        importer workers are done.
+        :param signalled_outputs: A list of tuples of the scan type and the JSON sidecar of each converted directory
         """
-        # Stockpile the completed summaries and increment the "debt" back towards zero
-        self.import_summaries.extend(signalled_summaries)
+        # Stockpile the produced outputs and increment the "debt" back towards zero
+        self.import_outputs.extend(signalled_outputs)
         self.n_import_workers -= 1
 
         # Don't proceed until all importer workers are finished
@@ -769,57 +995,49 @@ class xASL_GUI_Importer(QMainWindow):
         """
         Performs the bulk of the post-import work, especially if the import type was specified to be BIDS
         """
-        print("Clearing Import workers from memory, re-enabling widgets, and resetting current directory")
+        print("Clearing Import workers from memory and re-enabling widgets")
         self.import_workers.clear()
         self.set_widgets_on_or_off(state=True)
         self.btn_terminate_importer.setEnabled(False)
         QApplication.restoreOverrideCursor()
 
-        chdir(self.config["ScriptsDir"])
         analysis_dir = Path(self.import_parms["RawDir"]).parent / "analysis"
         if not analysis_dir.exists():
+            self.finalize_import_log(analysis_dir)
             robust_qmsg(self, title=self.import_errs["StudyDirNeverMade"][0],
                         body=self.import_errs["StudyDirNeverMade"][1], variables=[str(analysis_dir)])
             return
+        # The post-processing steps still write to the log of the import, which is only finalized after them
+        logger = get_queue_logger("ImportPostProcessing",
+                                  self.import_log_service.queue if self.import_log_service is not None else None)
 
-        # Concatenate the tmpImport_Converter_###.log files into a single log placed in the study directory
-        # Also, remove the log files in the process
-        logs = []
-        log_files = sorted(Path(self.import_parms["RawDir"]).glob("tmpImport_Converter*.log"))
-        for log_file in log_files:
-            with open(log_file, "r") as log_reader:
-                logs.append(log_reader.read())
-            log_file.unlink(missing_ok=True)
-
-        now_str = datetime.now().strftime("%a-%b-%d-%Y_%H-%M-%S")
-        try:
-            log_path = analysis_dir / "Logs" / "Import Logs" / f"Import_Log_{now_str}.log"
-            log_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(log_path, "w") as log_writer:
-                log_writer.write(f"\n{'#' * 50}\n".join(logs))
-        except PermissionError:
-            log_path = analysis_dir / "Logs" / "Import Logs" / f"Import_Log_{now_str}_backup.log"
-            log_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(log_path, "w") as log_writer:
-                log_writer.write("\n\n".join(logs))
-
-        # Create the import summary
-        create_import_summary(import_summaries=self.import_summaries, config=self.import_parms)
+        # Sort the import summary, whose rows were written as the DICOM directories finished
+        summary_df = self.import_summary_writer.finalize(logger=logger)
+        self.import_summary_writer = None
 
         # If the settings is BIDS...
         if not self.chk_uselegacy.isChecked():
+            # Record the produced ASL and M0 sidecars, such that the follow-up steps need not search the study
+            update_bids_manifest(analysis_dir=analysis_dir, outputs=self.import_outputs)
+
             # Ensure all M0 jsons have the appropriate "IntendedFor" field if this is in BIDS
-            bids_m0_followup(analysis_dir=analysis_dir)
+            bids_m0_followup(analysis_dir=analysis_dir, logger=logger)
 
             # Create the template for the dataset description
             self.create_dataset_description_template(analysis_dir)
 
             # Create the "bidsignore" file
             with open(analysis_dir / ".bidsignore", 'w') as ignore_writer:
-                to_ignore = ["Import_Log_*.log\n", "Import_Failed*.txt\n", "Import_Dataframe_*.tsv\n"]
+                to_ignore = ["Import_Log_*.log\n", "Import_Log_*.log.gz\n", "Import_Failed*.txt\n",
+                             "Import_Dataframe_*.tsv\n", "Import_Profile_*.tsv\n"]
                 ignore_writer.writelines(to_ignore)
                 del to_ignore
 
+        # Create the per-stage profile of the import, showing which stages were the bottleneck for this dataset
+        if summary_df is not None:
+            create_import_profile(summary_df=summary_df, config=self.import_parms, logger=logger)
+        log_path = self.finalize_import_log(analysis_dir)
+
         # If there were any failures, write them to disk now
         if len(self.failed_runs) > 0:
             try:
@@ -836,6 +1054,21 @@ class xASL_GUI_Importer(QMainWindow):
                                     f"You have successfully imported the DICOM dataset into NIFTI format.\n"
                                     f"The study directory is located at:\n{str(analysis_dir)}", QMessageBox.Ok)
 
+    def finalize_import_log(self, analysis_dir: Path) -> Union[Path, None]:
+        """
+        Stops the log service of the import once all of its messages are written, then moves the log into the study
+        directory (or leaves it in the raw directory if the study directory was never made)
+        :param analysis_dir: the analysis directory of the import
+        :return: the filepath of the finished log or None if no import was logging
+        """
+        if self.import_log_service is None:
+            return None
+        log_name = self.import_log_service.log_path.name.replace("tmpImport_", "Import_Log_")
+        dst_dir = analysis_dir / "Logs" / "Import Logs" if analysis_dir.exists() else Path(self.import_parms["RawDir"])
+        log_path = self.import_log_service.stop(dst_path=dst_dir / log_name)
+        self.import_log_service = None
+        return log_path
+
     @staticmethod
     def create_dataset_description_template(analysis_dir: Path):
         """
@@ -860,6 +1093,38 @@ class xASL_GUI_Importer(QMainWindow):
     ########################
     # SECTION - RUN FUNCTION
     ########################
+    def run_import_planner(self):
+        """
+        Resolves every DICOM directory to its destination without converting anything, then reports the expected
+        outputs, collisions, and time estimate. The full plan is written to ImportPlan.tsv in the raw directory
+        """
+        import_parms = self.get_import_parms()
+        if import_parms is None:
+            return
+
+        # The plan is made in the background; the widgets stay off until its report arrives
+        self.set_widgets_on_or_off(state=False)
+        planner = Importer_Planner(config=import_parms, use_legacy_mode=self.chk_uselegacy.isChecked(),
+                                   n_workers=max(import_parms["Number of Workers"], 1))
+        planner.signals.signal_send_plan.connect(self.slot_show_import_plan)
+        planner.signals.signal_send_error.connect(self.slot_show_import_plan_error)
+        self.threadpool.start(planner)
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+
+    @Slot(str, str)
+    def slot_show_import_plan(self, report: str, plan_path: str):
+        QApplication.restoreOverrideCursor()
+        self.set_widgets_on_or_off(state=True)
+        robust_qmsg(self, msg_type="information", title=self.import_errs["ImportPlan"][0],
+                    body=self.import_errs["ImportPlan"][1], variables=[report, plan_path])
+
+    @Slot(str)
+    def slot_show_import_plan_error(self, error: str):
+        QApplication.restoreOverrideCursor()
+        self.set_widgets_on_or_off(state=True)
+        robust_qmsg(self, title=self.import_errs["ImportPlanFailed"][0], body=self.import_errs["ImportPlanFailed"][1],
+                    variables=[error])
+
     def run_importer(self):
         """
         First confirms that all import parameters are set, then runs ASL2BIDS using multi-threading
@@ -867,56 +1132,57 @@ class xASL_GUI_Importer(QMainWindow):
         # Set (or reset if this is another run) the essential variables
         self.n_import_workers = 0
         self.import_parms = None
-        self.import_summaries.clear()
+        self.import_outputs.clear()
         self.failed_runs.clear()
         self.import_workers.clear()
 
         # Disable the run button to prevent accidental re-runs
         self.set_widgets_on_or_off(state=False)
 
-        # Ensure the dcm2niix path is visible
-        chdir(Path(self.config["ProjectDir"]) / "External" / "DCM2NIIX" / f"DCM2NIIX_{system()}")
-
         # Get the import parameters
         self.import_parms = self.get_import_parms()
         if self.import_parms is None:
-            # Reset widgets back to normal and change the directory back
+            # Reset widgets back to normal
             self.set_widgets_on_or_off(state=True)
-            chdir(self.config["ScriptsDir"])
             return
 
-        # Get the dicom directories
-        subject_dirs: List[Tuple[Path]] = get_dicom_directories(config=self.import_parms)
-
-        # Set the progressbar
+        # A single background writer collects the messages of every converter thread and process of this import
+        now_str = datetime.now().strftime("%a-%b-%d-%Y_%H-%M-%S")
+        log_path = Path(self.import_parms["RawDir"]) / f"tmpImport_{now_str}.log"
+        self.import_log_service = StudyLogService(log_path=log_path,
+                                                  b_echo=self.config["DeveloperMode"],
+                                                  b_compress=self.config.get("CompressLogs", False),
+                                                  b_multiprocess=True)
+
+        # The import summary is written row by row as the DICOM directories finish
+        summary_path = Path(self.import_parms["RawDir"]).parent / "analysis" / \
+            f"Import_Dataframe_{datetime.now().strftime('%a-%b-%d-%Y %H-%M-%S')}.tsv"
+        self.import_summary_writer = ImportSummaryWriter(summary_path)
+
+        # Get the dicom directories as a stream, such that the conversion starts while the raw directory is still
+        # being walked; the progressbar is busy until the first ones are found
+        dicom_dirs = flatten(iter_dicom_directories(config=self.import_parms))
         self.progbar_import.setValue(0)
-        self.progbar_import.setMaximum(len(list(collapse(subject_dirs))))
-
-        if self.config["DeveloperMode"]:
-            print("Detected the following dicom directories:")
-            pprint(subject_dirs)
-            print('\n')
-
-        NTHREADS = min([len(subject_dirs), 4])
-        # NTHREADS = 1  # For troubleshooting
-        for idx, subjects_subset in enumerate(divide(NTHREADS, subject_dirs)):
-            dicom_dirs = flatten(subjects_subset)
-            worker = Importer_Worker(dcm_dirs=dicom_dirs,  # The list of dicom directories
-                                     config=self.import_parms,  # The import parameters
-                                     use_legacy_mode=self.chk_uselegacy.isChecked(),
-                                     name=f"Converter_{str(idx).zfill(3)}"
-                                     )  # Whether to use legacy mode or not
-            self.signal_stop_import.connect(worker.slot_stop_import)
-            worker.signals.signal_send_summaries.connect(self.slot_is_ready_postprocessing)
-            worker.signals.signal_send_errors.connect(self.slot_update_failed_runs_log)
-            worker.signals.signal_confirm_terminate.connect(self.slot_cleanup_postterminate)
-            worker.signals.signal_update_progressbar.connect(self.slot_update_progressbar)
-            self.import_workers.append(worker)
-            self.n_import_workers += 1
-
-        # Launch them
-        for worker in self.import_workers:
-            self.threadpool.start(worker)
+        self.progbar_import.setMaximum(0)
+
+        worker = Importer_Worker(dcm_dirs=dicom_dirs,  # The stream of dicom directories
+                                 config=self.import_parms,  # The import parameters
+                                 use_legacy_mode=self.chk_uselegacy.isChecked(),  # Whether to use legacy mode or not
+                                 n_workers=max(self.import_parms["Number of Workers"], 1),
+                                 name="Converter_Pool",
+                                 log_queue=self.import_log_service.queue,
+                                 summary_writer=self.import_summary_writer)
+        self.signal_stop_import.connect(worker.slot_stop_import)
+        worker.signals.signal_send_summaries.connect(self.slot_is_ready_postprocessing)
+        worker.signals.signal_send_errors.connect(self.slot_update_failed_runs_log)
+        worker.signals.signal_confirm_terminate.connect(self.slot_cleanup_postterminate)
+        worker.signals.signal_update_progressbar.connect(self.slot_update_progressbar)
+        worker.signals.signal_update_progressbar_maximum.connect(self.progbar_import.setMaximum)
+        self.import_workers.append(worker)
+        self.n_import_workers += 1
+
+        # Launch it
+        self.threadpool.start(worker)
 
         # Change the cursor
         self.btn_terminate_importer.setEnabled(True)
@@ -0,0 +1,132 @@
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from time import monotonic
+from typing import Union
+import multiprocessing
+import threading
+import logging
+import shutil
+import queue
+import gzip
+import sys
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s\n%(message)s"
+
+
+class BatchedFileHandler(logging.FileHandler):
+    """
+    FileHandler that does not flush after every record. Records accumulate in the buffer of the file and are flushed
+    at most every flush_interval seconds and when the handler is closed, sparing network storage a sync per message.
+    Records which are followed by no others are flushed by the owner of the handler calling flush_if_due periodically
+    """
+
+    def __init__(self, filename: Union[Path, str], mode: str = "w", flush_interval: float = 2.0):
+        super().__init__(filename=filename, mode=mode, encoding="utf-8")
+        self.flush_interval = flush_interval
+        self.last_flush = monotonic()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        """
+        Flushes the buffer of the file if it was last flushed at least flush_interval seconds ago
+        """
+        with self.lock:
+            if self.stream is not None and monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+                self.last_flush = monotonic()
+
+
+class StudyLogService:
+    """
+    Background writer of the log of a study. Workers log to the queue of the service through a QueueHandler (see
+    get_queue_logger), such that logging never blocks a worker on the disk and only the listener thread of the service
+    writes to the log file
+    """
+
+    def __init__(self, log_path: Union[Path, str], b_echo: bool = False, b_compress: bool = False,
+                 b_multiprocess: bool = False, flush_interval: float = 2.0):
+        """
+        :param log_path: the filepath of the log file. Its parent directories are created if they do not exist
+        :param b_echo: whether records should also be printed to stdout (i.e. in DeveloperMode)
+        :param b_compress: whether the log file should be gzip-compressed once the service is stopped
+        :param b_multiprocess: whether records will also arrive from other processes, which requires a multiprocessing
+        queue rather than a plain one
+        :param flush_interval: the most seconds that records may sit in the buffer of the log file
+        """
+        self.log_path = Path(log_path)
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self.b_compress = b_compress
+        # A spawn-context queue can be handed to both spawned and forked processes
+        self.queue = multiprocessing.get_context("spawn").Queue() if b_multiprocess else queue.Queue()
+
+        formatter = logging.Formatter(fmt=LOG_FORMAT)
+        handlers = [BatchedFileHandler(filename=self.log_path, mode="w", flush_interval=flush_interval)]
+        if b_echo:
+            handlers.append(logging.StreamHandler(sys.stdout))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        self.listener = QueueListener(self.queue, *handlers)
+        self.listener.start()
+
+        # The file is also flushed on a timer, such that the last records before a lull do not linger in the buffer
+        self.flush_interval = flush_interval
+        self.stop_flushing = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, name="StudyLogFlusher", daemon=True)
+        self.flusher.start()
+
+    def _flush_periodically(self):
+        while not self.stop_flushing.wait(self.flush_interval):
+            for handler in self.listener.handlers:
+                if isinstance(handler, BatchedFileHandler):
+                    handler.flush_if_due()
+
+    def stop(self, dst_path: Union[Path, str] = None) -> Path:
+        """
+        Writes out all records still in the queue and closes the log file
+        :param dst_path: where the log file should be moved to. If None or if it cannot be moved there, the log file
+        stays where it was written
+        :return: the filepath of the finished (and possibly compressed) log file
+        """
+        self.listener.stop()
+        self.stop_flushing.set()
+        self.flusher.join()
+        for handler in self.listener.handlers:
+            handler.close()
+        # A multiprocessing queue also has a feeder thread to wind down
+        if hasattr(self.queue, "join_thread"):
+            self.queue.close()
+            self.queue.join_thread()
+
+        log_path = self.log_path
+        if dst_path is not None:
+            try:
+                Path(dst_path).parent.mkdir(parents=True, exist_ok=True)
+                log_path = Path(shutil.move(str(log_path), str(dst_path)))
+            except OSError:
+                pass  # The log file remains where it was written
+        if self.b_compress:
+            compressed_path = log_path.with_name(f"{log_path.name}.gz")
+            with open(log_path, "rb") as log_reader, gzip.open(compressed_path, "wb") as log_writer:
+                shutil.copyfileobj(log_reader, log_writer)
+            log_path.unlink()
+            log_path = compressed_path
+        return log_path
+
+
+def get_queue_logger(name: str, log_queue: Union[queue.Queue, "multiprocessing.queues.Queue", None]) -> logging.Logger:
+    """
+    Convenience function for a logger that hands its records over to the queue of a StudyLogService
+    :param name: the name of the logger, which is shown in every record
+    :param log_queue: the queue of the StudyLogService. If None, the records are discarded
+    :return: the logger
+    """
+    logger = logging.Logger(name=name, level=logging.DEBUG)
+    logger.addHandler(QueueHandler(log_queue) if log_queue is not None else logging.NullHandler())
+    return logger
@@ -4,11 +4,11 @@ from PySide2.QtCore import QSize
 from src.xASL_GUI_HelperClasses import DandD_FileExplorer2ListWidget, xASL_FormLayout
 from src.xASL_GUI_HelperFuncs_WidgetFuncs import (make_scrollbar_area, make_droppable_clearable_le, set_formlay_options,
                                                   dir_check, robust_getdir, robust_getfile, robust_qmsg)
+from src.xASL_GUI_HelperFuncs_DirOps import get_bids_asl_m0_pairs, update_json_sidecars, get_sidecar_nifti
 import json
 import re
 from pathlib import Path
 from tdda import rexpy
-from more_itertools import peekable
 from functools import partial
 from shutil import which
 from typing import List, Union
@@ -482,50 +482,59 @@ class xASL_Parms(QMainWindow):
                         body=self.parms_errs["BIDSoverwriteforNonBIDS"][1])
             return
 
-        asl_jsons = peekable(analysis_dir.rglob("*_asl.json"))
+        asl_m0_pairs = get_bids_asl_m0_pairs(analysis_dir)
         # If json sidecars cannot be found, exit early
-        if not asl_jsons:
+        if len(asl_m0_pairs) == 0:
             robust_qmsg(self, title=self.parms_errs["NoJsonSidecars"][0], body=self.parms_errs["NoJsonSidecars"][1])
             return
 
-        for asl_sidecar in asl_jsons:
-            # Load in the data
-            with open(asl_sidecar) as asl_sidecar_reader:
-                asl_sidecar_data = json.load(asl_sidecar_reader)
-
+        # The widget values are read here once, as the sidecars themselves are rewritten from several threads
+        m0_isseparate = self.cmb_m0_isseparate.currentText()
+        m0_posinasl = self.le_m0_posinasl.text()
+        labelingtype = self.cmb_labelingtype.currentText()
+        initialpld = self.spinbox_initialpld.value() / 1000
+        labdur = self.spinbox_labdur.value() / 1000
+        nsup_pulses = self.cmb_nsup_pulses.currentText()
+        sequencetype = self.d_sequencetype[self.cmb_sequencetype.currentText()]
+        m0_jsons = dict(asl_m0_pairs)
+
+        def update_asl_sidecar(asl_sidecar: Path, asl_sidecar_data: dict) -> bool:
+            b_possible_m0 = True
             # M0 key behavior
             # Priority 1 - if there is an M0 present, use its path as the value
-            possible_m0_json = Path(str(asl_sidecar).replace("_asl.json", "_m0scan.json"))
-            relative_path = "/".join(str(possible_m0_json).replace('\\', '/').split('/')[-2:])
-
-            if possible_m0_json.exists():
-                asl_sidecar_data["M0"] = relative_path.replace("_m0scan.json", "_m0scan.nii")
+            possible_m0_json = m0_jsons[asl_sidecar]
+            if possible_m0_json is not None:
+                m0_nifti = get_sidecar_nifti(possible_m0_json) or possible_m0_json.with_suffix(".nii")
+                asl_sidecar_data["M0"] = "/".join(m0_nifti.parts[-2:])
             # Priority 2 - if the M0 is present within the asl nifti, as indicated by the user, go with that
-            elif self.cmb_m0_isseparate.currentText() == "Proton density scan (M0) was acquired":
-
-                if self.le_m0_posinasl.text() != "":
+            elif m0_isseparate == "Proton density scan (M0) was acquired":
+                if m0_posinasl != "":
                     asl_sidecar_data["M0"] = True
                 else:
-                    self.flag_impossible_m0 = True
-                    bad_jsons.append(asl_sidecar)
-
-            elif self.cmb_m0_isseparate.currentText() == "Use mean control ASL as M0 mimic":
+                    b_possible_m0 = False
+            elif m0_isseparate == "Use mean control ASL as M0 mimic":
                 asl_sidecar_data["M0"] = False
-
             else:
-                self.flag_impossible_m0 = True
-                bad_jsons.append(asl_sidecar)
+                b_possible_m0 = False
 
             # Polish up certain fields
-            asl_sidecar_data["LabelingType"] = self.d_labelingtype[self.cmb_labelingtype.currentText()]
-            asl_sidecar_data["PostLabelingDelay"] = self.spinbox_initialpld.value() / 1000
-            if self.cmb_labelingtype.currentText() in ["Pseudo-continuous ASL", "Continuous ASL"]:
-                asl_sidecar_data["LabelingDuration"] = self.spinbox_labdur.value() / 1000
-            asl_sidecar_data["BackgroundSuppression"] = False if self.cmb_nsup_pulses.currentText() == "0" else True
-            asl_sidecar_data["PulseSequenceType"] = self.d_sequencetype[self.cmb_sequencetype.currentText()]
-
-            with open(asl_sidecar, 'w') as asl_sidecar_writer:
-                json.dump(asl_sidecar_data, asl_sidecar_writer, indent=3)
+            asl_sidecar_data["LabelingType"] = self.d_labelingtype[labelingtype]
+            asl_sidecar_data["PostLabelingDelay"] = initialpld
+            if labelingtype in ["Pseudo-continuous ASL", "Continuous ASL"]:
+                asl_sidecar_data["LabelingDuration"] = labdur
+            asl_sidecar_data["BackgroundSuppression"] = False if nsup_pulses == "0" else True
+            asl_sidecar_data["PulseSequenceType"] = sequencetype
+            return b_possible_m0
+
+        is_possible, failures = update_json_sidecars(list(m0_jsons), update_asl_sidecar)
+        # Sidecars which could not be rewritten at all are reported separately below
+        bad_jsons = [asl_sidecar for asl_sidecar, b_possible in zip(m0_jsons, is_possible) if b_possible is False]
+        self.flag_impossible_m0 = len(bad_jsons) > 0
+
+        if len(failures) > 0:
+            failed_jsons = "\n".join([f"{asl_json}: {reason}" for asl_json, reason in failures.items()])
+            robust_qmsg(self, title=self.parms_errs["SidecarsNotUpdated"][0],
+                        body=self.parms_errs["SidecarsNotUpdated"][1], variables=failed_jsons)
 
         if self.flag_impossible_m0:
             bad_jsons = "; ".join([asl_json.stem for asl_json in bad_jsons])
@@ -0,0 +1,230 @@
+from collections import deque
+from time import monotonic
+from typing import Callable, Dict
+from platform import system
+import subprocess
+import threading
+import selectors
+import codecs
+import locale
+import os
+
+
+class _OutputStream:
+    """
+    Incremental reader state of a single pipe of a supervised process. Raw bytes are decoded as they arrive and split
+    into lines; an unterminated line is held back until its remainder arrives, but never beyond max_line_length
+    characters
+    """
+
+    def __init__(self, pipe, on_line: Callable[[str], None], max_line_length: int):
+        self.pipe = pipe
+        self.on_line = on_line
+        self.max_line_length = max_line_length
+        self.decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))(errors="replace")
+        self.partial = ""
+
+    def feed(self, data: bytes, final: bool = False):
+        """
+        Hands every complete line within the newly arrived data over to the callback of the stream
+        :param data: the bytes read from the pipe
+        :param final: whether the pipe has reached its end, in which case any unterminated line is also handed over
+        """
+        lines = (self.partial + self.decoder.decode(data, final=final)).splitlines(keepends=True)
+        self.partial = ""
+        if lines and not lines[-1].endswith(("\n", "\r")):
+            self.partial = lines.pop()
+        if len(self.partial) > self.max_line_length or (final and self.partial):
+            lines.append(self.partial)
+            self.partial = ""
+        for line in lines:
+            self.on_line(line.rstrip("\r\n"))
+
+
+class _SupervisedProcess:
+    """
+    Bookkeeping of a single supervised process: its open streams, the bounded tail of its stderr and the callback to
+    invoke once it has exited and its output has been drained
+    """
+
+    def __init__(self, proc: subprocess.Popen, on_stdout_line: Callable[[str], None],
+                 on_exit: Callable[[int, str], None], stderr_maxlines: int, max_line_length: int):
+        self.proc = proc
+        self.on_exit = on_exit
+        self.stderr_tail = deque(maxlen=stderr_maxlines)
+        self.streams = [_OutputStream(proc.stdout, on_stdout_line, max_line_length),
+                        _OutputStream(proc.stderr, self.stderr_tail.append, max_line_length)]
+        self.n_open = len(self.streams)
+        self.exited_at = None
+        self.is_finished = False
+
+
+class ProcessOutputSupervisor:
+    """
+    Drains the stdout and stderr pipes of any number of subprocesses from a single background thread. Both pipes of a
+    process are read as soon as they have data, such that a process can never stall on a full pipe, and nothing is
+    retained beyond the tail of stderr (for crash reports) and a single unterminated line per pipe. On Windows, where
+    pipes cannot be multiplexed by a selector, each pipe is instead drained by its own lightweight reader thread.
+    """
+
+    def __init__(self, stderr_maxlines: int = 500, max_line_length: int = 65536, exit_grace: float = 5.0):
+        """
+        :param stderr_maxlines: how many of the most recent stderr lines of a process are kept for its exit callback
+        :param max_line_length: the most characters held back for a line which has not been terminated yet
+        :param exit_grace: how many seconds the pipes of an exited process may stay open (i.e. when held by an orphaned
+        grandchild) before they are closed regardless
+        """
+        self.stderr_maxlines = stderr_maxlines
+        self.max_line_length = max_line_length
+        self.exit_grace = exit_grace
+        self.use_selector = system() != "Windows"
+        self.lock = threading.Lock()
+        self.pending = []
+        self.watched: Dict[int, _SupervisedProcess] = {}
+        self.thread = None
+        self.is_stopping = False
+        if self.use_selector:
+            self.selector = selectors.DefaultSelector()
+            self.wake_r, self.wake_w = os.pipe()
+            os.set_blocking(self.wake_r, False)
+            os.set_blocking(self.wake_w, False)
+            self.selector.register(self.wake_r, selectors.EVENT_READ, data=None)
+
+    def watch(self, proc: subprocess.Popen, on_stdout_line: Callable[[str], None],
+              on_exit: Callable[[int, str], None]):
+        """
+        Starts draining the output of a process. The process must have been started with stdout and stderr set to
+        subprocess.PIPE in binary mode. Both callbacks are invoked from the thread of the supervisor
+        :param proc: the process to supervise
+        :param on_stdout_line: called with every line of stdout, without its line ending
+        :param on_exit: called once with the return code and the stderr tail after the process has exited and both of
+        its pipes were drained
+        """
+        supervised = _SupervisedProcess(proc, on_stdout_line, on_exit, self.stderr_maxlines, self.max_line_length)
+        if not self.use_selector:
+            for stream in supervised.streams:
+                threading.Thread(target=self._drain_stream_blocking, args=(supervised, stream), daemon=True).start()
+            return
+
+        with self.lock:
+            self.pending.append(supervised)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run_selector_loop, name="ProcessOutputSupervisor",
+                                               daemon=True)
+                self.thread.start()
+        self._wake()
+
+    def stop(self):
+        """
+        Stops the thread of the supervisor. Processes which are still being supervised do not receive their exit
+        callback
+        """
+        if not self.use_selector:
+            return
+        self.is_stopping = True
+        self._wake()
+        if self.thread is not None:
+            self.thread.join()
+        self.selector.close()
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+
+    def _wake(self):
+        try:
+            os.write(self.wake_w, b"\0")
+        except (BlockingIOError, OSError):
+            pass  # The wake-up pipe is already full, so the loop will wake regardless
+
+    def _run_selector_loop(self):
+        while not self.is_stopping:
+            # Only keep a timeout while there are processes that might exit with their pipes held open elsewhere, and
+            # a short one while there are processes whose pipes were closed but which have not exited yet
+            if any(supervised.n_open == 0 for supervised in self.watched.values()):
+                timeout = 0.05
+            else:
+                timeout = 1.0 if self.watched else None
+            for key, _ in self.selector.select(timeout=timeout):
+                if key.data is None:
+                    self._drain_wake_pipe()
+                else:
+                    self._read_stream(*key.data)
+            self._check_exited()
+
+    def _drain_wake_pipe(self):
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for supervised in pending:
+            self.watched[supervised.proc.pid] = supervised
+            for stream in supervised.streams:
+                os.set_blocking(stream.pipe.fileno(), False)
+                self.selector.register(stream.pipe.fileno(), selectors.EVENT_READ, data=(supervised, stream))
+
+    def _read_stream(self, supervised: _SupervisedProcess, stream: _OutputStream):
+        try:
+            data = os.read(stream.pipe.fileno(), 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if data:
+            stream.feed(data)
+        else:
+            self._close_stream(supervised, stream)
+
+    def _close_stream(self, supervised: _SupervisedProcess, stream: _OutputStream):
+        stream.feed(b"", final=True)
+        if self.use_selector:
+            self.selector.unregister(stream.pipe.fileno())
+        stream.pipe.close()
+        supervised.n_open -= 1
+        if supervised.n_open == 0:
+            self._finish(supervised)
+
+    def _check_exited(self):
+        now = monotonic()
+        for supervised in list(self.watched.values()):
+            if supervised.proc.poll() is None:
+                continue
+            if supervised.n_open == 0:
+                self._finish(supervised)
+            elif supervised.exited_at is None:
+                supervised.exited_at = now
+            elif now - supervised.exited_at > self.exit_grace:
+                for stream in supervised.streams:
+                    if not stream.pipe.closed:
+                        self._close_stream(supervised, stream)
+
+    def _finish(self, supervised: _SupervisedProcess, b_wait: bool = False):
+        if supervised.is_finished:
+            return
+        if b_wait:
+            supervised.proc.wait()
+        elif supervised.proc.poll() is None:
+            # The process let go of its pipes before exiting (i.e. it backgrounded itself), so it is finished by
+            # _check_exited once it has exited, rather than stalling the supervision of every other process here
+            return
+        supervised.is_finished = True
+        self.watched.pop(supervised.proc.pid, None)
+        returncode = supervised.proc.returncode
+        try:
+            supervised.on_exit(returncode, "\n".join(supervised.stderr_tail))
+        except Exception as exit_err:  # A faulty callback must not bring down the supervision of other processes
+            print(f"{self.__class__.__name__} received an error during the exit callback of process "
+                  f"{supervised.proc.pid}:\n{exit_err}")
+
+    def _drain_stream_blocking(self, supervised: _SupervisedProcess, stream: _OutputStream):
+        for data in iter(lambda: stream.pipe.readline(self.max_line_length), b""):
+            stream.feed(data)
+        with self.lock:
+            stream.feed(b"", final=True)
+            stream.pipe.close()
+            supervised.n_open -= 1
+            is_last = supervised.n_open == 0
+        if is_last:
+            # Each pipe has its own reader thread here, so waiting on the process holds up no other process
+            self._finish(supervised, b_wait=True)
@@ -1,10 +1,13 @@
 from src.xASL_GUI_Startup import startup
+from multiprocessing import freeze_support
 import platform
 import os
 
 # TODO Discuss with the group about the GUI deprecating compatibility with ExploreASL versions <1.5.0
 
 if __name__ == '__main__':
+    # Required for the import process pool to work in the compiled version of the program
+    freeze_support()
     if platform.system() == "Darwin":
         release, _, machine_info = platform.mac_ver()
         try: